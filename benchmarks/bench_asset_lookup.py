@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: linear keyword scoring vs. inverted-index lookup in AssetManager.
+
+Builds synthetic asset libraries of increasing size in a temporary directory,
+then times find-best-match for a fixed set of product names with both
+strategies and checks that they agree.
+
+Usage: python benchmarks/bench_asset_lookup.py [--sizes 1000 10000 50000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from asset_manager import AssetManager  # noqa: E402
+
+VOCABULARY = [
+    'serum', 'hydrating', 'face', 'sunscreen', 'spf', 'bottle', 'water', 'eco', 'friendly',
+    'headphones', 'wireless', 'premium', 'watch', 'smart', 'tracker', 'fitness', 'protein',
+    'powder', 'chocolate', 'charger', 'portable', 'camera', 'security', 'thermostat', 'hub',
+    'voice', 'assistant', 'earbuds', 'elite', 'shoe', 'running', 'jacket', 'winter', 'lamp',
+    'desk', 'chair', 'ergonomic', 'blender', 'kitchen', 'mug', 'coffee', 'tea', 'bag', 'leather'
+]
+
+PRODUCTS = [
+    'Hydrating Face Serum', 'SPF 50 Sunscreen', 'Eco-Friendly Water Bottle',
+    'Premium Wireless Headphones', 'Smart Fitness Tracker', 'Protein Powder Chocolate',
+    'Portable Charger Max', 'Security Camera System', 'Quantum Computing Simulator'
+]
+
+
+def build_library(manager: AssetManager, size: int, seed: int = 42) -> None:
+    """Populate the manager's cache and index with synthetic assets."""
+    rng = random.Random(seed)
+    manager.asset_cache = {'assets': {}, 'last_scan': 'benchmark'}
+    manager.keyword_index.clear()
+
+    for i in range(size):
+        words = rng.sample(VOCABULARY, rng.randint(2, 4))
+        words.append(f"{rng.choice('abcdefghijklmnopqrstuvwxyz')}{i:06d}")
+        name = '_'.join(words)
+        relative_path = f"library/{name}.jpg"
+        keywords = manager._extract_keywords_from_filename(name)
+        manager.asset_cache['assets'][relative_path] = {
+            'path': str(manager.assets_dir / relative_path),
+            'name': name,
+            'format': '.jpg',
+            'size': 0,
+            'keywords': keywords
+        }
+        manager.keyword_index.add(relative_path, keywords)
+
+
+def time_lookups(lookup, queries, repeats: int) -> float:
+    """Return mean milliseconds per lookup."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for keywords in queries:
+            lookup(keywords)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(queries))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        manager = AssetManager(str(Path(temp_dir) / 'assets'))
+        queries = [manager._extract_keywords_from_filename(p) for p in PRODUCTS]
+
+        print(f"{'assets':>8} {'linear ms':>10} {'indexed ms':>11} {'speedup':>8} {'agree':>6}")
+        for size in args.sizes:
+            build_library(manager, size)
+
+            linear_ms = time_lookups(manager._find_best_match_linear, queries, args.repeats)
+            indexed_ms = time_lookups(manager._find_best_match, queries, args.repeats)
+            agree = all(
+                manager._find_best_match(q) == manager._find_best_match_linear(q) for q in queries
+            )
+
+            speedup = linear_ms / indexed_ms if indexed_ms else float('inf')
+            print(f"{size:>8} {linear_ms:>10.3f} {indexed_ms:>11.3f} {speedup:>7.1f}x {str(agree):>6}")
+
+
+if __name__ == '__main__':
+    main()
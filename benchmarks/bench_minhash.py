@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized MinHash + LSH banding vs. the per-seed MD5 linear scan.
+
+Builds synthetic corpora (Zipf-distributed vocabulary, 60-word documents) of
+each size in ContentFingerprinter's index, then looks up lightly edited copies
+of known documents. Reports signature cost per document for both MinHash
+implementations, lookup time with LSH candidates and with an exhaustive
+vectorized scan, candidates scored per query, and recall of the planted source.
+The legacy linear scan is timed on a sample of at most 10k documents and
+scaled to the corpus size.
+
+Usage: python benchmarks/bench_minhash.py [--sizes 1000 100000 1000000] [--queries 50]
+"""
+
+import argparse
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from plagiarism_checker import ContentFingerprinter  # noqa: E402
+
+VOCABULARY_SIZE = 20000
+WORDS_PER_DOCUMENT = 60
+BUILD_CHUNK = 10000
+LEGACY_SCAN_SAMPLE = 10000
+
+
+def legacy_signature(shingles, num_hashes: int):
+    """The previous implementation: one MD5 per (seed, shingle), as 128-bit ints."""
+    if not shingles:
+        return [0] * num_hashes
+    return [
+        min(int(hashlib.md5(f"{seed}{s}".encode()).hexdigest(), 16) for s in shingles)
+        for seed in range(num_hashes)
+    ]
+
+
+def make_documents(rng: np.random.Generator, count: int):
+    """Synthetic documents as word lists."""
+    words = (rng.zipf(1.2, (count, WORDS_PER_DOCUMENT)) - 1) % VOCABULARY_SIZE
+    return [[f"w{w}" for w in row] for row in words]
+
+
+def edit_document(rng: np.random.Generator, words, rate: float = 0.03):
+    """Copy of a document with a fraction of its words replaced."""
+    edited = list(words)
+    for i in np.flatnonzero(rng.random(len(edited)) < rate):
+        edited[i] = f"w{rng.integers(VOCABULARY_SIZE)}"
+    return edited
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--threshold', type=float, default=0.3)
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} {'build s':>8} {'sig us':>7} {'legacy sig us':>14} {'lsh ms':>7} "
+          f"{'scan ms':>8} {'legacy ms':>10} {'cands':>7} {'recall':>7}")
+
+    for size in args.sizes:
+        rng = np.random.default_rng(size)
+        fingerprinter = ContentFingerprinter()
+
+        # Remember the documents that will be queried
+        query_rows = set(rng.choice(size, min(args.queries, size), replace=False).tolist())
+        sources = {}
+
+        start = time.perf_counter()
+        for offset in range(0, size, BUILD_CHUNK):
+            documents = make_documents(rng, min(BUILD_CHUNK, size - offset))
+            signatures = fingerprinter.minhasher.signatures(documents)
+            fingerprinter.index.add_batch([f"doc{offset + i}" for i in range(len(documents))], signatures)
+            for i, words in enumerate(documents):
+                if offset + i in query_rows:
+                    sources[f"doc{offset + i}"] = words
+        build_s = time.perf_counter() - start
+
+        queries = [(doc_id, " ".join(edit_document(rng, words))) for doc_id, words in sources.items()]
+
+        start = time.perf_counter()
+        for _, text in queries:
+            fingerprinter.create_minhash_signature(text)
+        sig_us = (time.perf_counter() - start) * 1e6 / len(queries)
+
+        sample = queries[:5]
+        start = time.perf_counter()
+        for _, text in sample:
+            legacy_signature(fingerprinter._create_shingles(text), fingerprinter.num_hashes)
+        legacy_sig_us = (time.perf_counter() - start) * 1e6 / len(sample)
+
+        signatures = [fingerprinter.create_minhash_signature(text) for _, text in queries]
+
+        start = time.perf_counter()
+        results = [fingerprinter.index.query(sig, args.threshold) for sig in signatures]
+        lsh_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        candidates = np.mean([len(fingerprinter.index.candidates(sig)) for sig in signatures])
+        recall = np.mean([
+            any(doc_id == source for doc_id, _ in result) for (source, _), result in zip(queries, results)
+        ])
+
+        start = time.perf_counter()
+        for sig in signatures[:10]:
+            fingerprinter.index.query(sig, args.threshold, exhaustive=True)
+        scan_ms = (time.perf_counter() - start) * 1000 / min(10, len(signatures))
+
+        # Legacy linear scan over Python-list signatures, scaled to the corpus size
+        sample_size = min(size, LEGACY_SCAN_SAMPLE)
+        stored = [fingerprinter.index._signatures[row].tolist() for row in range(sample_size)]
+        query = signatures[0].tolist()
+        start = time.perf_counter()
+        for other in stored:
+            sum(1 for a, b in zip(query, other) if a == b) / len(query)
+        legacy_ms = (time.perf_counter() - start) * 1000 * size / sample_size
+
+        print(f"{size:>8} {build_s:>8.1f} {sig_us:>7.0f} {legacy_sig_us:>14.0f} {lsh_ms:>7.2f} "
+              f"{scan_ms:>8.1f} {legacy_ms:>10.1f} {candidates:>7.1f} {recall:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: palette extraction speed and agreement across accuracy presets.
+
+For each synthetic creative size, clusters the same pixels with every preset in
+PALETTE_ACCURACY_PRESETS and compares the result against the "exact" extractor
+(full-resolution KMeans, n_init=10). Agreement is reported with the engine's own
+palette similarity (perceptual best-match over the top five colors) and as the
+largest RGB distance from an exact top-five color to its nearest fast color.
+A final row times a palette-cache hit.
+
+Usage: python benchmarks/bench_palette.py [--sizes 1024x1024 1792x1024] [--repeats 1]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from brand_intelligence import BrandIntelligenceEngine, PALETTE_ACCURACY_PRESETS  # noqa: E402
+
+DEFAULT_SIZES = ['1024x1024', '1792x1024', '1024x1792']
+
+
+def make_creative(width: int, height: int, seed: int = 7) -> np.ndarray:
+    """Synthetic RGB creative: brand-colored blocks over a gradient, with noise."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(40, 220, width, dtype=np.float32)
+    y = np.linspace(60, 200, height, dtype=np.float32)[:, None]
+    image = np.stack([
+        np.broadcast_to(x, (height, width)),
+        np.broadcast_to(y, (height, width)),
+        np.full((height, width), 120, dtype=np.float32)
+    ], axis=-1).copy()
+
+    brand_colors = [(220, 40, 60), (30, 90, 200), (250, 200, 40), (40, 160, 90)]
+    for color in brand_colors:
+        x0, y0 = int(rng.integers(0, width * 3 // 4)), int(rng.integers(0, height * 3 // 4))
+        image[y0:y0 + height // 4, x0:x0 + width // 4] = color
+
+    image += rng.normal(0, 8, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def max_color_error(exact_colors: np.ndarray, colors: np.ndarray, top: int = 5) -> float:
+    """Largest RGB distance from an exact top color to its nearest candidate color."""
+    exact = exact_colors[:top].astype(float)
+    distances = np.linalg.norm(exact[:, None, :] - colors[None, :, :].astype(float), axis=2)
+    return float(distances.min(axis=1).max())
+
+
+def time_call(func, repeats: int):
+    """Return (mean milliseconds per call, last result)."""
+    result = None
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return (time.perf_counter() - start) * 1000 / repeats, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help='WIDTHxHEIGHT')
+    parser.add_argument('--n-colors', type=int, default=8)
+    parser.add_argument('--repeats', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        engine = BrandIntelligenceEngine(brand_assets_dir=str(Path(temp_dir) / 'brand_assets'))
+
+        print(f"{'size':>10} {'accuracy':<9} {'ms':>9} {'speedup':>8} {'similarity':>11} {'max err':>8}")
+        for size in args.sizes:
+            width, height = (int(v) for v in size.lower().split('x'))
+            rgb = make_creative(width, height)
+
+            exact_ms, (exact_colors, exact_pct) = time_call(
+                lambda: engine._cluster_palette_colors(rgb, args.n_colors, 'exact'), args.repeats
+            )
+            exact_palette = engine._build_palette(exact_colors, exact_pct)
+
+            for accuracy in PALETTE_ACCURACY_PRESETS:
+                if accuracy == 'exact':
+                    ms, colors, similarity, error = exact_ms, exact_colors, 1.0, 0.0
+                else:
+                    ms, (colors, pct) = time_call(
+                        lambda: engine._cluster_palette_colors(rgb, args.n_colors, accuracy), args.repeats
+                    )
+                    palette = engine._build_palette(colors, pct)
+                    similarity = engine._compare_color_palettes(exact_palette, palette)
+                    error = max_color_error(exact_colors, colors)
+
+                speedup = exact_ms / ms if ms else float('inf')
+                print(f"{size:>10} {accuracy:<9} {ms:>9.1f} {speedup:>7.1f}x {similarity:>11.3f} {error:>8.1f}")
+
+        # Palette cache: second extraction of an unchanged file is a store lookup
+        image_path = str(Path(temp_dir) / 'creative.png')
+        cv2.imwrite(image_path, cv2.cvtColor(make_creative(1792, 1024), cv2.COLOR_RGB2BGR))
+        miss_ms, _ = time_call(lambda: engine.extract_color_palette(image_path, args.n_colors, persist=True), 1)
+        hit_ms, _ = time_call(lambda: engine.extract_color_palette(image_path, args.n_colors, persist=True), 5)
+        print(f"\npalette cache ({engine.palette_accuracy}): miss {miss_ms:.1f} ms, hit {hit_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
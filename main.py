@@ -20,13 +20,14 @@ from dotenv import load_dotenv
 
 from src.asset_manager import AssetManager
 from src.image_generator import ImageGenerator
-from src.creative_composer import CreativeComposer
+from src.render_engine import RenderEngine
+from src.blob_store import get_blob_store
 from src.compliance_checker import ComplianceChecker
 from src.localization import LocalizationManager
 from src.batch_processor import BatchProcessor
 from src.analytics_dashboard import AnalyticsDashboard
 from src.ai_agent import CreativeAutomationAgent, run_agent_monitor
-from src.utils import setup_logging, validate_campaign_brief
+from src.utils import setup_logging, validate_campaign_brief, load_cost_tracking
 
 # Load environment variables
 load_dotenv()
@@ -97,7 +98,6 @@ def generate_region_assets(campaign_brief: Dict, campaign_id: str, region: str,
     # Initialize components
     asset_manager = AssetManager(assets_dir)
     image_generator = ImageGenerator()
-    creative_composer = CreativeComposer()
     compliance_checker = ComplianceChecker()
     
     # Create output directory structure
@@ -141,46 +141,35 @@ def generate_region_assets(campaign_brief: Dict, campaign_id: str, region: str,
     products = campaign_brief['campaign_brief']['products']
     aspect_ratios = campaign_brief['campaign_brief']['output_requirements']['aspect_ratios']
     
-    for product in products:
-        product_name = product['name']
-        
-        # Create product output directory
-        product_output = output_path / product_name.replace(' ', '_').lower()
-        product_output.mkdir(exist_ok=True)
-        
-        # Generate assets for each aspect ratio
-        for aspect_ratio in aspect_ratios:
-            # Check if asset already exists (unless force_generate is True)
-            output_file = product_output / f"{aspect_ratio.replace(':', 'x')}.jpg"
-            if output_file.exists() and not force_generate:
-                console.print(f"✅ {output_file} already exists (use --force to regenerate)")
-                continue
-            
-            # Try to find existing asset
-            existing_asset = asset_manager.find_product_asset(product_name)
-            
-            if existing_asset:
-                console.print(f"📎 Using existing asset: {existing_asset}")
-                base_image_path = existing_asset
-            else:
-                # Generate new asset using AI
-                console.print(f"🤖 Generating new asset for {product_name}")
-                base_image_path = image_generator.generate_product_image(
-                    product, 
-                    campaign_brief['campaign_brief']
-                )
-            
-            # Compose final creative with text overlay
-            final_creative = creative_composer.compose_creative(
-                base_image_path,
-                campaign_brief['campaign_brief'],
-                product,
-                aspect_ratio
-            )
-            
-            # Save final creative
-            final_creative.save(output_file, format='JPEG', quality=95)
-            console.print(f"✅ Generated: {output_file}")
+    # Resolve/decode each base image once and render all aspect ratios in parallel
+    # Identical creatives across regions and reruns share one blob under the output root
+    render_engine = RenderEngine(asset_manager, image_generator, blob_store=get_blob_store(Path(output_dir) / '.blobs'))
+    render_result = render_engine.render_campaign(
+        campaign_brief['campaign_brief'], output_path, force_generate
+    )
+    
+    for skipped_file in render_result['skipped']:
+        console.print(f"✅ {skipped_file} already exists (use --force to regenerate)")
+    
+    for product_name, source in render_result['sources'].items():
+        if source['source'] == 'existing':
+            console.print(f"📎 Using existing asset: {source['path']}")
+        else:
+            console.print(f"🤖 Generated new asset for {product_name}")
+    
+    for rendered in render_result['rendered']:
+        console.print(f"✅ Generated: {rendered['output_file']}")
+    
+    for failure in render_result['failed']:
+        console.print(f"[red]❌ Failed: {failure['output_file']} ({failure['error']})[/red]")
+    
+    if verbose:
+        timings = render_result['timings']
+        console.print(
+            f"⏱️  Resolve {timings['resolve_seconds']:.2f}s | Decode {timings['decode_seconds']:.2f}s | "
+            f"Compose {timings['compose_seconds']:.2f}s | Encode {timings['encode_seconds']:.2f}s | "
+            f"Wall {timings['total_seconds']:.2f}s ({render_result['workers']} workers)"
+        )
     
     # Generate summary report
     generate_summary_report(campaign_brief, output_path)
@@ -190,7 +179,8 @@ def generate_region_assets(campaign_brief: Dict, campaign_id: str, region: str,
         'campaign_id': campaign_id,
         'output_path': str(output_path),
         'products_processed': len(products),
-        'assets_generated': len(products) * len(aspect_ratios)
+        'assets_generated': len(products) * len(aspect_ratios),
+        'render_timings': render_result['timings']
     }
 
 
@@ -541,7 +531,8 @@ def status():
     console.print(f"📁 Campaign Briefs: Available")
     console.print(f"🔧 CLI Commands: 26 available")
     console.print(f"🌐 Web Interface: Running on port 5004")
-    console.print(f"💰 Cost Tracking: Active")
+    costs = load_cost_tracking()
+    console.print(f"💰 Cost Tracking: ${costs['total_cost']:.2f} across {costs['api_calls']} API calls")
     console.print(f"📊 Analytics: Available")
 
 
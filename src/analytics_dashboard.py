@@ -10,6 +10,11 @@ import json
 import statistics
 from collections import defaultdict, Counter
 
+try:
+    from .utils import load_cost_tracking
+except ImportError:
+    from utils import load_cost_tracking
+
 logger = logging.getLogger(__name__)
 
 
@@ -125,17 +130,9 @@ class AnalyticsDashboard:
     def _collect_cost_data(self) -> Dict[str, Any]:
         """Collect and analyze cost data."""
         
-        if not self.costs_file.exists():
-            return {
-                'total_cost': 0.0,
-                'api_calls': 0,
-                'cost_per_call': 0.0,
-                'services': {}
-            }
-        
         try:
-            with open(self.costs_file, 'r') as f:
-                cost_data = json.load(f)
+            # Aggregates come from the cost ledger; no per-event scan
+            cost_data = load_cost_tracking()
             
             # Calculate additional metrics
             total_cost = cost_data.get('total_cost', 0.0)
@@ -0,0 +1,166 @@
+"""
+Asset Keyword Index - Inverted index from keywords and keyword n-grams to assets.
+
+AssetManager's match score is non-zero only when a product keyword and an asset
+keyword are substrings of one another. The index answers both directions without
+touching unrelated assets:
+
+* asset keyword contains product keyword -> n-gram postings over the keyword vocabulary
+* product keyword contains asset keyword -> exact keyword postings for each substring
+
+A snapshot of the index is persisted in AssetManager's asset store so start-up
+does not re-tokenize every asset.
+"""
+
+import gc
+import pickle
+from typing import Dict, List, Set, Iterable
+
+NGRAM_SIZES = (2, 3)
+
+
+def keyword_ngrams(keyword: str) -> Set[str]:
+    """Return the 2- and 3-grams of a keyword (the keyword itself if shorter)."""
+    grams = set()
+    for n in NGRAM_SIZES:
+        if len(keyword) < n:
+            continue
+        grams.update(keyword[i:i + n] for i in range(len(keyword) - n + 1))
+    return grams or {keyword}
+
+
+class AssetKeywordIndex:
+    """In-memory inverted index used by AssetManager.find_product_asset."""
+
+    VERSION = 1
+
+    def __init__(self):
+        # keyword -> asset ids carrying that keyword
+        self.keyword_postings: Dict[str, Set[str]] = {}
+        # n-gram -> vocabulary keywords containing it
+        self.ngram_postings: Dict[str, Set[str]] = {}
+        # asset id -> keywords, and insertion order for deterministic tie-breaking
+        self.asset_keywords: Dict[str, List[str]] = {}
+        self.asset_order: Dict[str, int] = {}
+        self._next_order = 0
+
+    def __len__(self) -> int:
+        return len(self.asset_keywords)
+
+    def __contains__(self, asset_id: str) -> bool:
+        return asset_id in self.asset_keywords
+
+    def add(self, asset_id: str, keywords: Iterable[str]) -> None:
+        """Index an asset, replacing any previous entry for the same id."""
+        order = self.asset_order.get(asset_id)
+        if order is not None:
+            # Re-indexing keeps the original position, like a dict update would
+            self.remove(asset_id)
+        else:
+            order = self._next_order
+            self._next_order += 1
+
+        keywords = list(keywords)
+        self.asset_keywords[asset_id] = keywords
+        self.asset_order[asset_id] = order
+
+        for keyword in set(keywords):
+            postings = self.keyword_postings.get(keyword)
+            if postings is None:
+                postings = self.keyword_postings[keyword] = set()
+                for gram in keyword_ngrams(keyword):
+                    self.ngram_postings.setdefault(gram, set()).add(keyword)
+            postings.add(asset_id)
+
+    def remove(self, asset_id: str) -> bool:
+        """Remove an asset from the index."""
+        keywords = self.asset_keywords.pop(asset_id, None)
+        if keywords is None:
+            return False
+        self.asset_order.pop(asset_id, None)
+
+        for keyword in set(keywords):
+            postings = self.keyword_postings.get(keyword)
+            if postings is None:
+                continue
+            postings.discard(asset_id)
+            if not postings:
+                # Keyword left the vocabulary; drop its n-gram references
+                del self.keyword_postings[keyword]
+                for gram in keyword_ngrams(keyword):
+                    gram_postings = self.ngram_postings.get(gram)
+                    if gram_postings is not None:
+                        gram_postings.discard(keyword)
+                        if not gram_postings:
+                            del self.ngram_postings[gram]
+        return True
+
+    def clear(self) -> None:
+        """Remove every asset from the index."""
+        self.keyword_postings.clear()
+        self.ngram_postings.clear()
+        self.asset_keywords.clear()
+        self.asset_order.clear()
+        self._next_order = 0
+
+    def dumps(self) -> bytes:
+        """Serialize the index for persistence."""
+        return pickle.dumps(
+            (self.VERSION, self.keyword_postings, self.ngram_postings,
+             self.asset_keywords, self.asset_order, self._next_order),
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+    @classmethod
+    def loads(cls, data: bytes) -> "AssetKeywordIndex":
+        """Rebuild an index from its serialized form."""
+        # The snapshot is hundreds of thousands of small containers; don't let the
+        # cyclic GC rescan them repeatedly while they are being allocated
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            version, keyword_postings, ngram_postings, asset_keywords, asset_order, next_order = pickle.loads(data)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported asset index version: {version}")
+        index = cls()
+        index.keyword_postings = keyword_postings
+        index.ngram_postings = ngram_postings
+        index.asset_keywords = asset_keywords
+        index.asset_order = asset_order
+        index._next_order = next_order
+        return index
+
+    def related_keywords(self, keyword: str) -> Set[str]:
+        """Vocabulary keywords that contain, or are contained in, the given keyword."""
+        related = set()
+
+        # Asset keywords containing the product keyword
+        grams = sorted(keyword_ngrams(keyword), key=lambda g: len(self.ngram_postings.get(g, ())))
+        if grams and grams[0] in self.ngram_postings:
+            candidates = set(self.ngram_postings[grams[0]])
+            for gram in grams[1:]:
+                candidates &= self.ngram_postings.get(gram, set())
+                if not candidates:
+                    break
+            related.update(c for c in candidates if keyword in c)
+
+        # Asset keywords contained in the product keyword
+        length = len(keyword)
+        for start in range(length):
+            for end in range(start + 1, length + 1):
+                substring = keyword[start:end]
+                if substring in self.keyword_postings:
+                    related.add(substring)
+
+        return related
+
+    def candidates(self, keywords: Iterable[str]) -> Set[str]:
+        """Asset ids that share at least one related keyword with the query."""
+        result: Set[str] = set()
+        for keyword in set(keywords):
+            for related in self.related_keywords(keyword):
+                result.update(self.keyword_postings[related])
+        return result
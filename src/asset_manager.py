@@ -2,84 +2,380 @@
 Asset Manager - Handles input asset discovery and management.
 """
 
+import atexit
+import hashlib
 import logging
+import os
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple, Any
 import json
 
+try:
+    from .asset_index import AssetKeywordIndex
+    from .asset_store import AssetStore
+except ImportError:
+    from asset_index import AssetKeywordIndex
+    from asset_store import AssetStore
+
+# Optional live index updates via filesystem events
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+class _AssetEventHandler(FileSystemEventHandler):
+    """Forwards watchdog events to the owning AssetManager."""
+    
+    def __init__(self, manager: "AssetManager"):
+        self.manager = manager
+    
+    def on_created(self, event):
+        self.manager._handle_fs_event(event.src_path, event.is_directory)
+    
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.manager._handle_fs_event(event.src_path, False)
+    
+    def on_deleted(self, event):
+        self.manager._handle_fs_event(event.src_path, event.is_directory, deleted=True)
+    
+    def on_moved(self, event):
+        self.manager._handle_fs_event(event.src_path, event.is_directory, deleted=True)
+        self.manager._handle_fs_event(event.dest_path, event.is_directory)
+
+
 class AssetManager:
     """Manages input assets and asset discovery."""
     
-    def __init__(self, assets_directory: str = "assets"):
+    def __init__(
+        self,
+        assets_directory: str = "assets",
+        rescan_interval_seconds: Optional[float] = None,
+        cache_dir: str = "cache"
+    ):
         self.assets_dir = Path(assets_directory)
         self.assets_dir.mkdir(exist_ok=True)
         
-        # Cache for asset metadata
+        # Supported image formats
+        self.supported_formats = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+        
+        self._lock = threading.RLock()
+        self._observer = None
+        
+        # Cache for asset metadata (SQLite; cache.json is migrated on first use).
+        # One database per assets directory so managers for different trees don't clear each other.
         self.cache_file = Path('cache.json')
+        cache_path = Path(cache_dir)
+        cache_path.mkdir(parents=True, exist_ok=True)
+        dir_key = hashlib.blake2b(str(self.assets_dir.resolve()).encode(), digest_size=8).hexdigest()
+        self.store = AssetStore(cache_path / f"asset_cache_{dir_key}.db")
         self.asset_cache = self._load_cache()
         
-        # Supported image formats
-        self.supported_formats = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+        # Inverted keyword index, loaded from the store's snapshot when it is current
+        self.keyword_index = self._load_index()
+        
+        # None keeps the previous behaviour of trusting a completed scan until forced
+        self.rescan_interval_seconds = rescan_interval_seconds
+        self.last_scan_stats: Dict[str, Any] = {}
+        self._closed = False
+        atexit.register(self.close)
         
         logger.info(f"Asset manager initialized with directory: {self.assets_dir}")
     
     def _load_cache(self) -> Dict:
-        """Load asset cache from file."""
-        if self.cache_file.exists():
+        """Load asset cache from the store, migrating a legacy cache.json if present."""
+        if self.store.is_empty() and self.cache_file.exists():
             try:
                 with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                logger.warning(f"Failed to load cache: {e}")
+                    legacy = json.load(f)
+                # cache.json was shared by every assets directory; keep only this tree's entries
+                assets_root = self.assets_dir.resolve()
+                upserts = {
+                    relative_path: asset_info
+                    for relative_path, asset_info in legacy.get('assets', {}).items()
+                    if assets_root in Path(asset_info['path']).resolve().parents
+                }
+                # No last_scan and no mtimes, so the next scan re-verifies every entry
+                self.store.apply_changes(
+                    upserts=upserts,
+                    meta={'last_scan': None, 'assets_dir': str(self.assets_dir)}
+                )
+                self.cache_file.rename(self.cache_file.with_name(self.cache_file.name + '.migrated'))
+                logger.info(f"Migrated {len(upserts)} assets from {self.cache_file}")
+            except (json.JSONDecodeError, IOError, KeyError, TypeError) as e:
+                logger.warning(f"Failed to migrate legacy cache: {e}")
         
-        return {'assets': {}, 'last_scan': None}
+        cache = self.store.load()
+        
+        if cache['assets_dir'] not in (None, str(self.assets_dir)):
+            # Cache belongs to another assets directory; start over
+            self.store.clear()
+            cache = {'assets': {}, 'directories': {}, 'last_scan': None, 'assets_dir': None}
+        
+        return cache
     
-    def _save_cache(self) -> None:
-        """Save asset cache to file."""
+    def _load_index(self) -> AssetKeywordIndex:
+        """Load the keyword index snapshot, rebuilding it if it is missing or stale."""
+        data = self.store.load_index()
+        if data is not None:
+            try:
+                self._index_dirty = False
+                return AssetKeywordIndex.loads(data)
+            except Exception as e:
+                logger.warning(f"Failed to load asset keyword index: {e}")
+        
+        index = AssetKeywordIndex()
+        for relative_path, asset_info in self.asset_cache['assets'].items():
+            index.add(relative_path, asset_info['keywords'])
+        self._index_dirty = True
+        return index
+    
+    def _save_index(self) -> None:
+        """Persist the keyword index if it changed since it was loaded or saved."""
+        with self._lock:
+            if self._index_dirty and self.store.save_index(self.keyword_index.dumps()):
+                self._index_dirty = False
+    
+    def close(self) -> None:
+        """Stop watching, persist the keyword index and close the store."""
+        if self._closed:
+            return
+        self.stop_watching()
+        with self._lock:
+            self._save_index()
+            self.store.close()
+            self._closed = True
+        atexit.unregister(self.close)
+    
+    def _scan_due(self) -> bool:
+        """Whether the periodic rescan interval has elapsed."""
+        if self.rescan_interval_seconds is None:
+            return False
+        last_scan = self.asset_cache.get('last_scan')
         try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.asset_cache, f, indent=2)
-        except IOError as e:
-            logger.warning(f"Failed to save cache: {e}")
+            elapsed = (datetime.now() - datetime.fromisoformat(last_scan)).total_seconds()
+        except (TypeError, ValueError):
+            return True
+        return elapsed >= self.rescan_interval_seconds
     
-    def scan_assets(self, force_rescan: bool = False) -> None:
-        """Scan the assets directory and update cache."""
-        from datetime import datetime
+    def scan_assets(self, force_rescan: bool = False, full_rescan: bool = False) -> None:
+        """Scan the assets directory and update cache.
         
-        if not force_rescan and self.asset_cache.get('last_scan'):
-            logger.debug("Using cached asset scan results")
-            return
+        Scans are incremental: directories whose mtime is unchanged are not
+        re-listed, and files whose (size, mtime) pair is unchanged are not
+        re-processed. full_rescan re-lists every directory.
+        """
+        with self._lock:
+            if self._observer is not None and not (force_rescan or full_rescan):
+                logger.debug("Asset index is kept live by the watcher")
+                return
+            
+            if not (force_rescan or full_rescan) and self.asset_cache.get('last_scan') and not self._scan_due():
+                logger.debug("Using cached asset scan results")
+                return
+            
+            if not self.assets_dir.exists():
+                logger.warning(f"Assets directory {self.assets_dir} does not exist")
+                return
+            
+            logger.info("Scanning assets directory...")
+            self._incremental_scan(full_rescan)
+            
+            logger.info(
+                f"Asset scan completed. Found {len(self.asset_cache['assets'])} assets "
+                f"({self.last_scan_stats['files_updated']} updated, {self.last_scan_stats['files_removed']} removed)"
+            )
+    
+    def _incremental_scan(self, full_rescan: bool = False) -> None:
+        """Diff the tree against stored directory mtimes and file (size, mtime) pairs."""
+        start = time.perf_counter()
+        assets = self.asset_cache['assets']
+        directories = self.asset_cache['directories']
+        stats = {
+            'directories_listed': 0,
+            'directories_unchanged': 0,
+            'files_checked': 0,
+            'files_updated': 0,
+            'files_removed': 0
+        }
         
-        logger.info("Scanning assets directory...")
-        self.asset_cache['assets'] = {}
+        files_by_dir: Dict[str, List[str]] = {}
+        for relative_path in assets:
+            files_by_dir.setdefault(os.path.dirname(relative_path), []).append(relative_path)
         
-        if not self.assets_dir.exists():
-            logger.warning(f"Assets directory {self.assets_dir} does not exist")
-            return
+        upserts: Dict[str, Dict[str, Any]] = {}
+        directory_upserts: Dict[str, Dict[str, Any]] = {}
+        present_files = set()
+        seen_dirs = set()
+        stack = ['']
         
-        for file_path in self.assets_dir.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in self.supported_formats:
-                relative_path = str(file_path.relative_to(self.assets_dir))
-                
-                # Extract metadata
-                asset_info = {
-                    'path': str(file_path),
-                    'name': file_path.stem,
-                    'format': file_path.suffix.lower(),
-                    'size': file_path.stat().st_size,
-                    'keywords': self._extract_keywords_from_filename(file_path.stem)
-                }
-                
-                self.asset_cache['assets'][relative_path] = asset_info
-                logger.debug(f"Found asset: {relative_path}")
+        while stack:
+            relative_dir = stack.pop()
+            absolute_dir = self.assets_dir / relative_dir
+            try:
+                dir_mtime = os.stat(absolute_dir).st_mtime_ns
+            except OSError:
+                continue
+            seen_dirs.add(relative_dir)
+            
+            known = directories.get(relative_dir)
+            if known is not None and known['mtime_ns'] == dir_mtime and not full_rescan:
+                # Same directory listing as last time: only re-stat the known files
+                stats['directories_unchanged'] += 1
+                subdirs = known['subdirs']
+                for relative_path in files_by_dir.get(relative_dir, []):
+                    try:
+                        file_stat = os.stat(self.assets_dir / relative_path)
+                    except OSError:
+                        continue
+                    present_files.add(relative_path)
+                    self._check_file(relative_path, file_stat, upserts, stats)
+            else:
+                stats['directories_listed'] += 1
+                subdirs = []
+                try:
+                    with os.scandir(absolute_dir) as entries:
+                        for entry in entries:
+                            relative_path = os.path.join(relative_dir, entry.name) if relative_dir else entry.name
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(relative_path)
+                            elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in self.supported_formats:
+                                present_files.add(relative_path)
+                                self._check_file(relative_path, entry.stat(), upserts, stats)
+                except OSError as e:
+                    logger.warning(f"Failed to list {absolute_dir}: {e}")
+                    continue
+                directory_upserts[relative_dir] = {'mtime_ns': dir_mtime, 'subdirs': subdirs}
+                directories[relative_dir] = directory_upserts[relative_dir]
+            
+            stack.extend(subdirs)
+        
+        removed = [relative_path for relative_path in assets if relative_path not in present_files]
+        for relative_path in removed:
+            del assets[relative_path]
+            self.keyword_index.remove(relative_path)
+            self._index_dirty = True
+        stats['files_removed'] = len(removed)
+        
+        removed_dirs = [relative_dir for relative_dir in directories if relative_dir not in seen_dirs]
+        for relative_dir in removed_dirs:
+            del directories[relative_dir]
         
         self.asset_cache['last_scan'] = datetime.now().isoformat()
-        self._save_cache()
+        self.store.apply_changes(
+            upserts=upserts,
+            deletes=removed,
+            directory_upserts=directory_upserts,
+            directory_deletes=removed_dirs,
+            meta={'last_scan': self.asset_cache['last_scan'], 'assets_dir': str(self.assets_dir)}
+        )
+        self._save_index()
         
-        logger.info(f"Asset scan completed. Found {len(self.asset_cache['assets'])} assets")
+        stats['duration_seconds'] = time.perf_counter() - start
+        self.last_scan_stats = stats
+    
+    def _check_file(self, relative_path: str, file_stat: os.stat_result,
+                    upserts: Dict[str, Dict[str, Any]], stats: Dict[str, Any]) -> None:
+        """Re-process a file only if its (size, mtime) pair changed."""
+        stats['files_checked'] += 1
+        existing = self.asset_cache['assets'].get(relative_path)
+        if (existing is not None and existing.get('size') == file_stat.st_size
+                and existing.get('mtime_ns') == file_stat.st_mtime_ns):
+            return
+        
+        asset_info = self._build_asset_info(self.assets_dir / relative_path, file_stat)
+        self.asset_cache['assets'][relative_path] = asset_info
+        self.keyword_index.add(relative_path, asset_info['keywords'])
+        self._index_dirty = True
+        upserts[relative_path] = asset_info
+        stats['files_updated'] += 1
+        logger.debug(f"Found asset: {relative_path}")
+    
+    def _build_asset_info(self, file_path: Path, file_stat: os.stat_result) -> Dict[str, Any]:
+        """Extract cached metadata for an asset file."""
+        return {
+            'path': str(file_path),
+            'name': file_path.stem,
+            'format': file_path.suffix.lower(),
+            'size': file_stat.st_size,
+            'mtime_ns': file_stat.st_mtime_ns,
+            'keywords': self._extract_keywords_from_filename(file_path.stem)
+        }
+    
+    def start_watching(self) -> bool:
+        """Keep the cache and keyword index live from filesystem events."""
+        if not WATCHDOG_AVAILABLE:
+            logger.warning("watchdog not available - falling back to incremental rescans")
+            return False
+        
+        with self._lock:
+            if self._observer is not None:
+                return True
+            
+            # Catch up with anything that changed while we were not watching
+            self._incremental_scan()
+            
+            self._observer = Observer()
+            self._observer.schedule(_AssetEventHandler(self), str(self.assets_dir), recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+        
+        logger.info(f"Watching {self.assets_dir} for asset changes")
+        return True
+    
+    def stop_watching(self) -> None:
+        """Stop the filesystem watcher."""
+        with self._lock:
+            observer, self._observer = self._observer, None
+        
+        if observer is not None:
+            observer.stop()
+            observer.join()
+            logger.info(f"Stopped watching {self.assets_dir}")
+    
+    def _handle_fs_event(self, src_path: str, is_directory: bool, deleted: bool = False) -> None:
+        """Apply a single filesystem event to the cache and index."""
+        path = Path(src_path)
+        try:
+            relative_path = str(path.relative_to(self.assets_dir))
+        except ValueError:
+            relative_path = os.path.relpath(src_path, self.assets_dir)
+        
+        with self._lock:
+            if is_directory:
+                # Directory moves and deletes affect many files; reconcile the subtree
+                self._incremental_scan()
+                return
+            
+            if path.suffix.lower() not in self.supported_formats:
+                return
+            
+            if deleted:
+                if self.asset_cache['assets'].pop(relative_path, None) is not None:
+                    self.keyword_index.remove(relative_path)
+                    self._index_dirty = True
+                    self.store.apply_changes(deletes=[relative_path])
+                return
+            
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                return
+            
+            upserts: Dict[str, Dict[str, Any]] = {}
+            self._check_file(relative_path, file_stat, upserts, {'files_checked': 0, 'files_updated': 0})
+            if upserts:
+                self.store.apply_changes(upserts=upserts)
     
     def _extract_keywords_from_filename(self, filename: str) -> List[str]:
         """Extract keywords from filename for matching."""
@@ -97,17 +393,51 @@ class AssetManager:
         """Find the best matching asset for a product."""
         self.scan_assets()
         
-        if not self.asset_cache['assets']:
-            logger.warning("No assets found in directory")
-            return None
-        
         # Extract keywords from product name
         product_keywords = self._extract_keywords_from_filename(product_name)
         
+        # The watcher thread mutates the cache and index under the same lock
+        with self._lock:
+            if not self.asset_cache['assets']:
+                logger.warning("No assets found in directory")
+                return None
+            
+            best_match, best_score = self._find_best_match(product_keywords)
+        
+        if best_match and best_score > 0:
+            logger.info(f"Found matching asset for '{product_name}': {best_match} (score: {best_score})")
+            return Path(best_match)
+        
+        logger.info(f"No matching asset found for product: {product_name}")
+        return None
+    
+    def _find_best_match(self, product_keywords: List[str]) -> Tuple[Optional[str], float]:
+        """Score only the assets the keyword index links to the product keywords."""
+        with self._lock:
+            assets = self.asset_cache['assets']
+            order = self.keyword_index.asset_order
+            
+            best_id = None
+            best_score = 0
+            
+            for asset_id in self.keyword_index.candidates(product_keywords):
+                score = self._calculate_match_score(product_keywords, assets[asset_id]['keywords'])
+                # Earliest-indexed asset wins ties, matching the linear scan
+                if score > best_score or (score == best_score and best_id is not None and order[asset_id] < order[best_id]):
+                    best_score = score
+                    best_id = asset_id
+            
+            return (assets[best_id]['path'] if best_id else None), best_score
+    
+    def _find_best_match_linear(self, product_keywords: List[str]) -> Tuple[Optional[str], float]:
+        """Reference implementation that scores every asset (used by benchmarks)."""
         best_match = None
         best_score = 0
         
-        for relative_path, asset_info in self.asset_cache['assets'].items():
+        with self._lock:
+            assets = list(self.asset_cache['assets'].values())
+        
+        for asset_info in assets:
             asset_keywords = asset_info['keywords']
             
             # Calculate matching score
@@ -117,12 +447,7 @@ class AssetManager:
                 best_score = score
                 best_match = asset_info['path']
         
-        if best_match and best_score > 0:
-            logger.info(f"Found matching asset for '{product_name}': {best_match} (score: {best_score})")
-            return Path(best_match)
-        
-        logger.info(f"No matching asset found for product: {product_name}")
-        return None
+        return best_match, best_score
     
     def _calculate_match_score(self, product_keywords: List[str], asset_keywords: List[str]) -> float:
         """Calculate similarity score between product and asset keywords."""
@@ -148,7 +473,8 @@ class AssetManager:
     def get_asset_list(self) -> List[Dict]:
         """Get list of all available assets."""
         self.scan_assets()
-        return list(self.asset_cache['assets'].values())
+        with self._lock:
+            return list(self.asset_cache['assets'].values())
     
     def add_asset(self, asset_path: Path, product_name: str = None) -> bool:
         """Add a new asset to the managed directory."""
@@ -173,8 +499,14 @@ class AssetManager:
             import shutil
             shutil.copy2(asset_path, dest_path)
             
-            # Invalidate cache
-            self.asset_cache['last_scan'] = None
+            # Update cache and keyword index in place instead of forcing a rescan
+            relative_path = str(dest_path.relative_to(self.assets_dir))
+            with self._lock:
+                asset_info = self._build_asset_info(dest_path, dest_path.stat())
+                self.asset_cache['assets'][relative_path] = asset_info
+                self.keyword_index.add(relative_path, asset_info['keywords'])
+                self._index_dirty = True
+                self.store.apply_changes(upserts={relative_path: asset_info})
             
             logger.info(f"Added asset: {dest_path}")
             return True
@@ -0,0 +1,215 @@
+"""
+Asset Store - SQLite persistence for AssetManager's scan cache.
+
+Replaces the indent=2 cache.json that was re-parsed and fully rewritten on every
+scan. Rows are loaded with one query at start-up and scans write only the
+entries that changed. Every write bumps a generation counter, and a snapshot of
+the keyword index is stored against the generation it was built from.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AssetStore:
+    """SQLite-backed store for asset metadata, directory mtimes and scan state."""
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._init_schema()
+        # Generation this connection last loaded or wrote, and whether nobody else has written since
+        self.generation = self._read_generation()
+        self._in_sync = True
+
+    def _init_schema(self) -> None:
+        """Create tables if they do not exist."""
+        with self._lock, self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS assets (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    relative_path TEXT UNIQUE NOT NULL,
+                    path TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER,
+                    keywords TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS directories (
+                    relative_path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    subdirs TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS keyword_index (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    generation INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                );
+            ''')
+            self.conn.execute(
+                'INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)',
+                ('schema_version', str(self.SCHEMA_VERSION))
+            )
+
+    def _read_generation(self) -> int:
+        """Current write generation from the meta table."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row and row[0] is not None else 0
+
+    def _bump_generation(self) -> None:
+        """Advance the write generation; call inside a write transaction."""
+        current = self._read_generation()
+        self._in_sync = self._in_sync and current == self.generation
+        self.generation = current + 1
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(self.generation),)
+        )
+
+    def is_empty(self) -> bool:
+        """True if nothing has ever been written to the store."""
+        with self._lock:
+            row = self.conn.execute("SELECT COUNT(*) FROM meta WHERE key = 'last_scan'").fetchone()
+            return row[0] == 0
+
+    def load(self) -> Dict[str, Any]:
+        """Load the full cache in the in-memory shape used by AssetManager."""
+        with self._lock:
+            assets = {}
+            for relative_path, path, name, fmt, size, mtime_ns, keywords in self.conn.execute(
+                'SELECT relative_path, path, name, format, size, mtime_ns, keywords FROM assets ORDER BY seq'
+            ):
+                assets[relative_path] = {
+                    'path': path,
+                    'name': name,
+                    'format': fmt,
+                    'size': size,
+                    'mtime_ns': mtime_ns,
+                    'keywords': keywords.split(' ') if keywords else []
+                }
+
+            directories = {
+                relative_path: {'mtime_ns': mtime_ns, 'subdirs': json.loads(subdirs)}
+                for relative_path, mtime_ns, subdirs in self.conn.execute(
+                    'SELECT relative_path, mtime_ns, subdirs FROM directories'
+                )
+            }
+
+            meta = dict(self.conn.execute('SELECT key, value FROM meta'))
+            self.generation = int(meta.get('generation') or 0)
+            self._in_sync = True
+
+        return {
+            'assets': assets,
+            'directories': directories,
+            'last_scan': meta.get('last_scan'),
+            'assets_dir': meta.get('assets_dir')
+        }
+
+    def apply_changes(
+        self,
+        upserts: Optional[Dict[str, Dict[str, Any]]] = None,
+        deletes: Iterable[str] = (),
+        directory_upserts: Optional[Dict[str, Dict[str, Any]]] = None,
+        directory_deletes: Iterable[str] = (),
+        meta: Optional[Dict[str, Optional[str]]] = None
+    ) -> None:
+        """Write a scan's changes in a single transaction."""
+        with self._lock:
+            try:
+                with self.conn:
+                    self._bump_generation()
+                    if upserts:
+                        self.conn.executemany('''
+                            INSERT INTO assets (relative_path, path, name, format, size, mtime_ns, keywords)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(relative_path) DO UPDATE SET
+                                path = excluded.path, name = excluded.name, format = excluded.format,
+                                size = excluded.size, mtime_ns = excluded.mtime_ns, keywords = excluded.keywords
+                        ''', [
+                            (rel, info['path'], info['name'], info['format'], info['size'],
+                             info.get('mtime_ns'), ' '.join(info['keywords']))
+                            for rel, info in upserts.items()
+                        ])
+
+                    deletes = list(deletes)
+                    if deletes:
+                        self.conn.executemany('DELETE FROM assets WHERE relative_path = ?', [(d,) for d in deletes])
+
+                    if directory_upserts:
+                        self.conn.executemany(
+                            'INSERT OR REPLACE INTO directories (relative_path, mtime_ns, subdirs) VALUES (?, ?, ?)',
+                            [(rel, info['mtime_ns'], json.dumps(info['subdirs'])) for rel, info in directory_upserts.items()]
+                        )
+
+                    directory_deletes = list(directory_deletes)
+                    if directory_deletes:
+                        self.conn.executemany(
+                            'DELETE FROM directories WHERE relative_path = ?', [(d,) for d in directory_deletes]
+                        )
+
+                    if meta:
+                        self.conn.executemany(
+                            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', list(meta.items())
+                        )
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to save asset cache: {e}")
+
+    def clear(self) -> None:
+        """Delete every asset and directory row."""
+        with self._lock, self.conn:
+            self._bump_generation()
+            self.conn.execute('DELETE FROM assets')
+            self.conn.execute('DELETE FROM directories')
+            self.conn.execute('DELETE FROM keyword_index')
+            self.conn.execute("DELETE FROM meta WHERE key = 'last_scan'")
+
+    def load_index(self) -> Optional[bytes]:
+        """Return the stored keyword index snapshot if it matches the loaded rows."""
+        with self._lock:
+            if not self._in_sync:
+                return None
+            row = self.conn.execute('SELECT generation, data FROM keyword_index WHERE id = 1').fetchone()
+        if row is None or row[0] != self.generation:
+            return None
+        return row[1]
+
+    def save_index(self, data: bytes) -> bool:
+        """Store a keyword index snapshot built from this connection's view of the rows."""
+        with self._lock:
+            if not self._in_sync:
+                # Another process wrote in between; our in-memory view is not the stored one
+                return False
+            try:
+                with self.conn:
+                    if self._read_generation() != self.generation:
+                        self._in_sync = False
+                        return False
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO keyword_index (id, generation, data) VALUES (1, ?, ?)',
+                        (self.generation, data)
+                    )
+                return True
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to save asset keyword index: {e}")
+                return False
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,255 @@
+"""
+Async Image Client - Non-blocking, rate-limited DALL-E client with request coalescing.
+
+All generations share one aiohttp connection pool and one token-bucket limiter.
+Identical in-flight requests are coalesced into a single API call, and 429/5xx
+responses are retried with exponential backoff and full jitter.
+"""
+
+import asyncio
+import base64
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+
+import aiohttp
+
+try:
+    from .image_cache import make_cache_key
+except ImportError:
+    from image_cache import make_cache_key
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ImageGenerationError(Exception):
+    """Raised when an image generation request fails permanently."""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+@dataclass
+class GeneratedImage:
+    """Result of an image generation request."""
+    data: bytes
+    prompt: str
+    model: str
+    size: str
+    quality: str
+    attempts: int = 1
+    shared: bool = False  # True when this caller joined another caller's in-flight request
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[int] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else max(1, int(rate_per_minute)))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.total_wait_seconds = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        """Return a lock bound to the running loop (batches may run under separate asyncio.run calls)."""
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def _refill(self) -> None:
+        """Add tokens for the time elapsed since the last refill."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Wait until tokens are available, returning the time spent waiting."""
+        waited = 0.0
+        async with self._get_lock():
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    self.total_wait_seconds += waited
+                    return waited
+
+                wait_time = (tokens - self.tokens) / self.rate
+                logger.info(f"Rate limiting: waiting {wait_time:.1f} seconds")
+                await asyncio.sleep(wait_time)
+                waited += wait_time
+
+
+class AsyncImageClient:
+    """Async OpenAI images client with pooling, rate limiting, retries and coalescing."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_calls_per_minute: float = 10,
+        burst: Optional[int] = None,
+        max_connections: int = 10,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        timeout_seconds: float = 120.0
+    ):
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.base_url = (base_url or os.getenv('OPENAI_BASE_URL') or 'https://api.openai.com/v1').rstrip('/')
+        self.limiter = TokenBucket(max_calls_per_minute, burst)
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            'requests': 0,
+            'api_calls': 0,
+            'coalesced': 0,
+            'retries': 0,
+            'failures': 0
+        }
+
+    async def __aenter__(self) -> "AsyncImageClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Create the shared session lazily inside the running event loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared connection pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def generate(
+        self,
+        prompt: str,
+        model: str = "dall-e-3",
+        size: str = "1024x1024",
+        quality: str = "standard"
+    ) -> GeneratedImage:
+        """Generate an image, joining an identical in-flight request if there is one."""
+        self.stats['requests'] += 1
+        key = make_cache_key(prompt, model, size, quality)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats['coalesced'] += 1
+            result = await asyncio.shield(inflight)
+            return GeneratedImage(
+                data=result.data, prompt=result.prompt, model=result.model,
+                size=result.size, quality=result.quality, attempts=result.attempts, shared=True
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._generate_with_retries(prompt, model, size, quality)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a future with no followers does not log a warning
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _generate_with_retries(self, prompt: str, model: str, size: str, quality: str) -> GeneratedImage:
+        """Call the generation endpoint, retrying rate-limit and server errors with jitter."""
+        payload = {'model': model, 'prompt': prompt, 'size': size, 'quality': quality, 'n': 1}
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            self.stats['api_calls'] += 1
+            try:
+                data = await self._request_image(payload)
+                return GeneratedImage(data=data, prompt=prompt, model=model, size=size,
+                                      quality=quality, attempts=attempt + 1)
+            except ImageGenerationError as e:
+                if e.status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    self.stats['failures'] += 1
+                    raise
+                delay = self._backoff_delay(attempt, e.retry_after)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    self.stats['failures'] += 1
+                    raise ImageGenerationError(f"Image generation failed: {e}") from e
+                delay = self._backoff_delay(attempt)
+
+            self.stats['retries'] += 1
+            logger.warning(f"Image generation attempt {attempt + 1} failed, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        raise ImageGenerationError("Image generation failed after retries")
+
+    async def _request_image(self, payload: Dict[str, Any]) -> bytes:
+        """Issue one generation request and download the resulting image."""
+        session = await self._get_session()
+        # Credentials go on the API call only, never on the download from the image host
+        headers = {'Authorization': f'Bearer {self.api_key}'} if self.api_key else {}
+
+        async with session.post(f"{self.base_url}/images/generations", json=payload, headers=headers) as response:
+            if response.status != 200:
+                body = await response.text()
+                error = ImageGenerationError(f"Image API returned {response.status}: {body[:200]}", response.status)
+                retry_after = response.headers.get('Retry-After')
+                if retry_after:
+                    try:
+                        error.retry_after = float(retry_after)
+                    except ValueError:
+                        pass
+                raise error
+            result = await response.json()
+
+        image_data = result['data'][0]
+        if image_data.get('b64_json'):
+            return base64.b64decode(image_data['b64_json'])
+
+        async with session.get(image_data['url']) as image_response:
+            if image_response.status != 200:
+                raise ImageGenerationError(
+                    f"Image download returned {image_response.status}", image_response.status
+                )
+            return await image_response.read()
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Exponential backoff with full jitter, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get request, coalescing and retry counters."""
+        return {
+            **self.stats,
+            'inflight': len(self._inflight),
+            'rate_limit_wait_seconds': self.limiter.total_wait_seconds
+        }
@@ -4,6 +4,7 @@ Batch Processor - Handles multiple campaign processing with optimization and sch
 
 import asyncio
 import logging
+import os
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
@@ -27,11 +28,10 @@ class BatchProcessor:
     def __init__(self, max_concurrent: int = 3, max_api_calls_per_minute: int = 10):
         self.max_concurrent = max_concurrent
         self.max_api_calls_per_minute = max_api_calls_per_minute
-        self.api_call_timestamps = []
         
-        # Initialize components
+        # Initialize components (the generator's async client owns the shared token-bucket limiter)
         self.asset_manager = AssetManager()
-        self.image_generator = ImageGenerator()
+        self.image_generator = ImageGenerator(max_api_calls_per_minute=max_api_calls_per_minute)
         self.creative_composer = CreativeComposer()
         self.compliance_checker = ComplianceChecker()
         self.localization_manager = LocalizationManager()
@@ -77,9 +77,12 @@ class BatchProcessor:
             }
         
         # Process campaigns with concurrency control
-        results = await self._process_campaigns_concurrent(
-            valid_campaigns, output_dir, skip_compliance
-        )
+        try:
+            results = await self._process_campaigns_concurrent(
+                valid_campaigns, output_dir, skip_compliance
+            )
+        finally:
+            await self.image_generator.aclose()
         
         # Generate batch report
         batch_duration = datetime.now() - batch_start
@@ -196,14 +199,11 @@ class BatchProcessor:
                 if existing_asset:
                     base_image_path = existing_asset
                 else:
-                    # Rate limit API calls
-                    await self._wait_for_rate_limit()
-                    
-                    base_image_path = self.image_generator.generate_product_image(
+                    # Rate limiting, retries and coalescing happen inside the async client
+                    base_image_path = await self.image_generator.generate_product_image_async(
                         product, campaign_brief['campaign_brief']
                     )
                     total_api_calls += 1
-                    self.api_call_timestamps.append(datetime.now())
                 
                 # Generate assets for each aspect ratio
                 for aspect_ratio in aspect_ratios:
@@ -217,8 +217,11 @@ class BatchProcessor:
                         aspect_ratio
                     )
                     
-                    # Save asset
-                    final_creative.save(output_file, format='JPEG', quality=95)
+                    # Save asset beside the target and rename: an existing output may be
+                    # a link to a blob shared with other regions and reruns
+                    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+                    final_creative.save(tmp_file, format='JPEG', quality=95)
+                    os.replace(tmp_file, output_file)
                     generated_assets.append(str(output_file.relative_to(campaign_output)))
             
             # Save reports
@@ -275,24 +278,6 @@ class BatchProcessor:
                 'duration': (datetime.now() - start_time).total_seconds()
             }
     
-    async def _wait_for_rate_limit(self):
-        """Wait if necessary to respect API rate limits."""
-        
-        # Clean old timestamps
-        cutoff = datetime.now() - timedelta(minutes=1)
-        self.api_call_timestamps = [
-            ts for ts in self.api_call_timestamps if ts > cutoff
-        ]
-        
-        # Check if we need to wait
-        if len(self.api_call_timestamps) >= self.max_api_calls_per_minute:
-            oldest_call = min(self.api_call_timestamps)
-            wait_time = 60 - (datetime.now() - oldest_call).total_seconds()
-            
-            if wait_time > 0:
-                logger.info(f"Rate limiting: waiting {wait_time:.1f} seconds")
-                await asyncio.sleep(wait_time)
-    
     def _load_campaign_brief(self, file_path: str) -> Dict[str, Any]:
         """Load campaign brief from file."""
         
@@ -0,0 +1,427 @@
+"""
+Blob Store - Content-addressed storage for published creatives and variants.
+
+Final creatives, optimized renditions and CDN edge copies used to be written as
+independent files, so identical bytes produced for several regions, reruns or
+edge locations took N times the disk. Each distinct file is now stored once under
+objects/<sha256[:2]>/<sha256[2:4]>/<sha256> and materialized into the usual
+output layout as a reflink or hardlink (falling back to a copy across devices).
+
+A SQLite index maps every materialized path to its digest and keeps a refcount
+per blob; gc() drops references whose files were deleted or replaced and removes
+blobs nobody references. Objects are read-only: a hardlinked output shares its
+inode with the object, so writers must replace materialized files (write a temp
+file and rename it into place) rather than rewrite them.
+"""
+
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Linux ioctl that clones a file's extents (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+HASH_CHUNK_SIZE = 1024 * 1024
+LINK_MODES = ('auto', 'reflink', 'hardlink', 'copy')
+
+
+def digest_bytes(data: bytes) -> str:
+    """sha256 hex digest of bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def digest_file(path: Union[str, Path]) -> str:
+    """sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """sha256-addressed blob store with link-based materialization and refcounted GC."""
+
+    SCHEMA_VERSION = 1
+    DB_FILENAME = 'blobs.db'
+    OBJECTS_DIRNAME = 'objects'
+
+    def __init__(self, root: Union[str, Path] = 'blob_store', link_mode: str = 'auto'):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"link_mode must be one of {LINK_MODES}, got {link_mode!r}")
+
+        self.root = Path(root)
+        self.objects_dir = self.root / self.OBJECTS_DIRNAME
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.link_mode = link_mode
+        # Cleared after the first failed clone so unsupported filesystems are not retried
+        self._reflink_supported = fcntl is not None and link_mode in ('auto', 'reflink')
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.root / self.DB_FILENAME), timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._init_schema()
+
+        self.stats = {
+            'blobs_written': 0,
+            'bytes_written': 0,
+            'bytes_deduplicated': 0,
+            'reflinks': 0,
+            'hardlinks': 0,
+            'copies': 0
+        }
+
+    def _init_schema(self) -> None:
+        """Create tables if they do not exist."""
+        with self._lock, self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    digest TEXT PRIMARY KEY,
+                    size_bytes INTEGER NOT NULL,
+                    refcount INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON blobs(updated_at) WHERE refcount = 0;
+                CREATE TABLE IF NOT EXISTS refs (
+                    path TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    inode INTEGER NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_refs_digest ON refs(digest);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            ''')
+            self.conn.execute(
+                'INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)',
+                ('schema_version', str(self.SCHEMA_VERSION))
+            )
+
+    def object_path(self, digest: str) -> Path:
+        """On-disk location of a blob."""
+        return self.objects_dir / digest[:2] / digest[2:4] / digest
+
+    def has(self, digest: str) -> bool:
+        """True if the blob is stored."""
+        with self._lock:
+            row = self.conn.execute('SELECT 1 FROM blobs WHERE digest = ?', (digest,)).fetchone()
+        return row is not None and self.object_path(digest).exists()
+
+    def put_bytes(self, data: bytes) -> str:
+        """Store bytes (once per distinct content) and return their digest."""
+        digest = digest_bytes(data)
+        if self._touch_existing(digest, len(data)):
+            return digest
+
+        path = self.object_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            self._commit_object(tmp_name, digest, len(data))
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        return digest
+
+    def put_file(self, source: Union[str, Path]) -> str:
+        """Store a file's content and return its digest (the source is left untouched)."""
+        source = Path(source)
+        digest = digest_file(source)
+        size_bytes = source.stat().st_size
+        if self._touch_existing(digest, size_bytes):
+            return digest
+
+        path = self.object_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_name = self._temp_name(path.parent)
+        try:
+            self._clone(source, Path(tmp_name), allow_hardlink=False)
+            self._commit_object(tmp_name, digest, size_bytes)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        return digest
+
+    def adopt(self, path: Union[str, Path]) -> str:
+        """Move a freshly written file into the store and leave a link to its blob in its place."""
+        path = Path(path)
+        digest = self.ref_digest(path)
+        if digest is not None:
+            return digest
+
+        digest = digest_file(path)
+        size_bytes = path.stat().st_size
+        if not self._touch_existing(digest, size_bytes):
+            if self.link_mode in ('auto', 'hardlink'):
+                obj = self.object_path(digest)
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                tmp_name = self._temp_name(obj.parent)
+                try:
+                    # New content: the file itself becomes the object, no bytes are copied
+                    os.link(path, tmp_name)
+                    self._commit_object(tmp_name, digest, size_bytes)
+                    self._record_ref(path, digest)
+                    return digest
+                except OSError as e:
+                    logger.debug(f"Could not link {path} into the blob store ({e}), copying")
+                    if os.path.exists(tmp_name):
+                        os.unlink(tmp_name)
+            self.put_file(path)
+
+        if self.link_mode == 'copy':
+            # The file already holds the blob's bytes
+            self._record_ref(path, digest)
+        else:
+            self.materialize(digest, path)
+        return digest
+
+    def materialize(self, digest: str, dest: Union[str, Path]) -> Path:
+        """Make dest a reflink, hardlink or copy of a stored blob and reference it."""
+        dest = Path(dest)
+        if self.ref_digest(dest) == digest:
+            return dest
+
+        obj = self.object_path(digest)
+        if not obj.exists():
+            raise FileNotFoundError(f"Blob not found: {digest}")
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp_name = self._temp_name(dest.parent, prefix=f".{dest.name}.")
+        try:
+            self._clone(obj, Path(tmp_name), allow_hardlink=True)
+            os.replace(tmp_name, dest)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+        self._record_ref(dest, digest)
+        return dest
+
+    def ref_digest(self, path: Union[str, Path]) -> Optional[str]:
+        """Digest of a materialized path, or None if it is unknown or was modified since."""
+        key = self._ref_key(path)
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT digest, inode, size_bytes, mtime_ns FROM refs WHERE path = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        if (stat.st_ino, stat.st_size, stat.st_mtime_ns) != tuple(row[1:]):
+            return None
+        return row[0]
+
+    def release(self, path: Union[str, Path], unlink: bool = True) -> bool:
+        """Drop the reference held by a materialized path (and delete the file)."""
+        key = self._ref_key(path)
+        with self._lock:
+            with self.conn:
+                row = self.conn.execute('SELECT digest FROM refs WHERE path = ?', (key,)).fetchone()
+                if row is None:
+                    return False
+                self.conn.execute('DELETE FROM refs WHERE path = ?', (key,))
+                self.conn.execute(
+                    'UPDATE blobs SET refcount = refcount - 1, updated_at = ? WHERE digest = ?',
+                    (time.time(), row[0])
+                )
+        if unlink:
+            Path(key).unlink(missing_ok=True)
+        return True
+
+    def gc(self, min_age_seconds: float = 300) -> Dict[str, int]:
+        """Prune references to deleted or replaced files, then delete unreferenced blobs.
+
+        Blobs released less than min_age_seconds ago are kept so a put followed
+        by a materialize in another process is not raced.
+        """
+        with self._lock:
+            stale = []
+            for path, digest, inode, size_bytes, mtime_ns in self.conn.execute(
+                'SELECT path, digest, inode, size_bytes, mtime_ns FROM refs'
+            ).fetchall():
+                try:
+                    stat = os.stat(path)
+                    if (stat.st_ino, stat.st_size, stat.st_mtime_ns) == (inode, size_bytes, mtime_ns):
+                        continue
+                except OSError:
+                    pass
+                stale.append((path, digest))
+
+            now = time.time()
+            with self.conn:
+                self.conn.executemany('DELETE FROM refs WHERE path = ?', [(path,) for path, _ in stale])
+                self.conn.executemany(
+                    'UPDATE blobs SET refcount = refcount - 1, updated_at = ? WHERE digest = ?',
+                    [(now, digest) for _, digest in stale]
+                )
+                unreferenced = self.conn.execute(
+                    'SELECT digest, size_bytes FROM blobs WHERE refcount = 0 AND updated_at <= ?',
+                    (now - min_age_seconds,)
+                ).fetchall()
+                self.conn.executemany(
+                    'DELETE FROM blobs WHERE digest = ?', [(digest,) for digest, _ in unreferenced]
+                )
+
+            for digest, _ in unreferenced:
+                self.object_path(digest).unlink(missing_ok=True)
+
+        result = {
+            'refs_pruned': len(stale),
+            'blobs_removed': len(unreferenced),
+            'bytes_freed': sum(size_bytes for _, size_bytes in unreferenced)
+        }
+        if stale or unreferenced:
+            logger.info(
+                f"Blob store GC pruned {result['refs_pruned']} refs, removed {result['blobs_removed']} blobs "
+                f"({result['bytes_freed']} bytes)"
+            )
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get blob, reference and deduplication statistics."""
+        with self._lock:
+            blobs, physical = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM blobs'
+            ).fetchone()
+            refs, logical = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM refs'
+            ).fetchone()
+            return {
+                **self.stats,
+                'blobs': blobs,
+                'refs': refs,
+                'physical_size_mb': physical / (1024 * 1024),
+                'logical_size_mb': logical / (1024 * 1024),
+                'dedup_ratio': (logical / physical) if physical else 1.0,
+                'link_mode': self.link_mode
+            }
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self.conn.close()
+
+    @staticmethod
+    def _ref_key(path: Union[str, Path]) -> str:
+        return os.path.abspath(path)
+
+    @staticmethod
+    def _temp_name(directory: Path, prefix: str = '.') -> str:
+        """Unused name for a temp file in directory (links cannot target an existing file)."""
+        fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=prefix, suffix='.tmp')
+        os.close(fd)
+        os.unlink(tmp_name)
+        return tmp_name
+
+    def _touch_existing(self, digest: str, size_bytes: int) -> bool:
+        """True if the blob is already stored (and counts the bytes saved)."""
+        with self._lock:
+            if not self.has(digest):
+                return False
+            with self.conn:
+                self.conn.execute('UPDATE blobs SET updated_at = ? WHERE digest = ?', (time.time(), digest))
+            self.stats['bytes_deduplicated'] += size_bytes
+            return True
+
+    def _commit_object(self, tmp_name: str, digest: str, size_bytes: int) -> None:
+        """Rename a fully written temp file into place and register the blob."""
+        os.chmod(tmp_name, 0o444)
+        os.replace(tmp_name, self.object_path(digest))
+        now = time.time()
+        with self._lock:
+            with self.conn:
+                self.conn.execute('''
+                    INSERT INTO blobs (digest, size_bytes, refcount, created_at, updated_at)
+                    VALUES (?, ?, 0, ?, ?)
+                    ON CONFLICT(digest) DO UPDATE SET updated_at = excluded.updated_at
+                ''', (digest, size_bytes, now, now))
+            self.stats['blobs_written'] += 1
+            self.stats['bytes_written'] += size_bytes
+
+    def _record_ref(self, path: Path, digest: str) -> None:
+        """Point path at digest, moving its reference from any previous blob."""
+        key = self._ref_key(path)
+        stat = os.stat(key)
+        now = time.time()
+        with self._lock:
+            with self.conn:
+                previous = self.conn.execute('SELECT digest FROM refs WHERE path = ?', (key,)).fetchone()
+                if previous is not None:
+                    self.conn.execute(
+                        'UPDATE blobs SET refcount = refcount - 1, updated_at = ? WHERE digest = ?',
+                        (now, previous[0])
+                    )
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO refs (path, digest, inode, size_bytes, mtime_ns) VALUES (?, ?, ?, ?, ?)',
+                    (key, digest, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                )
+                self.conn.execute(
+                    'UPDATE blobs SET refcount = refcount + 1, updated_at = ? WHERE digest = ?', (now, digest)
+                )
+
+    def _clone(self, source: Path, dest: Path, allow_hardlink: bool) -> None:
+        """Create dest from source by reflink, hardlink or copy, per link_mode."""
+        if self._reflink_supported:
+            try:
+                with open(source, 'rb') as src, open(dest, 'wb') as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                self.stats['reflinks'] += 1
+                return
+            except OSError as e:
+                dest.unlink(missing_ok=True)
+                if e.errno != errno.EXDEV:
+                    # Not a cross-device pair: the filesystem cannot clone at all
+                    self._reflink_supported = False
+
+        if allow_hardlink and self.link_mode in ('auto', 'hardlink'):
+            try:
+                os.link(source, dest)
+                self.stats['hardlinks'] += 1
+                return
+            except OSError as e:
+                # Cross-device, link count limit or unsupported filesystem
+                logger.debug(f"Hardlink failed ({e}), copying {source}")
+
+        shutil.copyfile(source, dest)
+        self.stats['copies'] += 1
+
+
+_stores: Dict[str, BlobStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_blob_store(root: Union[str, Path] = 'blob_store') -> BlobStore:
+    """Process-wide blob store for a root directory."""
+    key = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = BlobStore(root)
+        return store
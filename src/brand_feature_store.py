@@ -0,0 +1,197 @@
+"""
+Brand Feature Store - Persistent cache of brand reference image features.
+
+validate_brand_consistency used to re-extract visual features and re-run the
+KMeans palette for every reference image on every validation. The store keeps
+those results in SQLite keyed by the sha256 of the file contents, so a reference
+is analysed once and re-analysed only when its bytes change. A per-path
+(mtime, size) table avoids re-hashing unchanged files. Reference colour palettes
+are cached the same way, per (n_colors, accuracy) setting.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_content_hash(path: str) -> str:
+    """sha256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BrandFeatureStore:
+    """SQLite-backed store of reference feature records keyed by content hash."""
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._init_schema()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'hashes_computed': 0,
+            'records_written': 0,
+            'palette_hits': 0,
+            'palette_misses': 0
+        }
+
+    def _init_schema(self) -> None:
+        """Create tables if they do not exist."""
+        with self._lock, self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS features (
+                    content_hash TEXT PRIMARY KEY,
+                    record TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS palettes (
+                    content_hash TEXT NOT NULL,
+                    settings TEXT NOT NULL,
+                    record TEXT NOT NULL,
+                    PRIMARY KEY (content_hash, settings)
+                );
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            ''')
+            self.conn.execute(
+                'INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)',
+                ('schema_version', str(self.SCHEMA_VERSION))
+            )
+
+    def content_hash(self, path: str) -> Optional[str]:
+        """Content hash for a file, re-hashing only when its mtime or size changed."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        key = str(Path(path).resolve())
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT mtime_ns, size, content_hash FROM files WHERE path = ?', (key,)
+            ).fetchone()
+            if row is not None and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+                return row[2]
+
+            try:
+                content_hash = file_content_hash(path)
+            except OSError as e:
+                logger.warning(f"Could not hash {path}: {e}")
+                return None
+            self.stats['hashes_computed'] += 1
+
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO files (path, mtime_ns, size, content_hash) VALUES (?, ?, ?, ?)',
+                        (key, stat.st_mtime_ns, stat.st_size, content_hash)
+                    )
+                    if row is not None and row[2] != content_hash:
+                        # The file changed; drop its old records unless another file shares them
+                        for table in ('features', 'palettes'):
+                            self.conn.execute(f'''
+                                DELETE FROM {table} WHERE content_hash = ?
+                                AND NOT EXISTS (SELECT 1 FROM files WHERE content_hash = ?)
+                            ''', (row[2], row[2]))
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to record hash for {path}: {e}")
+
+            return content_hash
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Stored feature record for a content hash, if any."""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT record FROM features WHERE content_hash = ?', (content_hash,)
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            return json.loads(row[0])
+
+    def put(self, content_hash: str, record: Dict[str, Any]) -> None:
+        """Store (or replace) the feature record for a content hash."""
+        with self._lock:
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO features (content_hash, record) VALUES (?, ?)',
+                        (content_hash, json.dumps(record))
+                    )
+                self.stats['records_written'] += 1
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to store reference features: {e}")
+
+    def get_palette(self, content_hash: str, settings: str) -> Optional[Dict[str, Any]]:
+        """Cached palette record for a content hash and extraction settings, if any."""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT record FROM palettes WHERE content_hash = ? AND settings = ?', (content_hash, settings)
+            ).fetchone()
+            if row is None:
+                self.stats['palette_misses'] += 1
+                return None
+            self.stats['palette_hits'] += 1
+            return json.loads(row[0])
+
+    def put_palette(self, content_hash: str, settings: str, record: Dict[str, Any]) -> None:
+        """Store (or replace) a palette record."""
+        with self._lock:
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO palettes (content_hash, settings, record) VALUES (?, ?, ?)',
+                        (content_hash, settings, json.dumps(record))
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to store palette: {e}")
+
+    def clear(self) -> None:
+        """Delete every stored record and file hash."""
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM features')
+            self.conn.execute('DELETE FROM palettes')
+            self.conn.execute('DELETE FROM files')
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store hit/miss statistics."""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            records = self.conn.execute('SELECT COUNT(*) FROM features').fetchone()[0]
+            return {
+                **self.stats,
+                'records': records,
+                'hit_rate_percent': (self.stats['hits'] / lookups * 100) if lookups else 0.0
+            }
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self.conn.close()
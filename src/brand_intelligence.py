@@ -7,7 +7,7 @@ import cv2
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter, ImageStat
 import colorsys
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics.pairwise import cosine_similarity
 import json
 import os
@@ -18,6 +18,28 @@ import logging
 from datetime import datetime
 import hashlib
 
+try:
+    from .brand_feature_store import BrandFeatureStore
+    from .image_analysis import ImageAnalysisContext, get_analysis_context
+except ImportError:
+    from brand_feature_store import BrandFeatureStore
+    from image_analysis import ImageAnalysisContext, get_analysis_context
+
+# 8-neighbourhood for LBP codes, clockwise from top-left
+LBP_NEIGHBOR_OFFSETS = [
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, 1), (1, 1), (1, 0),
+    (1, -1), (0, -1)
+]
+
+# Palette extraction speed/accuracy presets. "exact" is the original full-resolution
+# KMeans; the others bound the work regardless of image size.
+PALETTE_ACCURACY_PRESETS = {
+    "exact": {"max_samples": None, "quantize": False, "minibatch": False, "n_init": 10},
+    "balanced": {"max_samples": 100000, "quantize": False, "minibatch": False, "n_init": 3},
+    "fast": {"max_samples": None, "quantize": True, "minibatch": True, "n_init": 3},
+}
+
 
 @dataclass
 class ColorPalette:
@@ -71,7 +93,11 @@ class VisualFeatures:
 class BrandIntelligenceEngine:
     """Advanced computer vision engine for brand intelligence"""
     
-    def __init__(self, brand_assets_dir: str = "brand_assets"):
+    def __init__(self, brand_assets_dir: str = "brand_assets", palette_accuracy: str = "balanced"):
+        if palette_accuracy not in PALETTE_ACCURACY_PRESETS:
+            raise ValueError(f"Unknown palette accuracy '{palette_accuracy}', "
+                             f"expected one of {sorted(PALETTE_ACCURACY_PRESETS)}")
+        self.palette_accuracy = palette_accuracy
         self.brand_assets_dir = Path(brand_assets_dir)
         self.brand_assets_dir.mkdir(exist_ok=True)
         self.logger = logging.getLogger(__name__)
@@ -80,6 +106,9 @@ class BrandIntelligenceEngine:
         self.brand_profile_path = self.brand_assets_dir / "brand_profile.json"
         self.brand_profile = self._load_brand_profile()
         
+        # Reference image features and palettes, computed once per file content
+        self.feature_store = BrandFeatureStore(self.brand_assets_dir / "reference_features.db")
+        
         # Quality standards
         self.quality_standards = {
             "min_resolution": (800, 600),
@@ -110,73 +139,35 @@ class BrandIntelligenceEngine:
         with open(self.brand_profile_path, 'w') as f:
             json.dump(self.brand_profile, f, indent=2)
     
-    def extract_color_palette(self, image_path: str, n_colors: int = 8) -> ColorPalette:
-        """Extract dominant color palette with advanced analysis"""
+    def extract_color_palette(self, image_path: str, n_colors: int = 8,
+                              context: Optional[ImageAnalysisContext] = None,
+                              accuracy: Optional[str] = None, persist: bool = False) -> ColorPalette:
+        """Extract dominant color palette with advanced analysis
+        
+        With persist=True the palette is cached in the feature store per file
+        content and extraction settings. Only brand reference images use this;
+        one-off target images would grow the store without bound.
+        """
         try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Could not load image: {image_path}")
-            
-            # Convert to RGB
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Reshape for clustering
-            pixels = image_rgb.reshape(-1, 3)
-            
-            # Remove very dark/light pixels for better color extraction
-            mask = np.all(pixels > 20, axis=1) & np.all(pixels < 235, axis=1)
-            filtered_pixels = pixels[mask]
-            
-            if len(filtered_pixels) < 100:
-                filtered_pixels = pixels  # Fallback to all pixels
-            
-            # K-means clustering for dominant colors
-            kmeans = KMeans(n_clusters=min(n_colors, len(filtered_pixels)), random_state=42, n_init=10)
-            kmeans.fit(filtered_pixels)
-            
-            colors = kmeans.cluster_centers_.astype(int)
-            
-            # Calculate color percentages
-            labels = kmeans.labels_
-            total_pixels = len(labels)
-            percentages = []
-            
-            for i in range(len(colors)):
-                count = np.sum(labels == i)
-                percentages.append(count / total_pixels * 100)
-            
-            # Sort by percentage
-            sorted_indices = np.argsort(percentages)[::-1]
-            colors = colors[sorted_indices]
-            percentages = [percentages[i] for i in sorted_indices]
-            
-            # Convert to hex
-            hex_colors = [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in colors]
-            
-            # Analyze color harmony
-            harmony = self._analyze_color_harmony(colors)
-            
-            # Analyze temperature
-            temperature = self._analyze_color_temperature(colors, percentages)
-            
-            # Analyze saturation and brightness
-            saturation_level = self._analyze_saturation(colors, percentages)
-            brightness_level = self._analyze_brightness(colors, percentages)
-            
-            # Calculate accessibility score
-            accessibility_score = self._calculate_accessibility_score(colors)
-            
-            return ColorPalette(
-                dominant_colors=[tuple(color) for color in colors],
-                color_percentages=percentages,
-                hex_colors=hex_colors,
-                color_harmony=harmony,
-                temperature=temperature,
-                saturation_level=saturation_level,
-                brightness_level=brightness_level,
-                accessibility_score=accessibility_score
-            )
+            accuracy = accuracy or self.palette_accuracy
+            if accuracy not in PALETTE_ACCURACY_PRESETS:
+                raise ValueError(f"Unknown palette accuracy '{accuracy}'")
+            
+            settings = f"{n_colors}:{accuracy}"
+            content_hash = self.feature_store.content_hash(image_path) if persist and image_path else None
+            if content_hash:
+                cached = self.feature_store.get_palette(content_hash, settings)
+                if cached is not None:
+                    return self._decode_palette(cached)
+            
+            # Decoded once and shared with the other analyses of this image
+            context = context or get_analysis_context(image_path)
+            colors, percentages = self._cluster_palette_colors(context.rgb, n_colors, accuracy)
+            palette = self._build_palette(colors, percentages)
+            
+            if content_hash:
+                self.feature_store.put_palette(content_hash, settings, self._encode_palette(palette))
+            return palette
             
         except Exception as e:
             self.logger.error(f"Error extracting color palette: {e}")
@@ -192,6 +183,89 @@ class BrandIntelligenceEngine:
                 accessibility_score=50.0
             )
     
+    def _cluster_palette_colors(self, image_rgb: np.ndarray, n_colors: int,
+                                accuracy: str = "exact") -> Tuple[np.ndarray, List[float]]:
+        """Cluster pixels into dominant colors, sorted by share of the image"""
+        settings = PALETTE_ACCURACY_PRESETS[accuracy]
+        
+        # Stratified subsample: a regular spatial grid keeps every region represented
+        max_samples = settings["max_samples"]
+        h, w = image_rgb.shape[:2]
+        if max_samples and h * w > max_samples:
+            step = int(np.ceil(np.sqrt(h * w / max_samples)))
+            image_rgb = image_rgb[step // 2::step, step // 2::step]
+        
+        # Reshape for clustering
+        pixels = image_rgb.reshape(-1, 3)
+        
+        # Remove very dark/light pixels for better color extraction
+        mask = np.all(pixels > 20, axis=1) & np.all(pixels < 235, axis=1)
+        filtered_pixels = pixels[mask]
+        
+        if len(filtered_pixels) < 100:
+            filtered_pixels = pixels  # Fallback to all pixels
+        
+        weights = None
+        if settings["quantize"]:
+            # 5 bits per channel: cluster the occupied histogram bins, weighted by pixel count
+            quantized = (filtered_pixels >> 3).astype(np.int32)
+            codes = (quantized[:, 0] << 10) | (quantized[:, 1] << 5) | quantized[:, 2]
+            counts = np.bincount(codes, minlength=1 << 15)
+            occupied = np.nonzero(counts)[0]
+            filtered_pixels = np.stack([occupied >> 10, (occupied >> 5) & 31, occupied & 31], axis=1) * 8 + 4
+            weights = counts[occupied].astype(float)
+        
+        # K-means clustering for dominant colors
+        n_clusters = min(n_colors, len(filtered_pixels))
+        if settings["minibatch"]:
+            kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=settings["n_init"], batch_size=4096)
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=settings["n_init"])
+        kmeans.fit(filtered_pixels, sample_weight=weights)
+        
+        colors = kmeans.cluster_centers_.astype(int)
+        
+        # Calculate color percentages
+        counts = np.bincount(kmeans.labels_, weights=weights, minlength=len(colors))
+        total_pixels = counts.sum()
+        percentages = [count / total_pixels * 100 for count in counts]
+        
+        # Sort by percentage
+        sorted_indices = np.argsort(percentages)[::-1]
+        colors = colors[sorted_indices]
+        percentages = [percentages[i] for i in sorted_indices]
+        
+        return colors, percentages
+    
+    def _build_palette(self, colors: np.ndarray, percentages: List[float]) -> ColorPalette:
+        """Analyze clustered colors into a ColorPalette"""
+        # Convert to hex
+        hex_colors = [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in colors]
+        
+        # Analyze color harmony
+        harmony = self._analyze_color_harmony(colors)
+        
+        # Analyze temperature
+        temperature = self._analyze_color_temperature(colors, percentages)
+        
+        # Analyze saturation and brightness
+        saturation_level = self._analyze_saturation(colors, percentages)
+        brightness_level = self._analyze_brightness(colors, percentages)
+        
+        # Calculate accessibility score
+        accessibility_score = self._calculate_accessibility_score(colors)
+        
+        return ColorPalette(
+            dominant_colors=[tuple(color) for color in colors],
+            color_percentages=percentages,
+            hex_colors=hex_colors,
+            color_harmony=harmony,
+            temperature=temperature,
+            saturation_level=saturation_level,
+            brightness_level=brightness_level,
+            accessibility_score=accessibility_score
+        )
+    
     def _analyze_color_harmony(self, colors: np.ndarray) -> str:
         """Analyze color harmony relationships"""
         if len(colors) < 2:
@@ -340,21 +414,19 @@ class BrandIntelligenceEngine:
         
         return 0.2126 * r_lin + 0.7152 * g_lin + 0.0722 * b_lin
     
-    def assess_image_quality(self, image_path: str) -> ImageQuality:
+    def assess_image_quality(self, image_path: str,
+                             context: Optional[ImageAnalysisContext] = None) -> ImageQuality:
         """Comprehensive image quality assessment"""
         try:
             # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Could not load image: {image_path}")
-            
-            pil_image = Image.open(image_path)
+            context = context or get_analysis_context(image_path)
+            image = context.bgr
             
             # Basic metrics
             height, width = image.shape[:2]
             
             # 1. Sharpness (using Laplacian variance)
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            gray = context.gray
             sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
             
             # 2. Brightness
@@ -364,7 +436,7 @@ class BrandIntelligenceEngine:
             contrast = np.std(gray)
             
             # 4. Saturation
-            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            hsv = context.hsv
             saturation = np.mean(hsv[:, :, 1])
             
             # 5. Noise level (using high-frequency content)
@@ -379,7 +451,7 @@ class BrandIntelligenceEngine:
             resolution_adequacy = min(resolution_adequacy, 100)
             
             # 8. Composition score
-            composition_score = self._analyze_composition(image, gray)
+            composition_score = self._analyze_composition(image, gray, context.edges(50, 150))
             
             # Normalize scores to 0-100
             sharpness_score = min(sharpness / 100 * 100, 100)
@@ -487,7 +559,7 @@ class BrandIntelligenceEngine:
         
         return min(artifact_score, 100)
     
-    def _analyze_composition(self, image: np.ndarray, gray: np.ndarray) -> float:
+    def _analyze_composition(self, image: np.ndarray, gray: np.ndarray, edges: Optional[np.ndarray] = None) -> float:
         """Analyze image composition quality"""
         h, w = gray.shape
         
@@ -495,7 +567,8 @@ class BrandIntelligenceEngine:
         thirds_score = self._check_rule_of_thirds(gray)
         
         # Edge distribution
-        edges = cv2.Canny(gray, 50, 150)
+        if edges is None:
+            edges = cv2.Canny(gray, 50, 150)
         edge_score = self._analyze_edge_distribution(edges)
         
         # Symmetry
@@ -606,27 +679,26 @@ class BrandIntelligenceEngine:
         
         return focus_score
     
-    def extract_visual_features(self, image_path: str) -> VisualFeatures:
+    def extract_visual_features(self, image_path: str,
+                                context: Optional[ImageAnalysisContext] = None) -> VisualFeatures:
         """Extract comprehensive visual features for similarity analysis"""
         try:
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Could not load image: {image_path}")
-            
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            context = context or get_analysis_context(image_path)
+            image = context.bgr
+            gray = context.gray
             
             # 1. Color histogram features
-            hist_b = cv2.calcHist([image], [0], None, [32], [0, 256])
-            hist_g = cv2.calcHist([image], [1], None, [32], [0, 256])
-            hist_r = cv2.calcHist([image], [2], None, [32], [0, 256])
+            hist_b = context.bgr_histogram(0, 32)
+            hist_g = context.bgr_histogram(1, 32)
+            hist_r = context.bgr_histogram(2, 32)
             color_histogram = np.concatenate([hist_b.flatten(), hist_g.flatten(), hist_r.flatten()])
             color_histogram = color_histogram / np.sum(color_histogram)  # Normalize
             
             # 2. Texture features (using Local Binary Patterns)
-            texture_features = self._extract_lbp_features(gray)
+            texture_features = context.memoize('lbp_histogram', lambda: self._extract_lbp_features(gray))
             
             # 3. Edge features
-            edges = cv2.Canny(gray, 50, 150)
+            edges = context.edges(50, 150)
             edge_features = self._extract_edge_features(edges)
             
             # 4. Composition features
@@ -669,26 +741,20 @@ class BrandIntelligenceEngine:
     
     def _extract_lbp_features(self, gray: np.ndarray) -> np.ndarray:
         """Extract Local Binary Pattern features for texture analysis"""
-        # Simple LBP implementation
+        # Vectorized LBP: compare each shifted neighbour plane against the centre plane
         h, w = gray.shape
         lbp = np.zeros_like(gray)
         
-        for i in range(1, h-1):
-            for j in range(1, w-1):
-                center = gray[i, j]
-                binary_string = ''
-                
-                # 8 neighbors
-                neighbors = [
-                    gray[i-1, j-1], gray[i-1, j], gray[i-1, j+1],
-                    gray[i, j+1], gray[i+1, j+1], gray[i+1, j],
-                    gray[i+1, j-1], gray[i, j-1]
-                ]
-                
-                for neighbor in neighbors:
-                    binary_string += '1' if neighbor >= center else '0'
-                
-                lbp[i, j] = int(binary_string, 2)
+        if h > 2 and w > 2:
+            center = gray[1:h-1, 1:w-1]
+            codes = np.zeros(center.shape, dtype=np.uint8)
+            
+            # First neighbour is the most significant bit
+            for bit, (dy, dx) in enumerate(LBP_NEIGHBOR_OFFSETS):
+                neighbor = gray[1+dy:h-1+dy, 1+dx:w-1+dx]
+                codes |= (neighbor >= center).astype(np.uint8) << (7 - bit)
+            
+            lbp[1:h-1, 1:w-1] = codes
         
         # Create histogram of LBP patterns
         hist, _ = np.histogram(lbp.flatten(), bins=256, range=(0, 256))
@@ -844,9 +910,9 @@ class BrandIntelligenceEngine:
             composition_similarities = []
             
             for ref_path in brand_reference_images:
-                if os.path.exists(ref_path):
-                    ref_features = self.extract_visual_features(ref_path)
-                    ref_palette = self.extract_color_palette(ref_path)
+                reference = self.get_reference_features(ref_path)
+                if reference is not None:
+                    ref_features, ref_palette = reference
                     
                     # Color consistency
                     color_sim = self._compare_color_palettes(target_palette, ref_palette)
@@ -943,6 +1009,79 @@ class BrandIntelligenceEngine:
         
         return np.mean(similarities)
     
+    def get_reference_features(self, image_path: str) -> Optional[Tuple[VisualFeatures, ColorPalette]]:
+        """Visual features and palette for a reference image, from the feature store when unchanged"""
+        content_hash = self.feature_store.content_hash(image_path)
+        if content_hash is None:
+            return None
+        
+        # The palette has its own cache entry keyed by this engine's extraction settings
+        palette = self.extract_color_palette(image_path, persist=True)
+        
+        record = self.feature_store.get(content_hash)
+        if record is not None:
+            return self._decode_reference_record(record), palette
+        
+        features = self.extract_visual_features(image_path)
+        
+        # Extraction failures return placeholder results; never persist those
+        if features.feature_hash != "error":
+            self.feature_store.put(content_hash, self._encode_reference_record(features))
+        
+        return features, palette
+    
+    @staticmethod
+    def _encode_reference_record(features: VisualFeatures) -> Dict[str, Any]:
+        """Convert visual features to a JSON-serializable record"""
+        def encode_array(array: np.ndarray) -> Dict[str, Any]:
+            return {"dtype": str(array.dtype), "values": array.tolist()}
+        
+        return {
+            "visual": {
+                "color_histogram": encode_array(features.color_histogram),
+                "texture_features": encode_array(features.texture_features),
+                "edge_features": encode_array(features.edge_features),
+                "composition_features": {k: float(v) for k, v in features.composition_features.items()},
+                "feature_hash": features.feature_hash
+            }
+        }
+    
+    @staticmethod
+    def _encode_palette(palette: ColorPalette) -> Dict[str, Any]:
+        """Convert a palette to a JSON-serializable record"""
+        return {
+            "dominant_colors": [[int(c) for c in color] for color in palette.dominant_colors],
+            "color_percentages": [float(p) for p in palette.color_percentages],
+            "hex_colors": list(palette.hex_colors),
+            "color_harmony": palette.color_harmony,
+            "temperature": palette.temperature,
+            "saturation_level": palette.saturation_level,
+            "brightness_level": palette.brightness_level,
+            "accessibility_score": float(palette.accessibility_score)
+        }
+    
+    @staticmethod
+    def _decode_palette(record: Dict[str, Any]) -> ColorPalette:
+        """Rebuild a palette from a stored record"""
+        palette_data = dict(record)
+        palette_data["dominant_colors"] = [tuple(color) for color in palette_data["dominant_colors"]]
+        return ColorPalette(**palette_data)
+    
+    @staticmethod
+    def _decode_reference_record(record: Dict[str, Any]) -> VisualFeatures:
+        """Rebuild visual features from a stored record"""
+        def decode_array(encoded: Dict[str, Any]) -> np.ndarray:
+            return np.asarray(encoded["values"], dtype=encoded["dtype"])
+        
+        visual = record["visual"]
+        return VisualFeatures(
+            color_histogram=decode_array(visual["color_histogram"]),
+            texture_features=decode_array(visual["texture_features"]),
+            edge_features=decode_array(visual["edge_features"]),
+            composition_features=visual["composition_features"],
+            feature_hash=visual["feature_hash"]
+        )
+    
     def _get_brand_reference_images(self) -> List[str]:
         """Get list of brand reference images"""
         reference_patterns = ["brand_*.jpg", "brand_*.png", "logo_*.jpg", "logo_*.png", "reference_*.jpg", "reference_*.png"]
@@ -958,9 +1097,8 @@ class BrandIntelligenceEngine:
     def learn_from_approved_asset(self, image_path: str, asset_metadata: Dict[str, Any] = None):
         """Learn brand patterns from approved assets"""
         try:
-            # Extract features
-            features = self.extract_visual_features(image_path)
-            palette = self.extract_color_palette(image_path)
+            # Extract features (stored so the asset can serve as a reference cheaply)
+            features, palette = self.get_reference_features(image_path)
             quality = self.assess_image_quality(image_path)
             
             # Update brand profile
@@ -0,0 +1,266 @@
+"""
+Cost Ledger - Buffered, append-only API cost tracking backed by SQLite.
+
+update_cost_tracking used to read, mutate and rewrite costs.json on every API
+call, which was O(calls) file I/O and lost updates when campaigns ran
+concurrently. The ledger buffers events in-process and flushes them in batches
+to a WAL-mode SQLite database. Each flush appends the raw events and updates
+per-service and per-day aggregate tables in the same transaction, so readers
+get totals without scanning the event log. Old events are compacted away
+periodically; the aggregates are kept.
+
+costs.json is still written as a snapshot after each flush for tools that read
+it directly.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LEGACY_SERVICE = '__legacy__'
+
+
+class CostLedger:
+    """Process-local buffer in front of a shared SQLite cost ledger."""
+
+    def __init__(
+        self,
+        db_path: str = 'costs.db',
+        snapshot_path: Optional[str] = 'costs.json',
+        flush_every: int = 25,
+        flush_interval_seconds: float = 2.0,
+        retain_days: int = 90,
+        compact_every_flushes: int = 200
+    ):
+        self.db_path = Path(db_path)
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.flush_every = flush_every
+        self.flush_interval_seconds = flush_interval_seconds
+        self.retain_days = retain_days
+        self.compact_every_flushes = compact_every_flushes
+
+        self._buffer: List[Tuple[float, str, float, int]] = []
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self._flush_count = 0
+
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._init_schema()
+        self._migrate_legacy_snapshot()
+
+        atexit.register(self.close)
+
+    def _init_schema(self) -> None:
+        """Create the event log and aggregate tables."""
+        with self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS cost_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL NOT NULL,
+                    service TEXT NOT NULL,
+                    cost REAL NOT NULL,
+                    tokens INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_cost_events_ts ON cost_events(ts);
+                CREATE TABLE IF NOT EXISTS cost_totals (
+                    service TEXT PRIMARY KEY,
+                    cost REAL NOT NULL DEFAULT 0,
+                    calls INTEGER NOT NULL DEFAULT 0,
+                    tokens INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS cost_daily (
+                    day TEXT NOT NULL,
+                    service TEXT NOT NULL,
+                    cost REAL NOT NULL DEFAULT 0,
+                    calls INTEGER NOT NULL DEFAULT 0,
+                    tokens INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, service)
+                );
+            ''')
+
+    def _migrate_legacy_snapshot(self) -> None:
+        """Seed an empty ledger from an existing costs.json so history is not lost."""
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return
+        if self.conn.execute('SELECT COUNT(*) FROM cost_totals').fetchone()[0]:
+            return
+
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                legacy = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Could not migrate legacy cost file: {e}")
+            return
+
+        rows = []
+        for service, data in legacy.items():
+            if isinstance(data, dict) and 'cost' in data:
+                rows.append((service, float(data['cost']), int(data.get('calls', 0)), int(data.get('tokens', 0))))
+
+        # Whatever the per-service entries do not account for is kept as a residual row
+        residual_cost = float(legacy.get('total_cost', 0.0)) - sum(r[1] for r in rows)
+        residual_calls = int(legacy.get('api_calls', 0)) - sum(r[2] for r in rows)
+        if residual_cost or residual_calls:
+            rows.append((LEGACY_SERVICE, residual_cost, residual_calls, 0))
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO cost_totals (service, cost, calls, tokens) VALUES (?, ?, ?, ?)', rows
+            )
+        logger.info(f"Migrated cost totals from {self.snapshot_path}")
+
+    def record(self, service: str, cost: float, tokens: int = 0) -> None:
+        """Buffer one API call; flushed in batches rather than per call."""
+        with self._lock:
+            self._buffer.append((time.time(), service, cost, tokens))
+            if len(self._buffer) >= self.flush_every:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval_seconds, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_flush(self) -> None:
+        """Flush buffered events once the flush interval has elapsed."""
+        with self._lock:
+            self._timer = None
+            self.flush()
+
+    def flush(self) -> int:
+        """Write buffered events and their aggregate deltas in one transaction."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if not self._buffer:
+                return 0
+            events, self._buffer = self._buffer, []
+
+            totals: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0, 0])
+            daily: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0.0, 0, 0])
+            for ts, service, cost, tokens in events:
+                day = datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
+                for bucket in (totals[service], daily[(day, service)]):
+                    bucket[0] += cost
+                    bucket[1] += 1
+                    bucket[2] += tokens
+
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        'INSERT INTO cost_events (ts, service, cost, tokens) VALUES (?, ?, ?, ?)', events
+                    )
+                    self.conn.executemany('''
+                        INSERT INTO cost_totals (service, cost, calls, tokens) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(service) DO UPDATE SET
+                            cost = cost + excluded.cost, calls = calls + excluded.calls, tokens = tokens + excluded.tokens
+                    ''', [(service, *values) for service, values in totals.items()])
+                    self.conn.executemany('''
+                        INSERT INTO cost_daily (day, service, cost, calls, tokens) VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(day, service) DO UPDATE SET
+                            cost = cost + excluded.cost, calls = calls + excluded.calls, tokens = tokens + excluded.tokens
+                    ''', [(day, service, *values) for (day, service), values in daily.items()])
+            except sqlite3.Error as e:
+                logger.error(f"Failed to flush {len(events)} cost events: {e}")
+                self._buffer = events + self._buffer
+                return 0
+
+            self._flush_count += 1
+            if self.compact_every_flushes and self._flush_count % self.compact_every_flushes == 0:
+                self.compact()
+
+            self._write_snapshot()
+            return len(events)
+
+    def compact(self, retain_days: Optional[int] = None) -> int:
+        """Drop raw events older than the retention window; aggregates are unaffected."""
+        retain_days = self.retain_days if retain_days is None else retain_days
+        cutoff = time.time() - retain_days * 86400
+        with self._lock:
+            with self.conn:
+                deleted = self.conn.execute('DELETE FROM cost_events WHERE ts < ?', (cutoff,)).rowcount
+        if deleted:
+            logger.info(f"Compacted {deleted} cost events older than {retain_days} days")
+        return deleted
+
+    def get_totals(self) -> Dict[str, Any]:
+        """Aggregate totals in the legacy costs.json shape."""
+        with self._lock:
+            self.flush()
+            return self._read_totals()
+
+    def _read_totals(self) -> Dict[str, Any]:
+        """Read the per-service aggregate table (O(services), not O(events))."""
+        rows = self.conn.execute('SELECT service, cost, calls, tokens FROM cost_totals').fetchall()
+
+        totals: Dict[str, Any] = {'total_cost': 0.0, 'api_calls': 0}
+        for service, cost, calls, tokens in rows:
+            totals['total_cost'] += cost
+            totals['api_calls'] += calls
+            if service != LEGACY_SERVICE:
+                totals[service] = {'cost': cost, 'calls': calls, 'tokens': tokens}
+        return totals
+
+    def get_daily_costs(self, days: int = 7) -> List[Dict[str, Any]]:
+        """Per-day cost and call totals for the most recent days."""
+        since = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        with self._lock:
+            self.flush()
+            rows = self.conn.execute('''
+                SELECT day, SUM(cost), SUM(calls), SUM(tokens) FROM cost_daily
+                WHERE day >= ? GROUP BY day ORDER BY day
+            ''', (since,)).fetchall()
+        return [{'date': day, 'cost': cost, 'calls': calls, 'tokens': tokens} for day, cost, calls, tokens in rows]
+
+    def _write_snapshot(self) -> None:
+        """Atomically rewrite costs.json from the aggregates for direct readers."""
+        if self.snapshot_path is None:
+            return
+
+        snapshot = self._read_totals()
+        tmp_name = None
+        try:
+            fd, tmp_name = tempfile.mkstemp(dir=self.snapshot_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp_name, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Failed to write cost snapshot: {e}")
+            if tmp_name and os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+
+    def close(self) -> None:
+        """Flush pending events and close the database."""
+        with self._lock:
+            try:
+                self.flush()
+                self.conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # Already closed
+
+
+_ledger: Optional[CostLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_cost_ledger() -> CostLedger:
+    """Process-wide cost ledger."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = CostLedger()
+        return _ledger
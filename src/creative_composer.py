@@ -2,25 +2,118 @@
 Creative Composer - Combines base images with text overlays and brand elements.
 """
 
+import hashlib
 import logging
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, Tuple, Optional, Hashable
 from PIL import Image, ImageDraw, ImageFont, ImageEnhance
 import textwrap
 
 try:
     from .utils import calculate_dimensions, sanitize_filename
+    from .text_layout import get_layout_engine
 except ImportError:
     from utils import calculate_dimensions, sanitize_filename
+    from text_layout import get_layout_engine
 
 logger = logging.getLogger(__name__)
 
 
+class ImageMemoryCache:
+    """Byte-bounded LRU cache of decoded PIL images.
+    
+    Cached images are shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, max_size_mb: int = 256):
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.entries: "OrderedDict[Hashable, Tuple[Image.Image, int]]" = OrderedDict()
+        self.current_size = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+    
+    @staticmethod
+    def image_size_bytes(image: Image.Image) -> int:
+        """Approximate in-memory size of a decoded image."""
+        return image.width * image.height * len(image.getbands())
+    
+    def get(self, key: Hashable) -> Optional[Image.Image]:
+        """Get an image and mark it most recently used."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+    
+    def put(self, key: Hashable, image: Image.Image) -> None:
+        """Store an image, evicting least recently used entries over the byte budget."""
+        size_bytes = self.image_size_bytes(image)
+        if size_bytes > self.max_size_bytes:
+            return
+        
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.current_size -= previous[1]
+            
+            self.entries[key] = (image, size_bytes)
+            self.current_size += size_bytes
+            
+            while self.current_size > self.max_size_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.current_size -= evicted_bytes
+                self.stats['evictions'] += 1
+    
+    def clear(self) -> None:
+        """Drop every cached image."""
+        with self._lock:
+            self.entries.clear()
+            self.current_size = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate and memory usage."""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate_percent': (self.stats['hits'] / lookups * 100) if lookups else 0.0,
+                'entries': len(self.entries),
+                'current_size_mb': self.current_size / (1024 * 1024),
+                'max_size_mb': self.max_size_bytes / (1024 * 1024)
+            }
+
+
+# Process-wide caches so every composer (one per region/campaign) shares decodes and resizes
+_decoded_image_cache = ImageMemoryCache(max_size_mb=int(os.getenv('COMPOSER_DECODE_CACHE_MB', '256')))
+_resized_image_cache = ImageMemoryCache(max_size_mb=int(os.getenv('COMPOSER_RESIZE_CACHE_MB', '256')))
+
+# Upper bound on memoized file hashes per composer
+CONTENT_KEY_CACHE_SIZE = 4096
+
+
 class CreativeComposer:
     """Composes final creative assets with text overlays and brand elements."""
     
-    def __init__(self):
-        self.font_cache = {}
+    def __init__(
+        self,
+        decoded_cache: Optional[ImageMemoryCache] = None,
+        resized_cache: Optional[ImageMemoryCache] = None
+    ):
+        self.layout_engine = get_layout_engine()
+        self.decoded_cache = decoded_cache if decoded_cache is not None else _decoded_image_cache
+        self.resized_cache = resized_cache if resized_cache is not None else _resized_image_cache
+        # (path, mtime_ns, size) -> content hash, so unchanged files are not re-hashed
+        self._content_keys: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
         logger.info("Creative composer initialized")
     
     def compose_creative(
@@ -35,6 +128,35 @@ class CreativeComposer:
         # Load and resize base image
         base_image = self._load_and_resize_image(base_image_path, aspect_ratio)
         
+        return self._compose_on_base(base_image, campaign_brief, product, aspect_ratio)
+    
+    def compose_creative_from_image(
+        self,
+        base_image: Optional[Image.Image],
+        campaign_brief: Dict[str, Any],
+        product: Dict[str, Any],
+        aspect_ratio: str
+    ) -> Image.Image:
+        """Compose a final creative from an already decoded RGB base image."""
+        
+        target_size = calculate_dimensions(aspect_ratio)
+        
+        if base_image is None:
+            resized = Image.new('RGB', target_size, color='#f0f0f0')
+        else:
+            resized = self._cached_resize(base_image, target_size)
+        
+        return self._compose_on_base(resized, campaign_brief, product, aspect_ratio)
+    
+    def _compose_on_base(
+        self,
+        base_image: Image.Image,
+        campaign_brief: Dict[str, Any],
+        product: Dict[str, Any],
+        aspect_ratio: str
+    ) -> Image.Image:
+        """Apply overlays, logo and brand styling to a resized base image."""
+        
         # Create a copy to work with
         creative = base_image.copy()
         
@@ -50,32 +172,92 @@ class CreativeComposer:
         logger.info(f"Composed creative for {product['name']} in {aspect_ratio}")
         return creative
     
-    def _load_and_resize_image(self, image_path: Path, aspect_ratio: str) -> Image.Image:
-        """Load and resize image to target aspect ratio."""
+    def load_base_image(self, image_path: Path) -> Optional[Image.Image]:
+        """Decode a base image to RGB, returning None if it cannot be read.
+        
+        Decoded images are cached by content hash and shared; do not modify them.
+        """
         
         try:
-            # Load image
+            content_key = self._content_key(image_path)
+            cached = self.decoded_cache.get(content_key)
+            if cached is not None:
+                return cached
+            
             image = Image.open(image_path)
             
             # Convert to RGB if necessary
             if image.mode != 'RGB':
                 image = image.convert('RGB')
+            else:
+                image.load()
             
-            # Calculate target dimensions
-            target_width, target_height = calculate_dimensions(aspect_ratio)
-            
-            # Resize image while maintaining aspect ratio
-            image = self._smart_resize(image, (target_width, target_height))
-            
+            image.info['content_key'] = content_key
+            self.decoded_cache.put(content_key, image)
             return image
             
         except Exception as e:
             logger.error(f"Failed to load image {image_path}: {e}")
-            
+            return None
+    
+    def _content_key(self, image_path: Path) -> str:
+        """Hash of the file contents, memoized on (path, mtime, size)."""
+        stat = os.stat(image_path)
+        identity = (str(image_path), stat.st_mtime_ns, stat.st_size)
+        
+        content_key = self._content_keys.get(identity)
+        if content_key is not None:
+            self._content_keys.move_to_end(identity)
+        else:
+            digest = hashlib.blake2b(digest_size=16)
+            with open(image_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            content_key = digest.hexdigest()
+            self._content_keys[identity] = content_key
+            while len(self._content_keys) > CONTENT_KEY_CACHE_SIZE:
+                self._content_keys.popitem(last=False)
+        
+        return content_key
+    
+    def _load_and_resize_image(self, image_path: Path, aspect_ratio: str) -> Image.Image:
+        """Load and resize image to target aspect ratio."""
+        
+        # Calculate target dimensions
+        target_width, target_height = calculate_dimensions(aspect_ratio)
+        
+        image = self.load_base_image(image_path)
+        
+        if image is None:
             # Create fallback image
-            target_width, target_height = calculate_dimensions(aspect_ratio)
-            fallback = Image.new('RGB', (target_width, target_height), color='#f0f0f0')
-            return fallback
+            return Image.new('RGB', (target_width, target_height), color='#f0f0f0')
+        
+        # Resize image while maintaining aspect ratio
+        return self._cached_resize(image, (target_width, target_height))
+    
+    def _cached_resize(self, image: Image.Image, target_size: Tuple[int, int]) -> Image.Image:
+        """Smart-resize through the (content hash, target size) cache when the image has a key."""
+        
+        content_key = image.info.get('content_key')
+        if content_key is None:
+            return self._smart_resize(image, target_size)
+        
+        cache_key = (content_key, target_size)
+        resized = self.resized_cache.get(cache_key)
+        if resized is None:
+            resized = self._smart_resize(image, target_size)
+            # PIL copies info on resize; the key identifies the source, not this result
+            resized.info.pop('content_key', None)
+            self.resized_cache.put(cache_key, resized)
+        return resized
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get decode, resize and text layout cache metrics."""
+        return {
+            'decoded_images': self.decoded_cache.get_stats(),
+            'resized_images': self.resized_cache.get_stats(),
+            'text_layouts': self.layout_engine.get_stats()
+        }
     
     def _smart_resize(self, image: Image.Image, target_size: Tuple[int, int]) -> Image.Image:
         """Resize image intelligently - crop to fit target aspect ratio."""
@@ -168,41 +350,16 @@ class CreativeComposer:
     ) -> None:
         """Draw text within a specified area with automatic wrapping and sizing."""
         
-        # Calculate initial font size
-        font_size = int(min(area['width'], area['height']) * font_size_ratio)
-        font = self._get_font(font_size, font_weight)
-        
-        # Wrap text to fit area width
-        wrapped_text = self._wrap_text(text, font, area['width'], draw)
-        
-        # Calculate total text height
-        line_height = font_size * 1.2
-        total_height = len(wrapped_text) * line_height
+        # Wrapping and auto-fit are memoized per (text, weight, ratio, box size)
+        layout = self.layout_engine.layout(
+            text, area['width'], area['height'], font_size_ratio, font_weight
+        )
+        font = self.layout_engine.get_font(layout.font_size, font_weight)
+        outline_width = layout.outline_width
         
-        # Adjust font size if text doesn't fit height
-        if total_height > area['height']:
-            scale_factor = area['height'] / total_height * 0.9
-            font_size = int(font_size * scale_factor)
-            font = self._get_font(font_size, font_weight)
-            line_height = font_size * 1.2
-            
-            # Re-wrap with new font size
-            wrapped_text = self._wrap_text(text, font, area['width'], draw)
-        
-        # Center text vertically in area
-        total_text_height = len(wrapped_text) * line_height
-        start_y = area['y'] + (area['height'] - total_text_height) // 2
-        
-        # Draw each line
-        for i, line in enumerate(wrapped_text):
-            # Center text horizontally
-            bbox = draw.textbbox((0, 0), line, font=font)
-            text_width = bbox[2] - bbox[0]
-            x = area['x'] + (area['width'] - text_width) // 2
-            y = start_y + i * line_height
-            
-            # Draw text with outline for better visibility
-            outline_width = max(1, font_size // 20)
+        for line, x_offset, y_offset in layout.lines:
+            x = area['x'] + x_offset
+            y = area['y'] + y_offset
             
             # Draw outline
             for adj in range(-outline_width, outline_width + 1):
@@ -213,70 +370,9 @@ class CreativeComposer:
             # Draw main text
             draw.text((x, y), line, font=font, fill=text_color)
     
-    def _wrap_text(self, text: str, font: ImageFont.ImageFont, max_width: int, draw: ImageDraw.ImageDraw) -> list:
-        """Wrap text to fit within specified width."""
-        
-        words = text.split()
-        lines = []
-        current_line = []
-        
-        for word in words:
-            # Test adding this word to current line
-            test_line = ' '.join(current_line + [word])
-            bbox = draw.textbbox((0, 0), test_line, font=font)
-            test_width = bbox[2] - bbox[0]
-            
-            if test_width <= max_width:
-                current_line.append(word)
-            else:
-                # Start new line
-                if current_line:
-                    lines.append(' '.join(current_line))
-                current_line = [word]
-        
-        # Add final line
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        return lines
-    
     def _get_font(self, size: int, weight: str = 'normal') -> ImageFont.ImageFont:
         """Get font with caching."""
-        
-        cache_key = f"{size}_{weight}"
-        
-        if cache_key in self.font_cache:
-            return self.font_cache[cache_key]
-        
-        # Try to load system fonts
-        font_paths = [
-            "/System/Library/Fonts/Arial.ttf",
-            "/System/Library/Fonts/Helvetica.ttc",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-            "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"
-        ]
-        
-        if weight == 'bold':
-            font_paths.insert(0, "/System/Library/Fonts/Arial Bold.ttf")
-            font_paths.insert(1, "/System/Library/Fonts/Helvetica-Bold.ttc")
-        
-        font = None
-        for font_path in font_paths:
-            try:
-                font = ImageFont.truetype(font_path, size)
-                break
-            except (OSError, IOError):
-                continue
-        
-        # Fallback to default font
-        if font is None:
-            try:
-                font = ImageFont.load_default()
-            except (OSError, IOError):
-                font = ImageFont.load_default()
-        
-        self.font_cache[cache_key] = font
-        return font
+        return self.layout_engine.get_font(size, weight)
     
     def _find_logo_file(self, campaign_brief: Dict[str, Any] = None) -> Optional[Path]:
         """Find logo file from campaign brief or default locations."""
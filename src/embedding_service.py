@@ -0,0 +1,158 @@
+"""
+Embedding Service - Shared, lazily loaded sentence embedding model.
+
+Every KnowledgeBase instance used to load its own SentenceTransformer in
+__init__ (one copy of the model per tenant, paid even when nothing is embedded)
+and encoded chunks one call at a time. The service loads the model once per
+process on first use, encodes in batches and keeps an LRU cache of embeddings
+keyed by a hash of the text, so repeated chunks and queries are not re-encoded.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Optional imports for advanced features
+try:
+    from sentence_transformers import SentenceTransformer
+    EMBEDDINGS_AVAILABLE = True
+except ImportError:
+    EMBEDDINGS_AVAILABLE = False
+
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+
+def text_key(text: str) -> bytes:
+    """Cache key for a text."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class EmbeddingService:
+    """Lazily loaded embedding model with batched encoding and a text-hash cache."""
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, batch_size: int = 64, cache_size: int = 50000):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+
+        self._model = None
+        self._load_failed = False
+        self._load_lock = threading.Lock()
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'encode_calls': 0,
+            'texts_encoded': 0
+        }
+
+    @property
+    def model(self):
+        """The SentenceTransformer, loaded on first access (None if unavailable)."""
+        if self._model is None and not self._load_failed and EMBEDDINGS_AVAILABLE:
+            with self._load_lock:
+                if self._model is None and not self._load_failed:
+                    try:
+                        self._model = SentenceTransformer(self.model_name)
+                        logger.info(f"Loaded sentence transformer model {self.model_name}")
+                    except Exception as e:
+                        self._load_failed = True
+                        logger.warning(f"Failed to load embedding model: {e}")
+        return self._model
+
+    @property
+    def available(self) -> bool:
+        """True if embeddings can be produced."""
+        return self.model is not None
+
+    def encode(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Embeddings for texts as a float32 matrix (one row per text), or None if unavailable."""
+        if not texts or not self.available:
+            return None
+
+        keys = [text_key(text) for text in texts]
+        rows: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: Dict[bytes, List[int]] = {}
+
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    rows[i] = cached
+                    self.stats['hits'] += 1
+                else:
+                    # Duplicate texts within the call are encoded once
+                    missing.setdefault(key, []).append(i)
+                    self.stats['misses'] += 1
+
+        if missing:
+            positions = list(missing.values())
+            try:
+                encoded = np.asarray(
+                    self.model.encode(
+                        [texts[p[0]] for p in positions],
+                        batch_size=self.batch_size,
+                        convert_to_numpy=True,
+                        show_progress_bar=False
+                    ),
+                    dtype=np.float32
+                )
+            except Exception as e:
+                logger.error(f"Error generating embeddings: {e}")
+                return None
+
+            with self._cache_lock:
+                self.stats['encode_calls'] += 1
+                self.stats['texts_encoded'] += len(positions)
+                for (key, indexes), row in zip(missing.items(), encoded):
+                    self._cache[key] = row
+                    for i in indexes:
+                        rows[i] = row
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return np.stack(rows)
+
+    def encode_one(self, text: str) -> Optional[np.ndarray]:
+        """Embedding for a single text."""
+        embeddings = self.encode([text])
+        return embeddings[0] if embeddings is not None else None
+
+    def clear_cache(self) -> None:
+        """Drop every cached embedding."""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache and encoding statistics."""
+        with self._cache_lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'model': self.model_name,
+                'model_loaded': self._model is not None,
+                'cached_embeddings': len(self._cache),
+                'hit_rate_percent': (self.stats['hits'] / lookups * 100) if lookups else 0.0
+            }
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str = DEFAULT_EMBEDDING_MODEL) -> EmbeddingService:
+    """Process-wide embedding service for a model."""
+    with _services_lock:
+        service = _services.get(model_name)
+        if service is None:
+            service = _services[model_name] = EmbeddingService(model_name)
+        return service
@@ -6,15 +6,18 @@ Addresses the missing "diversity" aspect of variant tracking requirement
 
 import asyncio
 import json
-import hashlib
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 from dataclasses import dataclass, field
 import logging
-from PIL import Image
 import numpy as np
 
+try:
+    from .image_analysis import ImageAnalysisContext, get_analysis_context
+except ImportError:
+    from image_analysis import ImageAnalysisContext, get_analysis_context
+
 @dataclass
 class DiversityMetrics:
     """Comprehensive diversity analysis results"""
@@ -67,11 +70,23 @@ class EnhancedDiversityTracker:
         metrics = DiversityMetrics()
         metrics.total_variants = len(variant_files)
         
-        # 1. Analyze file-level diversity
-        await self._analyze_file_diversity(variant_files, metrics)
+        # 1-2. Analyze file-level and visual diversity in one pass, so each
+        # variant is read and decoded once
+        file_hashes = set()
+        color_features = []
+        
+        for file_path in variant_files:
+            context = get_analysis_context(file_path)
+            await self._analyze_file_diversity(file_path, context, metrics, file_hashes)
+            
+            avg_color = await self._extract_average_color(file_path, context)
+            if avg_color is not None:
+                color_features.append(avg_color)
+        
+        metrics.unique_variants = len(file_hashes)
+        metrics.duplicate_variants = metrics.total_variants - metrics.unique_variants
         
-        # 2. Analyze visual diversity (if images can be processed)
-        await self._analyze_visual_diversity(variant_files, metrics)
+        await self._analyze_visual_diversity(color_features, metrics)
         
         # 3. Calculate overall diversity index
         metrics.overall_diversity_index = self._calculate_diversity_index(metrics)
@@ -83,64 +98,48 @@ class EnhancedDiversityTracker:
         
         return metrics
     
-    async def _analyze_file_diversity(self, variant_files: List[Path], metrics: DiversityMetrics):
-        """Analyze file-level diversity (formats, sizes, duplicates)"""
-        
-        file_hashes = set()
+    async def _analyze_file_diversity(self, file_path: Path, context: ImageAnalysisContext,
+                                      metrics: DiversityMetrics, file_hashes: set):
+        """Analyze file-level diversity (formats, sizes, duplicates) of one variant"""
         
-        for file_path in variant_files:
+        try:
+            # Check for duplicates using file hash
+            file_hash = self._calculate_file_hash(file_path, context)
+            file_hashes.add(file_hash)
+            
+            # Format distribution
+            format_key = file_path.suffix.lower().replace('.', '')
+            metrics.format_distribution[format_key] = metrics.format_distribution.get(format_key, 0) + 1
+            
+            # Try to get image properties
             try:
-                # Check for duplicates using file hash
-                file_hash = self._calculate_file_hash(file_path)
-                file_hashes.add(file_hash)
-                
-                # Format distribution
-                format_key = file_path.suffix.lower().replace('.', '')
-                metrics.format_distribution[format_key] = metrics.format_distribution.get(format_key, 0) + 1
+                # Resolution distribution
+                width, height = context.size
+                resolution = f"{width}x{height}"
+                metrics.resolution_distribution[resolution] = metrics.resolution_distribution.get(resolution, 0) + 1
                 
-                # Try to get image properties
-                try:
-                    with Image.open(file_path) as img:
-                        # Resolution distribution
-                        resolution = f"{img.size[0]}x{img.size[1]}"
-                        metrics.resolution_distribution[resolution] = metrics.resolution_distribution.get(resolution, 0) + 1
-                        
-                        # Aspect ratio distribution
-                        width, height = img.size
-                        aspect_ratio = self._classify_aspect_ratio(width, height)
-                        metrics.aspect_ratio_distribution[aspect_ratio] = metrics.aspect_ratio_distribution.get(aspect_ratio, 0) + 1
-                        
-                except Exception as e:
-                    self.logger.warning(f"Could not analyze image {file_path}: {e}")
+                # Aspect ratio distribution
+                aspect_ratio = self._classify_aspect_ratio(width, height)
+                metrics.aspect_ratio_distribution[aspect_ratio] = metrics.aspect_ratio_distribution.get(aspect_ratio, 0) + 1
                 
             except Exception as e:
-                self.logger.warning(f"Error analyzing file {file_path}: {e}")
-        
-        metrics.unique_variants = len(file_hashes)
-        metrics.duplicate_variants = metrics.total_variants - metrics.unique_variants
+                self.logger.warning(f"Could not analyze image {file_path}: {e}")
+            
+        except Exception as e:
+            self.logger.warning(f"Error analyzing file {file_path}: {e}")
+    
+    async def _extract_average_color(self, file_path: Path, context: ImageAnalysisContext) -> Optional[np.ndarray]:
+        """Average RGB color of a variant, from a shared 50x50 downsample"""
+        try:
+            img_array = np.array(context.thumbnail((50, 50)))  # Resize for performance
+            return np.mean(img_array.reshape(-1, 3), axis=0)
+        except Exception as e:
+            self.logger.warning(f"Could not analyze visual features of {file_path}: {e}")
+            return None
     
-    async def _analyze_visual_diversity(self, variant_files: List[Path], metrics: DiversityMetrics):
+    async def _analyze_visual_diversity(self, color_features: List[np.ndarray], metrics: DiversityMetrics):
         """Analyze visual diversity of variants"""
         
-        color_features = []
-        
-        for file_path in variant_files:
-            try:
-                with Image.open(file_path) as img:
-                    # Convert to RGB if needed
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    
-                    # Simple color analysis - get dominant colors
-                    img_array = np.array(img.resize((50, 50)))  # Resize for performance
-                    
-                    # Calculate average color
-                    avg_color = np.mean(img_array.reshape(-1, 3), axis=0)
-                    color_features.append(avg_color)
-                    
-            except Exception as e:
-                self.logger.warning(f"Could not analyze visual features of {file_path}: {e}")
-        
         if color_features:
             # Calculate color diversity using variance
             color_matrix = np.array(color_features)
@@ -210,14 +209,11 @@ class EnhancedDiversityTracker:
             metrics.diversity_gaps.append("Overall low diversity score")
             metrics.improvement_suggestions.append("Review generation parameters to increase variant diversity")
     
-    def _calculate_file_hash(self, file_path: Path) -> str:
+    def _calculate_file_hash(self, file_path: Path, context: Optional[ImageAnalysisContext] = None) -> str:
         """Calculate file hash for duplicate detection"""
-        hasher = hashlib.md5()
+        context = context or get_analysis_context(file_path)
         try:
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
+            return context.file_hash('md5')
         except (OSError, IOError):
             return f"error_{file_path.name}_{datetime.now().timestamp()}"
     
@@ -0,0 +1,195 @@
+"""
+Image Analysis Context - Decode an image once and share its derived planes.
+
+A generated creative used to be decoded and analysed independently by brand
+intelligence, performance prediction, variant intelligence and the diversity
+tracker, each recomputing grayscale, HSV, Canny edges and histograms. An
+ImageAnalysisContext reads the file once, decodes it once and memoizes every
+derived array the first time a consumer asks for it.
+
+Consumers accept an optional context; when none is passed they fetch one from a
+small process-wide LRU keyed by (path, mtime, size), so independent calls on the
+same file within an analysis pass still share a single decode.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+MAX_SHARED_CONTEXTS = 4
+
+
+class ImageAnalysisContext:
+    """A decoded image plus lazily memoized derived planes and features."""
+
+    def __init__(self, image_path: Optional[Union[str, Path]] = None, bgr: Optional[np.ndarray] = None):
+        if image_path is None and bgr is None:
+            raise ValueError("ImageAnalysisContext needs an image path or a decoded image")
+
+        self.image_path = str(image_path) if image_path is not None else None
+        self._data: Optional[bytes] = None
+        self._bgr = bgr
+        self._memo: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+        self.stats = {
+            'file_reads': 0,
+            'decodes': 0,
+            'computed': 0,
+            'reused': 0
+        }
+
+    @classmethod
+    def from_pil(cls, image: Image.Image) -> 'ImageAnalysisContext':
+        """Wrap an already-decoded PIL image."""
+        rgb = np.array(image.convert('RGB'))
+        return cls(bgr=cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+
+    @property
+    def data(self) -> bytes:
+        """Raw file bytes, read once."""
+        with self._lock:
+            if self._data is None:
+                if self.image_path is None:
+                    raise ValueError("Image has no backing file")
+                with open(self.image_path, 'rb') as f:
+                    self._data = f.read()
+                self.stats['file_reads'] += 1
+            return self._data
+
+    @property
+    def bgr(self) -> np.ndarray:
+        """Decoded BGR pixels (OpenCV channel order), decoded once."""
+        with self._lock:
+            if self._bgr is None:
+                self._bgr = self._decode()
+                self.stats['decodes'] += 1
+            return self._bgr
+
+    def _decode(self) -> np.ndarray:
+        """Decode the file bytes with OpenCV, falling back to PIL for formats it cannot read."""
+        try:
+            data = self.data
+        except OSError as e:
+            raise ValueError(f"Could not load image: {self.image_path}") from e
+
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is not None:
+            return image
+
+        try:
+            with Image.open(io.BytesIO(data)) as pil_image:
+                rgb = np.array(pil_image.convert('RGB'))
+            return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        except Exception:
+            raise ValueError(f"Could not load image: {self.image_path}")
+
+    def memoize(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing it on first use."""
+        with self._lock:
+            if key in self._memo:
+                self.stats['reused'] += 1
+                return self._memo[key]
+            value = compute()
+            self._memo[key] = value
+            self.stats['computed'] += 1
+            return value
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) in pixels, read from the file header unless already decoded."""
+        with self._lock:
+            if self._bgr is None and self.image_path is not None:
+                return self.memoize('size', self._header_size)
+            height, width = self.bgr.shape[:2]
+            return width, height
+
+    def _header_size(self) -> Tuple[int, int]:
+        """Image size from the file header without decoding the pixels."""
+        try:
+            with Image.open(io.BytesIO(self.data)) as pil_image:
+                return pil_image.size
+        except Exception:
+            height, width = self.bgr.shape[:2]
+            return width, height
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """RGB pixels."""
+        return self.memoize('rgb', lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale plane."""
+        return self.memoize('gray', lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def hsv(self) -> np.ndarray:
+        """HSV planes."""
+        return self.memoize('hsv', lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV))
+
+    @property
+    def pil(self) -> Image.Image:
+        """RGB PIL view of the decoded pixels (shared; do not mutate)."""
+        return self.memoize('pil', lambda: Image.fromarray(self.rgb))
+
+    def edges(self, low: int = 50, high: int = 150) -> np.ndarray:
+        """Canny edge map of the grayscale plane."""
+        return self.memoize(('edges', low, high), lambda: cv2.Canny(self.gray, low, high))
+
+    def bgr_histogram(self, channel: int, bins: int) -> np.ndarray:
+        """calcHist of one BGR channel over [0, 256)."""
+        return self.memoize(
+            ('bgr_histogram', channel, bins),
+            lambda: cv2.calcHist([self.bgr], [channel], None, [bins], [0, 256])
+        )
+
+    def thumbnail(self, size: Tuple[int, int]) -> Image.Image:
+        """PIL resize of the RGB image to an exact size (shared; do not mutate)."""
+        return self.memoize(('thumbnail', tuple(size)), lambda: self.pil.resize(tuple(size)))
+
+    def file_hash(self, algorithm: str = 'md5') -> str:
+        """Hex digest of the file bytes."""
+        return self.memoize(('file_hash', algorithm), lambda: hashlib.new(algorithm, self.data).hexdigest())
+
+
+_shared_contexts: "OrderedDict[Tuple[str, int, int], ImageAnalysisContext]" = OrderedDict()
+_shared_contexts_lock = threading.Lock()
+
+
+def get_analysis_context(image_path: Union[str, Path]) -> ImageAnalysisContext:
+    """Shared context for a file, reused while the file is unchanged."""
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        # Let the consumer surface the load error as it always has
+        return ImageAnalysisContext(image_path)
+
+    key = (str(Path(image_path).resolve()), stat.st_mtime_ns, stat.st_size)
+    with _shared_contexts_lock:
+        context = _shared_contexts.get(key)
+        if context is not None:
+            _shared_contexts.move_to_end(key)
+            return context
+
+        context = ImageAnalysisContext(image_path)
+        _shared_contexts[key] = context
+        while len(_shared_contexts) > MAX_SHARED_CONTEXTS:
+            _shared_contexts.popitem(last=False)
+        return context
+
+
+def clear_analysis_contexts() -> None:
+    """Drop every shared context (frees decoded pixels)."""
+    with _shared_contexts_lock:
+        _shared_contexts.clear()
@@ -0,0 +1,245 @@
+"""
+Generated Image Cache - Content-addressed storage for AI-generated product images.
+
+Images are keyed on a hash of the normalized prompt, model, size and quality so
+that a changed campaign message, brand color or localized brief produces a new
+entry, while identical requests from different regions share one image.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt so cosmetic whitespace differences share a cache key."""
+    return " ".join(unicodedata.normalize('NFC', prompt).split())
+
+
+def make_cache_key(prompt: str, model: str, size: str, quality: str = "standard") -> str:
+    """Build the content-addressed key for a generation request."""
+    payload = "\x1f".join([normalize_prompt(prompt), model, size, quality])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write bytes to a temp file in the same directory, then rename into place."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class GeneratedImageCache:
+    """Size-bounded LRU cache of generated images addressed by request hash."""
+
+    INDEX_FILENAME = 'index.json'
+    OBJECTS_DIRNAME = 'objects'
+
+    def __init__(self, cache_dir: str = 'generated_cache', max_size_mb: int = 2048):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / self.OBJECTS_DIRNAME
+        self.index_path = self.cache_dir / self.INDEX_FILENAME
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self._lock = threading.RLock()
+
+        # key -> entry metadata, ordered least to most recently used
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.current_size = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'bytes_read': 0,
+            'bytes_written': 0,
+            'bytes_evicted': 0
+        }
+
+        # Hits only touch LRU metadata; the index is written on put/evict or flush()
+        self._dirty = False
+        self._load_index()
+        atexit.register(self.flush)
+
+    def object_path(self, key: str) -> Path:
+        """Return the on-disk location of a cached object."""
+        return self.objects_dir / key[:2] / f"{key}.png"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the cached image path for a key, or None on a miss."""
+        with self._lock:
+            path = self.object_path(key)
+            entry = self.entries.get(key)
+
+            if entry is None and path.exists():
+                # Written by another worker since our index was loaded
+                entry = self._adopt(key, path)
+
+            if entry is None or not path.exists():
+                if entry is not None:
+                    self._drop(key)
+                    self._dirty = True
+                self.stats['misses'] += 1
+                return None
+
+            entry['last_accessed'] = time.time()
+            entry['hits'] = entry.get('hits', 0) + 1
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self.stats['bytes_read'] += entry['size_bytes']
+            self._dirty = True
+            return path
+
+    def put(self, key: str, data: bytes, metadata: Optional[Dict[str, Any]] = None) -> Path:
+        """Store image bytes under a key and evict older entries if over budget."""
+        with self._lock:
+            path = self.object_path(key)
+            atomic_write_bytes(path, data)
+
+            if key in self.entries:
+                self.current_size -= self.entries[key]['size_bytes']
+
+            now = time.time()
+            entry = {
+                'size_bytes': len(data),
+                'created_at': now,
+                'last_accessed': now,
+                'hits': 0
+            }
+            if metadata:
+                entry.update(metadata)
+
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self.current_size += len(data)
+            self.stats['bytes_written'] += len(data)
+
+            self._evict_if_needed(protect=key)
+            self._save_index()
+            return path
+
+    def remove(self, key: str) -> bool:
+        """Remove a single entry and its object file."""
+        with self._lock:
+            if key not in self.entries:
+                return False
+            self._drop(key)
+            self._save_index()
+            return True
+
+    def clear(self) -> None:
+        """Remove every cached object and reset the index."""
+        with self._lock:
+            for key in list(self.entries):
+                self._drop(key)
+            self._save_index()
+
+    def flush(self) -> None:
+        """Write the index if hits have changed it since the last write."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss and byte counters for the cache."""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate_percent': (self.stats['hits'] / lookups * 100) if lookups else 0.0,
+                'entries': len(self.entries),
+                'current_size_mb': self.current_size / (1024 * 1024),
+                'max_size_mb': self.max_size_bytes / (1024 * 1024)
+            }
+
+    def _adopt(self, key: str, path: Path) -> Dict[str, Any]:
+        """Register an object file that is on disk but missing from the index."""
+        stat = path.stat()
+        entry = {
+            'size_bytes': stat.st_size,
+            'created_at': stat.st_mtime,
+            'last_accessed': stat.st_mtime,
+            'hits': 0
+        }
+        self.entries[key] = entry
+        self.current_size += stat.st_size
+        return entry
+
+    def _drop(self, key: str) -> None:
+        """Forget an entry and delete its object file."""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.current_size -= entry['size_bytes']
+        try:
+            self.object_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict_if_needed(self, protect: Optional[str] = None) -> None:
+        """Evict least recently used entries until the cache fits its budget."""
+        while self.current_size > self.max_size_bytes and self.entries:
+            key = next(iter(self.entries))
+            if key == protect:
+                if len(self.entries) == 1:
+                    break
+                self.entries.move_to_end(key)
+                continue
+
+            size_bytes = self.entries[key]['size_bytes']
+            self._drop(key)
+            self.stats['evictions'] += 1
+            self.stats['bytes_evicted'] += size_bytes
+            logger.debug(f"Evicted generated image {key[:12]} ({size_bytes} bytes)")
+
+    def _load_index(self) -> None:
+        """Load the index file, dropping entries whose objects have vanished."""
+        if not self.index_path.exists():
+            return
+
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read image cache index, starting empty: {e}")
+            return
+
+        entries = sorted(data.get('entries', {}).items(), key=lambda item: item[1].get('last_accessed', 0))
+        for key, entry in entries:
+            if self.object_path(key).exists():
+                self.entries[key] = entry
+                self.current_size += entry.get('size_bytes', 0)
+
+    def _save_index(self) -> None:
+        """Persist the index atomically so concurrent readers never see a partial file."""
+        data = {
+            'version': 1,
+            'updated_at': time.time(),
+            'entries': dict(self.entries)
+        }
+        try:
+            atomic_write_bytes(self.index_path, json.dumps(data).encode('utf-8'))
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Failed to write image cache index: {e}")
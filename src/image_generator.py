@@ -2,6 +2,7 @@
 Image Generator - Uses OpenAI DALL-E to generate product images when assets are missing.
 """
 
+import asyncio
 import logging
 import os
 from pathlib import Path
@@ -12,8 +13,12 @@ import openai
 
 try:
     from .utils import update_cost_tracking, sanitize_filename
+    from .image_cache import GeneratedImageCache, make_cache_key
+    from .async_image_client import AsyncImageClient
 except ImportError:
     from utils import update_cost_tracking, sanitize_filename
+    from image_cache import GeneratedImageCache, make_cache_key
+    from async_image_client import AsyncImageClient
 
 logger = logging.getLogger(__name__)
 
@@ -21,10 +26,12 @@ logger = logging.getLogger(__name__)
 class ImageGenerator:
     """Generates product images using OpenAI DALL-E API."""
     
-    def __init__(self):
+    def __init__(self, cache_max_size_mb: int = 2048, max_api_calls_per_minute: int = 10):
         self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.async_client = AsyncImageClient(max_calls_per_minute=max_api_calls_per_minute)
         self.cache_dir = Path('generated_cache')
         self.cache_dir.mkdir(exist_ok=True)
+        self.image_cache = GeneratedImageCache(self.cache_dir, max_size_mb=cache_max_size_mb)
         
         # DALL-E pricing (as of 2024)
         self.pricing = {
@@ -39,23 +46,21 @@ class ImageGenerator:
         product: Dict[str, Any], 
         campaign_brief: Dict[str, Any],
         model: str = "dall-e-3",
-        size: str = "1024x1024"
+        size: str = "1024x1024",
+        quality: str = "standard"
     ) -> Path:
         """Generate a product image using DALL-E."""
         
         product_name = product['name']
-        sanitized_name = sanitize_filename(product_name)
         
-        # Check cache first
-        cache_filename = f"{sanitized_name}_{model}_{size}.png"
-        cache_path = self.cache_dir / cache_filename
-        
-        if cache_path.exists():
-            logger.info(f"Using cached image for {product_name}")
-            return cache_path
-        
-        # Build prompt
+        # Build prompt first - the cache is keyed on what we would send to the API
         prompt = self._build_image_prompt(product, campaign_brief)
+        cache_key = make_cache_key(prompt, model, size, quality)
+        
+        cached_path = self.image_cache.get(cache_key)
+        if cached_path is not None:
+            logger.info(f"Using cached image for {product_name} ({cache_key[:12]})")
+            return cached_path
         
         logger.info(f"Generating image for {product_name} with prompt: {prompt[:100]}...")
         
@@ -65,7 +70,7 @@ class ImageGenerator:
                 model=model,
                 prompt=prompt,
                 size=size,
-                quality="standard",
+                quality=quality,
                 n=1
             )
             
@@ -74,9 +79,14 @@ class ImageGenerator:
             image_response = requests.get(image_url)
             image_response.raise_for_status()
             
-            # Save to cache
-            with open(cache_path, 'wb') as f:
-                f.write(image_response.content)
+            # Save to cache (atomic write-then-rename)
+            cache_path = self.image_cache.put(cache_key, image_response.content, {
+                'product_name': product_name,
+                'model': model,
+                'size': size,
+                'quality': quality,
+                'prompt': prompt
+            })
             
             # Track costs
             cost = self.pricing.get(model, {}).get(size, 0.040)
@@ -92,6 +102,55 @@ class ImageGenerator:
             placeholder_path = self._create_placeholder_image(product_name, size)
             return placeholder_path
     
+    async def generate_product_image_async(
+        self,
+        product: Dict[str, Any],
+        campaign_brief: Dict[str, Any],
+        model: str = "dall-e-3",
+        size: str = "1024x1024",
+        quality: str = "standard"
+    ) -> Path:
+        """Generate a product image without blocking the event loop."""
+        
+        product_name = product['name']
+        
+        prompt = self._build_image_prompt(product, campaign_brief)
+        cache_key = make_cache_key(prompt, model, size, quality)
+        
+        cached_path = await asyncio.to_thread(self.image_cache.get, cache_key)
+        if cached_path is not None:
+            logger.info(f"Using cached image for {product_name} ({cache_key[:12]})")
+            return cached_path
+        
+        logger.info(f"Generating image for {product_name} with prompt: {prompt[:100]}...")
+        
+        try:
+            result = await self.async_client.generate(prompt, model=model, size=size, quality=quality)
+            
+            cache_path = await asyncio.to_thread(self.image_cache.put, cache_key, result.data, {
+                'product_name': product_name,
+                'model': model,
+                'size': size,
+                'quality': quality,
+                'prompt': prompt
+            })
+            
+            # Coalesced callers share the leader's API call, so only the leader pays
+            if not result.shared:
+                cost = self.pricing.get(model, {}).get(size, 0.040)
+                await asyncio.to_thread(update_cost_tracking, 'dalle', cost)
+            
+            logger.info(f"Generated and cached image: {cache_path}")
+            return cache_path
+            
+        except Exception as e:
+            logger.error(f"Failed to generate image for {product_name}: {e}")
+            return await asyncio.to_thread(self._create_placeholder_image, product_name, size)
+    
+    async def aclose(self) -> None:
+        """Close the async client's connection pool."""
+        await self.async_client.close()
+    
     def _build_image_prompt(self, product: Dict[str, Any], campaign_brief: Dict[str, Any]) -> str:
         """Build a detailed prompt for image generation."""
         
@@ -209,9 +268,10 @@ class ImageGenerator:
         """Clear the generated image cache."""
         
         try:
-            import shutil
-            shutil.rmtree(self.cache_dir)
-            self.cache_dir.mkdir(exist_ok=True)
+            # Clear in place: the cache instance stays registered for its atexit flush
+            self.image_cache.clear()
+            for placeholder_path in self.cache_dir.glob("*_placeholder.png"):
+                placeholder_path.unlink()
             logger.info("Image cache cleared")
             
         except Exception as e:
@@ -220,26 +280,27 @@ class ImageGenerator:
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get statistics about the image cache."""
         
+        cache_stats = self.image_cache.get_stats()
+        
         stats = {
-            'cached_images': 0,
-            'total_size_mb': 0.0,
+            'cached_images': cache_stats['entries'],
+            'total_size_mb': cache_stats['current_size_mb'],
+            'max_size_mb': cache_stats['max_size_mb'],
+            'hits': cache_stats['hits'],
+            'misses': cache_stats['misses'],
+            'hit_rate_percent': cache_stats['hit_rate_percent'],
+            'evictions': cache_stats['evictions'],
+            'bytes_read': cache_stats['bytes_read'],
+            'bytes_written': cache_stats['bytes_written'],
+            'bytes_evicted': cache_stats['bytes_evicted'],
             'images': []
         }
         
-        if not self.cache_dir.exists():
-            return stats
-        
-        total_size = 0
-        for image_path in self.cache_dir.glob('*.png'):
-            size = image_path.stat().st_size
-            total_size += size
-            
+        for key, entry in self.image_cache.entries.items():
             stats['images'].append({
-                'name': image_path.name,
-                'size_mb': size / (1024 * 1024)
+                'key': key,
+                'name': entry.get('product_name', key[:12]),
+                'size_mb': entry['size_bytes'] / (1024 * 1024)
             })
         
-        stats['cached_images'] = len(stats['images'])
-        stats['total_size_mb'] = total_size / (1024 * 1024)
-        
-        return stats
\ No newline at end of file
+        return stats
@@ -19,21 +19,26 @@ import os
 import re
 import hashlib
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, asdict, field
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, field
 from pathlib import Path
+import time
 import uuid
 
-logger = logging.getLogger(__name__)
+import numpy as np
 
-# Optional imports for advanced features
 try:
-    from sentence_transformers import SentenceTransformer
-    import numpy as np
-    EMBEDDINGS_AVAILABLE = True
+    from .vector_index import VectorIndex
+    from .knowledge_store import KnowledgeStore
+    from .embedding_service import EmbeddingService, get_embedding_service
 except ImportError:
-    EMBEDDINGS_AVAILABLE = False
+    from vector_index import VectorIndex
+    from knowledge_store import KnowledgeStore
+    from embedding_service import EmbeddingService, get_embedding_service
+
+logger = logging.getLogger(__name__)
 
+# Optional imports for advanced features
 try:
     import PyPDF2
     PDF_AVAILABLE = True
@@ -105,44 +110,58 @@ class SearchResult:
 
 
 class SimpleVectorStore:
-    """Simple in-memory vector store for embeddings"""
+    """In-memory vector store backed by a matrix VectorIndex, filtered by doc type"""
 
-    def __init__(self):
-        self.embeddings: Dict[str, np.ndarray] = {}
+    def __init__(
+        self,
+        approximate_threshold: Optional[int] = None,
+        chunk_loader: Optional[Callable[[str], Optional[KnowledgeChunk]]] = None
+    ):
+        self.index = VectorIndex(ivf_threshold=approximate_threshold)
         self.chunks: Dict[str, KnowledgeChunk] = {}
+        self.chunk_loader = chunk_loader
+
+    def load(self, chunk_ids: List[str], embeddings: np.ndarray, doc_types: List[str]):
+        """Adopt persisted normalized embeddings; chunks are fetched on demand"""
+        self.index.load_rows(chunk_ids, embeddings, doc_types)
 
-    def add(self, chunk_id: str, embedding: np.ndarray, chunk: KnowledgeChunk):
+    def add(self, chunk_id: str, embedding: np.ndarray, chunk: KnowledgeChunk, doc_type: str = None):
         """Add embedding to store"""
-        self.embeddings[chunk_id] = embedding
+        self.index.add(chunk_id, embedding, label=doc_type or chunk.metadata.get("doc_type"))
         self.chunks[chunk_id] = chunk
 
-    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Tuple[str, float]]:
-        """Search for similar embeddings"""
-        if not self.embeddings:
-            return []
-
-        similarities = []
-        for chunk_id, embedding in self.embeddings.items():
-            # Cosine similarity
-            similarity = np.dot(query_embedding, embedding) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(embedding)
-            )
-            similarities.append((chunk_id, float(similarity)))
+    def add_batch(self, embeddings: np.ndarray, chunks: List[KnowledgeChunk], doc_type: str = None):
+        """Add many embeddings in one append"""
+        self.index.add_batch(
+            [chunk.id for chunk in chunks],
+            embeddings,
+            [doc_type or chunk.metadata.get("doc_type") for chunk in chunks]
+        )
+        for chunk in chunks:
+            self.chunks[chunk.id] = chunk
 
-        # Sort by similarity
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:top_k]
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        doc_types: Optional[List[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Search for similar embeddings, ranking only chunks of the given doc types"""
+        return self.index.search(query_embedding, top_k, labels=doc_types or None)
 
     def remove(self, chunk_id: str):
         """Remove embedding from store"""
-        if chunk_id in self.embeddings:
-            del self.embeddings[chunk_id]
-        if chunk_id in self.chunks:
-            del self.chunks[chunk_id]
+        self.index.remove(chunk_id)
+        self.chunks.pop(chunk_id, None)
 
     def get_chunk(self, chunk_id: str) -> Optional[KnowledgeChunk]:
         """Get chunk by ID"""
-        return self.chunks.get(chunk_id)
+        chunk = self.chunks.get(chunk_id)
+        if chunk is None and self.chunk_loader and chunk_id in self.index:
+            chunk = self.chunk_loader(chunk_id)
+            if chunk is not None:
+                self.chunks[chunk_id] = chunk
+        return chunk
 
 
 class KnowledgeBase:
@@ -160,67 +179,85 @@ class KnowledgeBase:
     CHUNK_SIZE = 500  # words
     CHUNK_OVERLAP = 50  # words
 
-    def __init__(self, tenant_id: str = "default", storage_path: str = "data/knowledge_base"):
+    # Switch to approximate (IVF) vector search above this many chunks
+    APPROXIMATE_SEARCH_THRESHOLD = 200000
+
+    # File types picked up by upload_directory
+    BULK_UPLOAD_EXTENSIONS = ('.txt', '.md', '.pdf', '.docx', '.json')
+
+    def __init__(
+        self,
+        tenant_id: str = "default",
+        storage_path: str = "data/knowledge_base",
+        embedding_service: Optional[EmbeddingService] = None
+    ):
         self.tenant_id = tenant_id
         self.storage_path = Path(storage_path) / tenant_id
         self.storage_path.mkdir(parents=True, exist_ok=True)
 
-        # Initialize embeddings model
-        self.embedding_model = None
-        if EMBEDDINGS_AVAILABLE:
-            try:
-                self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-                logger.info("Loaded sentence transformer model")
-            except Exception as e:
-                logger.warning(f"Failed to load embedding model: {e}")
+        # Shared process-wide embedding model, loaded on first encode
+        self.embeddings = embedding_service or get_embedding_service()
+
+        # Persistent storage: SQLite metadata plus memory-mapped embeddings
+        self.store = KnowledgeStore(self.storage_path)
 
         # Initialize vector store
-        self.vector_store = SimpleVectorStore()
+        self.vector_store = SimpleVectorStore(
+            approximate_threshold=self.APPROXIMATE_SEARCH_THRESHOLD,
+            chunk_loader=self._load_chunk
+        )
 
-        # Document storage
+        # Document storage; chunk text is loaded on first use
         self.documents: Dict[str, KnowledgeDocument] = {}
+        self._chunk_counts: Dict[str, int] = {}
+        self._chunks_loaded: set = set()
         self._load_documents()
 
     def _load_documents(self):
-        """Load documents from disk"""
-        index_file = self.storage_path / "index.json"
-        if index_file.exists():
-            try:
-                with open(index_file, 'r') as f:
-                    index_data = json.load(f)
-
-                for doc_id, doc_data in index_data.items():
-                    chunks = [KnowledgeChunk(**c) for c in doc_data.get("chunks", [])]
-                    doc_data["chunks"] = chunks
-                    doc = KnowledgeDocument(**doc_data)
-                    self.documents[doc_id] = doc
-
-                    # Rebuild vector store
-                    for chunk in chunks:
-                        if chunk.embedding and self.embedding_model:
-                            self.vector_store.add(
-                                chunk.id,
-                                np.array(chunk.embedding),
-                                chunk
-                            )
-
-                logger.info(f"Loaded {len(self.documents)} documents")
-            except Exception as e:
-                logger.error(f"Error loading knowledge base: {e}")
-
-    def _save_index(self):
-        """Save document index to disk"""
-        index_file = self.storage_path / "index.json"
-        index_data = {}
+        """Load document metadata and map the embedding file (no chunk text is read)"""
+        self._migrate_legacy_index()
+        try:
+            for doc_data in self.store.load_documents():
+                self._chunk_counts[doc_data["id"]] = doc_data.pop("chunk_count")
+                self.documents[doc_data["id"]] = KnowledgeDocument(chunks=[], **doc_data)
 
-        for doc_id, doc in self.documents.items():
-            doc_dict = asdict(doc)
-            # Convert chunks
-            doc_dict["chunks"] = [c.to_dict() for c in doc.chunks]
-            index_data[doc_id] = doc_dict
+            chunk_ids, doc_types, embeddings = self.store.load_vectors()
+            if embeddings is not None:
+                self.vector_store.load(chunk_ids, embeddings, doc_types)
 
-        with open(index_file, 'w') as f:
-            json.dump(index_data, f, indent=2)
+            logger.info(f"Loaded {len(self.documents)} documents")
+        except Exception as e:
+            logger.error(f"Error loading knowledge base: {e}")
+
+    def _migrate_legacy_index(self):
+        """One-time import of a legacy index.json into the binary store"""
+        index_file = self.storage_path / "index.json"
+        if not index_file.exists() or not self.store.is_empty():
+            return
+
+        try:
+            migrated = 0
+            for doc_data, chunk_data in KnowledgeStore.iter_legacy_index(index_file):
+                # index.json never persisted embeddings, so re-embed when a model is available
+                embeddings = self._generate_embeddings([c["content"] for c in chunk_data])
+                self.store.append_document(doc_data, chunk_data, embeddings)
+                migrated += 1
+            index_file.rename(index_file.with_suffix(".json.migrated"))
+            logger.info(f"Migrated {migrated} documents from {index_file}")
+        except Exception as e:
+            logger.error(f"Error migrating legacy knowledge base index: {e}")
+
+    def _load_chunk(self, chunk_id: str) -> Optional[KnowledgeChunk]:
+        """Load a single chunk from the store"""
+        chunk_data = self.store.load_chunk(chunk_id)
+        return KnowledgeChunk(**chunk_data) if chunk_data else None
+
+    def _ensure_chunks(self, doc: KnowledgeDocument) -> KnowledgeDocument:
+        """Load a document's chunks from the store on first access"""
+        if doc.id not in self._chunks_loaded:
+            doc.chunks = [KnowledgeChunk(**c) for c in self.store.load_chunks(doc.id)]
+            self._chunks_loaded.add(doc.id)
+        return doc
 
     def _parse_document(self, file_path: Path) -> str:
         """Parse document content"""
@@ -280,17 +317,67 @@ class KnowledgeBase:
 
         return chunks
 
-    def _generate_embedding(self, text: str) -> Optional[List[float]]:
-        """Generate embedding for text"""
-        if not self.embedding_model:
-            return None
+    def _generate_embeddings(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Generate embeddings for many texts in batched encode calls"""
+        return self.embeddings.encode(texts)
 
-        try:
-            embedding = self.embedding_model.encode(text)
-            return embedding.tolist()
-        except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            return None
+    def _prepare_document(
+        self,
+        path: Path,
+        doc_type: str,
+        name: str = None,
+        metadata: Dict[str, Any] = None,
+        owner_id: str = "default"
+    ) -> KnowledgeDocument:
+        """Parse and chunk a file into a document (not yet embedded or stored)"""
+        # Parse document content
+        content = self._parse_document(path)
+
+        if not content.strip():
+            raise ValueError("Document has no content")
+
+        # Generate document ID
+        doc_id = hashlib.md5(f"{path.absolute()}:{datetime.now().isoformat()}".encode()).hexdigest()[:12]
+
+        # Chunk the content
+        chunks = [
+            KnowledgeChunk(
+                id=f"{doc_id}_{i}",
+                document_id=doc_id,
+                content=chunk_text,
+                chunk_index=i,
+                metadata={"doc_type": doc_type, **(metadata or {})}
+            )
+            for i, chunk_text in enumerate(self._chunk_text(content))
+        ]
+
+        return KnowledgeDocument(
+            id=doc_id,
+            name=name or path.name,
+            doc_type=doc_type,
+            file_path=str(path.absolute()),
+            chunks=chunks,
+            metadata=metadata or {},
+            owner_id=owner_id
+        )
+
+    def _index_document(self, doc: KnowledgeDocument, embeddings: Optional[np.ndarray]):
+        """Persist a prepared document (append-only), then make it searchable"""
+        self.store.append_document(
+            {
+                "id": doc.id, "name": doc.name, "doc_type": doc.doc_type, "file_path": doc.file_path,
+                "metadata": doc.metadata, "created_at": doc.created_at, "updated_at": doc.updated_at,
+                "owner_id": doc.owner_id
+            },
+            [c.to_dict() for c in doc.chunks],
+            embeddings
+        )
+        if embeddings is not None:
+            self.vector_store.add_batch(embeddings, doc.chunks, doc.doc_type)
+
+        self.documents[doc.id] = doc
+        self._chunk_counts[doc.id] = len(doc.chunks)
+        self._chunks_loaded.add(doc.id)
 
     async def upload_document(
         self,
@@ -317,55 +404,118 @@ class KnowledgeBase:
         if not path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        # Parse document content
-        content = self._parse_document(path)
+        doc = self._prepare_document(path, doc_type, name, metadata, owner_id)
+        embeddings = self._generate_embeddings([c.content for c in doc.chunks])
+        self._index_document(doc, embeddings)
 
-        if not content.strip():
-            raise ValueError("Document has no content")
-
-        # Generate document ID
-        doc_id = hashlib.md5(f"{path.name}:{datetime.now().isoformat()}".encode()).hexdigest()[:12]
-
-        # Chunk the content
-        text_chunks = self._chunk_text(content)
+        logger.info(f"Uploaded document: {doc.id} - {doc.name} ({len(doc.chunks)} chunks)")
+        return doc
 
-        # Create chunk objects with embeddings
-        chunks = []
-        for i, chunk_text in enumerate(text_chunks):
-            chunk_id = f"{doc_id}_{i}"
-            embedding = self._generate_embedding(chunk_text)
+    async def upload_directory(
+        self,
+        directory: str,
+        doc_type: str,
+        pattern: str = "*",
+        metadata: Dict[str, Any] = None,
+        owner_id: str = "default",
+        parse_workers: int = 4,
+        encode_batch_size: int = 256
+    ) -> Dict[str, Any]:
+        """
+        Bulk-upload every supported file under a directory.
 
-            chunk = KnowledgeChunk(
-                id=chunk_id,
-                document_id=doc_id,
-                content=chunk_text,
-                chunk_index=i,
-                metadata={"doc_type": doc_type, **(metadata or {})},
-                embedding=embedding
-            )
-            chunks.append(chunk)
+        Files are parsed and chunked by worker threads while a single consumer
+        encodes chunks from several documents per batch and indexes them.
 
-            # Add to vector store
-            if embedding:
-                self.vector_store.add(chunk_id, np.array(embedding), chunk)
+        Args:
+            directory: Directory to scan recursively
+            doc_type: Document type classification for every file
+            pattern: Glob pattern for file names
+            metadata: Additional metadata for every document
+            owner_id: Owner user ID
+            parse_workers: Concurrent parse/chunk workers
+            encode_batch_size: Chunks to accumulate before each encode call
 
-        # Create document
-        doc = KnowledgeDocument(
-            id=doc_id,
-            name=name or path.name,
-            doc_type=doc_type,
-            file_path=str(path.absolute()),
-            chunks=chunks,
-            metadata=metadata or {},
-            owner_id=owner_id
+        Returns:
+            Dict with uploaded documents, failed files and chunk totals
+        """
+        root = Path(directory)
+        if not root.is_dir():
+            raise FileNotFoundError(f"Directory not found: {directory}")
+
+        start_time = time.time()
+        paths = sorted(
+            p for p in root.rglob(pattern)
+            if p.is_file() and p.suffix.lower() in self.BULK_UPLOAD_EXTENSIONS
         )
 
-        # Store document
-        self.documents[doc_id] = doc
-        self._save_index()
-
-        logger.info(f"Uploaded document: {doc_id} - {doc.name} ({len(chunks)} chunks)")
-        return doc
+        path_queue: asyncio.Queue = asyncio.Queue()
+        for path in paths:
+            path_queue.put_nowait(path)
+        # Bounded so parsing cannot run far ahead of encoding
+        doc_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, parse_workers) * 4)
+
+        uploaded: List[KnowledgeDocument] = []
+        failed: List[Dict[str, str]] = []
+
+        async def parse_worker():
+            while True:
+                try:
+                    path = path_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    doc = await asyncio.to_thread(self._prepare_document, path, doc_type, None, metadata, owner_id)
+                except Exception as e:
+                    logger.error(f"Error preparing {path}: {e}")
+                    failed.append({"file": str(path), "error": str(e)})
+                    continue
+                await doc_queue.put(doc)
+
+        async def flush(docs: List[KnowledgeDocument]):
+            texts = [chunk.content for doc in docs for chunk in doc.chunks]
+            embeddings = await asyncio.to_thread(self._generate_embeddings, texts)
+
+            offset = 0
+            for doc in docs:
+                count = len(doc.chunks)
+                doc_embeddings = embeddings[offset:offset + count] if embeddings is not None else None
+                offset += count
+                try:
+                    self._index_document(doc, doc_embeddings)
+                    uploaded.append(doc)
+                except Exception as e:
+                    logger.error(f"Error indexing {doc.file_path}: {e}")
+                    failed.append({"file": doc.file_path, "error": str(e)})
+
+        async def index_worker():
+            pending: List[KnowledgeDocument] = []
+            pending_chunks = 0
+            while True:
+                doc = await doc_queue.get()
+                if doc is not None:
+                    pending.append(doc)
+                    pending_chunks += len(doc.chunks)
+                if pending and (doc is None or pending_chunks >= encode_batch_size):
+                    await flush(pending)
+                    pending, pending_chunks = [], 0
+                if doc is None:
+                    return
+
+        indexer = asyncio.create_task(index_worker())
+        await asyncio.gather(*(parse_worker() for _ in range(max(1, min(parse_workers, len(paths))))))
+        await doc_queue.put(None)
+        await indexer
+
+        total_chunks = sum(len(doc.chunks) for doc in uploaded)
+        logger.info(f"Bulk upload from {root}: {len(uploaded)} documents, {total_chunks} chunks, {len(failed)} failed")
+        return {
+            "documents": uploaded,
+            "failed": failed,
+            "total_files": len(paths),
+            "total_chunks": total_chunks,
+            "elapsed_seconds": round(time.time() - start_time, 3)
+        }
 
     async def upload_text(
         self,
@@ -424,15 +574,14 @@ class KnowledgeBase:
         Returns:
             List of SearchResult objects
         """
-        if not self.embedding_model:
+        # Generate query embedding (cached, so repeated questions are not re-encoded)
+        query_embedding = self.embeddings.encode_one(question)
+        if query_embedding is None:
             # Fallback to keyword search
             return await self._keyword_search(question, doc_types, top_k)
 
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode(question)
-
-        # Search vector store
-        results = self.vector_store.search(query_embedding, top_k * 2)
+        # Search vector store; doc type filtering happens inside the index
+        results = self.vector_store.search(query_embedding, top_k, doc_types)
 
         # Build search results
         search_results = []
@@ -446,10 +595,6 @@ class KnowledgeBase:
             if not doc:
                 continue
 
-            # Filter by doc type if specified
-            if doc_types and doc.doc_type not in doc_types:
-                continue
-
             search_results.append(SearchResult(
                 chunk=chunk,
                 score=score,
@@ -457,7 +602,7 @@ class KnowledgeBase:
                 document_type=doc.doc_type
             ))
 
-        return search_results[:top_k]
+        return search_results
 
     async def _keyword_search(
         self,
@@ -473,7 +618,7 @@ class KnowledgeBase:
             if doc_types and doc.doc_type not in doc_types:
                 continue
 
-            for chunk in doc.chunks:
+            for chunk in self._ensure_chunks(doc).chunks:
                 chunk_words = set(chunk.content.lower().split())
                 overlap = len(keywords & chunk_words)
 
@@ -582,7 +727,8 @@ class KnowledgeBase:
 
     def get_document(self, doc_id: str) -> Optional[KnowledgeDocument]:
         """Get document by ID"""
-        return self.documents.get(doc_id)
+        doc = self.documents.get(doc_id)
+        return self._ensure_chunks(doc) if doc else None
 
     def list_documents(self, doc_type: str = None) -> List[Dict[str, Any]]:
         """List all documents"""
@@ -595,7 +741,7 @@ class KnowledgeBase:
                 "id": d.id,
                 "name": d.name,
                 "doc_type": d.doc_type,
-                "chunks_count": len(d.chunks),
+                "chunks_count": self._chunk_counts.get(d.id, len(d.chunks)),
                 "created_at": d.created_at
             }
             for d in docs
@@ -606,7 +752,7 @@ class KnowledgeBase:
         if doc_id not in self.documents:
             return False
 
-        doc = self.documents[doc_id]
+        doc = self._ensure_chunks(self.documents[doc_id])
 
         # Remove chunks from vector store
         for chunk in doc.chunks:
@@ -614,7 +760,9 @@ class KnowledgeBase:
 
         # Remove document
         del self.documents[doc_id]
-        self._save_index()
+        self._chunk_counts.pop(doc_id, None)
+        self._chunks_loaded.discard(doc_id)
+        self.store.delete_document(doc_id)
 
         return True
 
@@ -0,0 +1,329 @@
+"""
+Knowledge Store - Append-only binary persistence for the knowledge base.
+
+Replaces the indent=2 index.json that was rewritten on every upload and fully
+parsed at start-up. Document and chunk metadata live in SQLite; embeddings are
+L2-normalized float32 rows appended to a flat binary file that is opened as a
+read-only memory map, so opening a large tenant reads no vectors up front.
+
+Uploads append their rows to the embedding file and insert their metadata in
+one transaction. That transaction takes the database write lock (BEGIN
+IMMEDIATE) before the file is sized, so writers in other processes or other
+store instances on the same tenant cannot reserve the same rows. Deleted
+documents leave dead embedding rows behind, which compact() rewrites away once
+they exceed a fraction of the file.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .vector_index import normalize_rows
+except ImportError:
+    from vector_index import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeStore:
+    """SQLite metadata index plus a memory-mapped float32 embedding file."""
+
+    SCHEMA_VERSION = 1
+    DB_FILENAME = 'knowledge.db'
+    EMBEDDINGS_FILENAME = 'embeddings.f32'
+
+    def __init__(self, storage_path: Path, compact_ratio: float = 0.25):
+        self.storage_path = Path(storage_path)
+        self.storage_path.mkdir(parents=True, exist_ok=True)
+        self.embeddings_path = self.storage_path / self.EMBEDDINGS_FILENAME
+        self.compact_ratio = compact_ratio
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.storage_path / self.DB_FILENAME), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        """Create tables if they do not exist."""
+        with self._lock, self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    doc_type TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    owner_id TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL DEFAULT 0,
+                    seq INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id TEXT PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    metadata TEXT NOT NULL,
+                    embedding_row INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks(document_id, chunk_index);
+                CREATE INDEX IF NOT EXISTS idx_chunks_row ON chunks(embedding_row);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            ''')
+            self.conn.execute(
+                'INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)',
+                ('schema_version', str(self.SCHEMA_VERSION))
+            )
+
+    @contextmanager
+    def _write_transaction(self):
+        """Transaction holding the database write lock from its first statement.
+
+        The lock also serializes writes to the embedding file across processes.
+        """
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """Embedding dimension, fixed by the first stored embedding."""
+        value = self._get_meta('dimension')
+        return int(value) if value else None
+
+    def is_empty(self) -> bool:
+        """True if no document has ever been stored."""
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0] == 0
+
+    def _embedding_rows_on_disk(self) -> int:
+        """Complete rows in the embedding file (a torn trailing write is ignored)."""
+        dim = self.dimension
+        if not dim or not self.embeddings_path.exists():
+            return 0
+        return self.embeddings_path.stat().st_size // (4 * dim)
+
+    def _open_embeddings(self) -> Optional[np.ndarray]:
+        """Read-only memory map over the embedding file."""
+        rows = self._embedding_rows_on_disk()
+        if rows == 0:
+            return None
+        return np.memmap(self.embeddings_path, dtype=np.float32, mode='r', shape=(rows, self.dimension))
+
+    def load_documents(self) -> List[Dict[str, Any]]:
+        """Document rows (without chunks) in upload order."""
+        with self._lock:
+            rows = self.conn.execute('''
+                SELECT id, name, doc_type, file_path, metadata, created_at, updated_at, owner_id, chunk_count
+                FROM documents ORDER BY seq
+            ''').fetchall()
+        return [
+            {
+                'id': doc_id, 'name': name, 'doc_type': doc_type, 'file_path': file_path,
+                'metadata': json.loads(metadata), 'created_at': created_at, 'updated_at': updated_at,
+                'owner_id': owner_id, 'chunk_count': chunk_count
+            }
+            for doc_id, name, doc_type, file_path, metadata, created_at, updated_at, owner_id, chunk_count in rows
+        ]
+
+    def _chunk_from_row(self, row: Tuple) -> Dict[str, Any]:
+        chunk_id, document_id, content, chunk_index, metadata = row
+        return {
+            'id': chunk_id,
+            'document_id': document_id,
+            'content': content,
+            'chunk_index': chunk_index,
+            'metadata': json.loads(metadata)
+        }
+
+    def load_chunks(self, document_id: str) -> List[Dict[str, Any]]:
+        """Chunks of one document, in order."""
+        with self._lock:
+            rows = self.conn.execute('''
+                SELECT id, document_id, content, chunk_index, metadata FROM chunks
+                WHERE document_id = ? ORDER BY chunk_index
+            ''', (document_id,)).fetchall()
+        return [self._chunk_from_row(row) for row in rows]
+
+    def load_chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """A single chunk by id."""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT id, document_id, content, chunk_index, metadata FROM chunks WHERE id = ?', (chunk_id,)
+            ).fetchone()
+        return self._chunk_from_row(row) if row else None
+
+    def load_vectors(self) -> Tuple[List[str], List[str], Optional[np.ndarray]]:
+        """(chunk ids, doc types, normalized embedding matrix) for every embedded chunk.
+
+        The matrix is the memory map itself when the file has no dead rows,
+        so nothing is read until the first search touches it.
+        """
+        with self._lock:
+            embeddings = self._open_embeddings()
+            if embeddings is None:
+                return [], [], None
+
+            rows = self.conn.execute('''
+                SELECT c.id, d.doc_type, c.embedding_row FROM chunks c
+                JOIN documents d ON d.id = c.document_id
+                WHERE c.embedding_row IS NOT NULL AND c.embedding_row < ?
+                ORDER BY c.embedding_row
+            ''', (len(embeddings),)).fetchall()
+
+        if not rows:
+            return [], [], None
+        ids = [row[0] for row in rows]
+        doc_types = [row[1] for row in rows]
+        positions = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+
+        if len(positions) == len(embeddings) and positions[-1] == len(embeddings) - 1:
+            return ids, doc_types, embeddings
+        return ids, doc_types, np.asarray(embeddings[positions])
+
+    def append_document(
+        self,
+        document: Dict[str, Any],
+        chunks: List[Dict[str, Any]],
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """Append a document, its chunks and their embeddings (one row per chunk, or None)."""
+        rows = normalize_rows(embeddings) if embeddings is not None and len(embeddings) else None
+        with self._lock, self._write_transaction():
+            first_row = None
+            if rows is not None:
+                dim = self.dimension
+                if dim is None:
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('dimension', str(rows.shape[1]))
+                    )
+                    dim = rows.shape[1]
+                elif rows.shape[1] != dim:
+                    raise ValueError(f"Expected embeddings of dimension {dim}, got {rows.shape[1]}")
+
+                # Append-only: existing rows are never rewritten by an upload. The row
+                # reservation and the write happen under the write lock taken above.
+                first_row = self._embedding_rows_on_disk()
+                with open(self.embeddings_path, 'ab') as f:
+                    f.truncate(first_row * 4 * dim)  # Drop any torn trailing row
+                    f.write(rows.tobytes())
+
+            self.conn.execute('''
+                INSERT INTO documents (id, name, doc_type, file_path, metadata, created_at, updated_at,
+                                       owner_id, chunk_count, seq)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM documents))
+            ''', (
+                document['id'], document['name'], document['doc_type'], document['file_path'],
+                json.dumps(document.get('metadata', {})), document['created_at'], document['updated_at'],
+                document['owner_id'], len(chunks)
+            ))
+            self.conn.executemany('''
+                INSERT OR REPLACE INTO chunks (id, document_id, content, chunk_index, metadata, embedding_row)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (chunk['id'], document['id'], chunk['content'], chunk['chunk_index'],
+                 json.dumps(chunk.get('metadata', {})),
+                 first_row + i if first_row is not None else None)
+                for i, chunk in enumerate(chunks)
+            ])
+
+    def delete_document(self, document_id: str) -> bool:
+        """Delete a document's metadata; its embedding rows become garbage."""
+        with self._lock:
+            with self.conn:
+                deleted = self.conn.execute('DELETE FROM documents WHERE id = ?', (document_id,)).rowcount
+                self.conn.execute('DELETE FROM chunks WHERE document_id = ?', (document_id,))
+
+            total = self._embedding_rows_on_disk()
+            if deleted and total:
+                live = self.conn.execute(
+                    'SELECT COUNT(*) FROM chunks WHERE embedding_row IS NOT NULL'
+                ).fetchone()[0]
+                if (total - live) / total > self.compact_ratio:
+                    self.compact()
+            return bool(deleted)
+
+    def compact(self) -> None:
+        """Rewrite the embedding file without dead rows and renumber chunks."""
+        # Same write lock as append_document, so no upload lands between reading
+        # the live rows and replacing the file
+        with self._lock, self._write_transaction():
+            embeddings = self._open_embeddings()
+            if embeddings is None:
+                return
+            rows = self.conn.execute(
+                'SELECT id, embedding_row FROM chunks WHERE embedding_row IS NOT NULL AND embedding_row < ? '
+                'ORDER BY embedding_row', (len(embeddings),)
+            ).fetchall()
+
+            fd, tmp_name = tempfile.mkstemp(dir=self.storage_path, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for start in range(0, len(rows), 65536):
+                        batch = [row[1] for row in rows[start:start + 65536]]
+                        f.write(np.asarray(embeddings[batch]).tobytes())
+                del embeddings
+                self.conn.executemany(
+                    'UPDATE chunks SET embedding_row = ? WHERE id = ?',
+                    [(new_row, chunk_id) for new_row, (chunk_id, _) in enumerate(rows)]
+                )
+                os.replace(tmp_name, self.embeddings_path)
+            except Exception:
+                if os.path.exists(tmp_name):
+                    os.unlink(tmp_name)
+                raise
+            logger.info(f"Compacted knowledge base embeddings to {len(rows)} rows")
+
+    @staticmethod
+    def iter_legacy_index(index_file: Path) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Yield (document, chunks) pairs from a legacy index.json."""
+        with open(index_file, 'r') as f:
+            index_data = json.load(f)
+        for doc_data in index_data.values():
+            chunks = doc_data.pop('chunks', [])
+            yield doc_data, chunks
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics."""
+        with self._lock:
+            documents = self.conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+            chunks, embedded = self.conn.execute(
+                'SELECT COUNT(*), COUNT(embedding_row) FROM chunks'
+            ).fetchone()
+            rows = self._embedding_rows_on_disk()
+        return {
+            'documents': documents,
+            'chunks': chunks,
+            'embedded_chunks': embedded,
+            'embedding_rows': rows,
+            'dead_embedding_rows': rows - embedded,
+            'dimension': self.dimension
+        }
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self.conn.close()
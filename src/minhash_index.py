@@ -0,0 +1,340 @@
+"""
+MinHash Index - Vectorized MinHash signatures with an LSH banding index.
+
+Signatures used to be built from num_hashes x |shingles| MD5 digests, each
+turned into a 128-bit Python int, and lookups compared the query against every
+stored signature. Here every word is hashed once, shingle hashes are rolled
+from the word hashes with uint64 arithmetic, and the num_hashes permutations
+are affine maps (a * x + b mod 2**64, a odd) applied to the whole shingle array
+at once. Each signature value keeps the top 32 bits of the permuted minimum.
+
+Signatures are split into bands; documents whose band hashes collide with the
+query in at least one band are candidates, and only candidates are scored.
+Band hashes are kept in per-band sorted arrays (binary search) plus a small
+unsorted tail of recent additions that is merged in once it grows.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_MULTIPLIER = np.uint64(0x100000001B3)
+BAND_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def hash_tokens(tokens: Sequence[str], cache: Optional[Dict[str, int]] = None) -> np.ndarray:
+    """64-bit hash of every token (each distinct token is hashed once)."""
+    cache = {} if cache is None else cache
+    values = []
+    for token in tokens:
+        value = cache.get(token)
+        if value is None:
+            value = cache[token] = int.from_bytes(
+                hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little'
+            )
+        values.append(value)
+    return np.array(values, dtype=np.uint64)
+
+
+def shingle_hashes(word_hashes: np.ndarray, shingle_size: int) -> np.ndarray:
+    """Distinct hashes of every run of shingle_size consecutive words."""
+    count = len(word_hashes) - shingle_size + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(shingle_size):
+        hashes = hashes * SHINGLE_MULTIPLIER + word_hashes[offset:offset + count]
+    return np.unique(hashes)
+
+
+def choose_lsh_bands(num_hashes: int, threshold: float) -> int:
+    """Number of bands whose LSH threshold (1/b)^(1/r) does not exceed threshold.
+
+    Picks the most rows per band (fewest false candidates) that still retrieves
+    documents at the threshold with high probability.
+    """
+    for rows in sorted((r for r in range(1, num_hashes + 1) if num_hashes % r == 0), reverse=True):
+        bands = num_hashes // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold:
+            return bands
+    return num_hashes
+
+
+class MinHasher:
+    """Vectorized MinHash over word shingles."""
+
+    def __init__(self, num_hashes: int = 100, shingle_size: int = 5, seed: int = 1, block_size: int = 65536):
+        self.num_hashes = num_hashes
+        self.shingle_size = shingle_size
+        self.block_size = block_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 2 ** 63, num_hashes, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_hashes, dtype=np.uint64)
+
+    def _permuted_minimum(self, hashes: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """Per-segment minimum of every permutation (segments begin at starts)."""
+        permuted = (hashes[:, None] * self._a + self._b) >> np.uint64(32)
+        return np.minimum.reduceat(permuted, starts, axis=0).astype(np.uint32)
+
+    def signature(self, tokens: Sequence[str]) -> np.ndarray:
+        """MinHash signature of a token list (all zeros if it has no shingles)."""
+        return self.signatures([tokens])[0]
+
+    def signatures(self, token_lists: Iterable[Sequence[str]]) -> np.ndarray:
+        """Signature matrix (one uint32 row per token list), permuting shingles in blocks."""
+        token_cache: Dict[str, int] = {}
+        shingle_sets = [
+            shingle_hashes(hash_tokens(tokens, token_cache), self.shingle_size) for tokens in token_lists
+        ]
+        result = np.zeros((len(shingle_sets), self.num_hashes), dtype=np.uint32)
+
+        group: List[int] = []
+        group_size = 0
+        for row, shingles in enumerate(shingle_sets):
+            if len(shingles) == 0:
+                continue
+            group.append(row)
+            group_size += len(shingles)
+            if group_size >= self.block_size:
+                self._fill(result, shingle_sets, group)
+                group, group_size = [], 0
+        if group:
+            self._fill(result, shingle_sets, group)
+        return result
+
+    def _fill(self, result: np.ndarray, shingle_sets: List[np.ndarray], rows: List[int]) -> None:
+        lengths = np.array([len(shingle_sets[row]) for row in rows])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        hashes = np.concatenate([shingle_sets[row] for row in rows])
+        result[rows] = self._permuted_minimum(hashes, starts)
+
+
+class MinHashLSHIndex:
+    """Growable signature matrix with banded LSH candidate lookup and tombstones."""
+
+    def __init__(
+        self,
+        num_hashes: int = 100,
+        bands: int = 20,
+        initial_capacity: int = 1024,
+        merge_ratio: float = 0.02,
+        compact_ratio: float = 0.25
+    ):
+        if num_hashes % bands:
+            raise ValueError(f"num_hashes ({num_hashes}) must be divisible by bands ({bands})")
+        self.num_hashes = num_hashes
+        self.bands = bands
+        self.rows_per_band = num_hashes // bands
+        self.initial_capacity = initial_capacity
+        self.merge_ratio = merge_ratio
+        self.compact_ratio = compact_ratio
+
+        self._band_multipliers = BAND_MULTIPLIER ** np.arange(self.rows_per_band, dtype=np.uint64)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._signatures = np.zeros((0, self.num_hashes), dtype=np.uint32)
+        self._band_keys = np.zeros((0, self.bands), dtype=np.uint64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._deleted = 0
+        self.ids: List[Optional[str]] = []
+        self.id_to_row: Dict[str, int] = {}
+
+        # Rows [0, _sorted_upto) are in the per-band sorted arrays
+        self._sorted_keys: List[np.ndarray] = []
+        self._sorted_rows: List[np.ndarray] = []
+        self._sorted_upto = 0
+
+    def __len__(self) -> int:
+        return len(self.id_to_row)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.id_to_row
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """One uint64 hash per band for each signature row."""
+        banded = signatures.astype(np.uint64).reshape(len(signatures), self.bands, self.rows_per_band)
+        return (banded * self._band_multipliers).sum(axis=2, dtype=np.uint64)
+
+    def _ensure_capacity(self, extra: int) -> None:
+        needed = self._size + extra
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+
+        new_capacity = max(self.initial_capacity, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+
+        signatures = np.zeros((new_capacity, self.num_hashes), dtype=np.uint32)
+        signatures[:self._size] = self._signatures[:self._size]
+        band_keys = np.zeros((new_capacity, self.bands), dtype=np.uint64)
+        band_keys[:self._size] = self._band_keys[:self._size]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._signatures, self._band_keys, self._alive = signatures, band_keys, alive
+
+    def add(self, item_id: str, signature: np.ndarray) -> None:
+        """Add (or replace) a single signature."""
+        self.add_batch([item_id], np.asarray(signature)[None, :])
+
+    def add_batch(self, item_ids: Sequence[str], signatures: np.ndarray) -> None:
+        """Append many signatures; existing ids are tombstoned and re-added."""
+        if len(item_ids) == 0:
+            return
+        signatures = np.asarray(signatures, dtype=np.uint32)
+        if signatures.shape != (len(item_ids), self.num_hashes):
+            raise ValueError(f"Expected signatures of shape ({len(item_ids)}, {self.num_hashes})")
+
+        with self._lock:
+            self._ensure_capacity(len(item_ids))
+            start = self._size
+            end = start + len(item_ids)
+            self._signatures[start:end] = signatures
+            self._band_keys[start:end] = self.band_keys(signatures)
+            self._alive[start:end] = True
+
+            for row, item_id in enumerate(item_ids, start):
+                if item_id in self.id_to_row:
+                    self._tombstone(item_id)
+                self.ids.append(item_id)
+                self.id_to_row[item_id] = row
+            self._size = end
+
+            if self._size - self._sorted_upto > max(1024, self.merge_ratio * self._sorted_upto):
+                self._merge_tail()
+
+    def _merge_tail(self) -> None:
+        """Merge recent additions into the per-band sorted arrays (sorts only the tail)."""
+        if not self._sorted_keys:
+            self._sorted_keys = [np.zeros(0, dtype=np.uint64) for _ in range(self.bands)]
+            self._sorted_rows = [np.zeros(0, dtype=np.int32) for _ in range(self.bands)]
+
+        tail_rows = np.arange(self._sorted_upto, self._size, dtype=np.int32)
+        tail_keys = self._band_keys[self._sorted_upto:self._size]
+        for band in range(self.bands):
+            order = np.argsort(tail_keys[:, band], kind='stable')
+            keys = tail_keys[order, band]
+            positions = np.searchsorted(self._sorted_keys[band], keys, side='right')
+            self._sorted_keys[band] = np.insert(self._sorted_keys[band], positions, keys)
+            self._sorted_rows[band] = np.insert(self._sorted_rows[band], positions, tail_rows[order])
+        self._sorted_upto = self._size
+
+    def remove(self, item_id: str) -> bool:
+        """Tombstone a signature; compacts once enough rows are dead."""
+        with self._lock:
+            if not self._tombstone(item_id):
+                return False
+            if self._size and self._deleted / self._size > self.compact_ratio:
+                self.compact()
+            return True
+
+    def _tombstone(self, item_id: str) -> bool:
+        row = self.id_to_row.pop(item_id, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        self.ids[row] = None
+        self._deleted += 1
+        return True
+
+    def compact(self) -> None:
+        """Rewrite the index without tombstoned rows."""
+        with self._lock:
+            if not self._deleted:
+                return
+            keep = np.flatnonzero(self._alive[:self._size])
+            signatures = self._signatures[keep]
+            ids = [self.ids[row] for row in keep]
+            self._reset()
+            if len(keep):
+                self.add_batch(ids, signatures)
+                if self._sorted_upto != self._size:
+                    self._merge_tail()
+
+    def clear(self) -> None:
+        """Remove every signature."""
+        with self._lock:
+            self._reset()
+
+    def candidates(self, signature: np.ndarray) -> np.ndarray:
+        """Live rows sharing at least one band hash with the signature."""
+        with self._lock:
+            query_keys = self.band_keys(np.asarray(signature, dtype=np.uint32)[None, :])[0]
+            found = []
+            for band in range(len(self._sorted_keys)):
+                keys = self._sorted_keys[band]
+                lo = np.searchsorted(keys, query_keys[band], side='left')
+                hi = np.searchsorted(keys, query_keys[band], side='right')
+                if hi > lo:
+                    found.append(self._sorted_rows[band][lo:hi])
+
+            tail = self._band_keys[self._sorted_upto:self._size]
+            if len(tail):
+                found.append(np.flatnonzero((tail == query_keys).any(axis=1)) + self._sorted_upto)
+
+            if not found:
+                return np.zeros(0, dtype=np.int64)
+            rows = np.unique(np.concatenate(found).astype(np.int64))
+            return rows[self._alive[rows]]
+
+    def similarities(self, signature: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Estimated Jaccard similarity (fraction of equal hashes) against the given rows."""
+        with self._lock:
+            signature = np.asarray(signature, dtype=np.uint32)
+            matrix = self._signatures[:self._size] if rows is None else self._signatures[rows]
+            return (matrix == signature).mean(axis=1)
+
+    def query(
+        self,
+        signature: np.ndarray,
+        threshold: float = 0.3,
+        exhaustive: bool = False
+    ) -> List[Tuple[str, float]]:
+        """(id, similarity) pairs at or above threshold, best first.
+
+        Only LSH candidates are scored unless exhaustive is set, in which case
+        every live row is compared in one vectorized pass.
+        """
+        with self._lock:
+            if not self.id_to_row:
+                return []
+            if exhaustive:
+                rows = np.flatnonzero(self._alive[:self._size])
+            else:
+                rows = self.candidates(signature)
+            if len(rows) == 0:
+                return []
+
+            scores = self.similarities(signature, rows)
+            keep = scores >= threshold
+            rows, scores = rows[keep], scores[keep]
+            order = np.argsort(-scores, kind='stable')
+            return [(self.ids[rows[i]], float(scores[i])) for i in order]
+
+    def get_signature(self, item_id: str) -> Optional[np.ndarray]:
+        """Stored signature for an id."""
+        with self._lock:
+            row = self.id_to_row.get(item_id)
+            return self._signatures[row].copy() if row is not None else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size and layout statistics."""
+        with self._lock:
+            return {
+                'signatures': len(self.id_to_row),
+                'rows': self._size,
+                'tombstones': self._deleted,
+                'capacity': len(self._alive),
+                'bands': self.bands,
+                'rows_per_band': self.rows_per_band,
+                'unsorted_tail': self._size - self._sorted_upto
+            }
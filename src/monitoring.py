@@ -7,8 +7,10 @@ import time
 import psutil
 import json
 import os
+import math
+import bisect
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from collections import defaultdict, deque
 from dataclasses import dataclass
 import threading
@@ -17,15 +19,155 @@ from functools import wraps
 import asyncio
 
 
+# Prometheus client default latency buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+class QuantileSketch:
+    """DDSketch: mergeable quantile estimates with bounded relative error
+    
+    Values fall into logarithmic bins of width gamma, so every estimate is
+    within relative_accuracy of a true quantile. Memory is bounded by
+    max_bins per sign; past that the lowest bins are collapsed together.
+    Sketches with the same relative_accuracy can be merged exactly.
+    """
+    
+    MIN_INDEXABLE_VALUE = 1e-9
+    
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+    
+    def add(self, value: float):
+        """Add one observation"""
+        self.count += 1
+        if value > self.MIN_INDEXABLE_VALUE:
+            self._add_to(self.positive, self._index(value), 1)
+        elif value < -self.MIN_INDEXABLE_VALUE:
+            self._add_to(self.negative, self._index(-value), 1)
+        else:
+            self.zero_count += 1
+    
+    def merge(self, other: "QuantileSketch"):
+        """Fold another sketch's observations into this one"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, count in other.positive.items():
+            self._add_to(self.positive, index, count)
+        for index, count in other.negative.items():
+            self._add_to(self.negative, index, count)
+        self.zero_count += other.zero_count
+        self.count += other.count
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile q (0..1), or None if empty"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        
+        # Most negative first: larger index means larger magnitude
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive)) if self.positive else 0.0
+    
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+    
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+    
+    def _add_to(self, bins: Dict[int, int], index: int, count: int):
+        bins[index] = bins.get(index, 0) + count
+        if len(bins) > self.max_bins:
+            # Collapse the lowest bins into the smallest one that is kept
+            ordered = sorted(bins)
+            excess = ordered[:len(bins) - self.max_bins + 1]
+            collapsed = sum(bins.pop(i) for i in excess)
+            bins[excess[-1]] = collapsed
+
+
+class Histogram:
+    """Fixed-bucket histogram with a quantile sketch, O(1) memory per series"""
+    
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch()
+    
+    def observe(self, value: float):
+        """Record one observation"""
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sketch.add(value)
+    
+    def merge(self, other: "Histogram"):
+        """Fold another histogram with the same buckets into this one"""
+        if other.buckets != self.buckets:
+            raise ValueError("Cannot merge histograms with different buckets")
+        self.bucket_counts = [a + b for a, b in zip(self.bucket_counts, other.bucket_counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+    
+    def cumulative_counts(self) -> List[tuple]:
+        """(upper bound, cumulative count) pairs, ending with +Inf"""
+        result = []
+        running = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.bucket_counts):
+            running += count
+            result.append((bound, running))
+        return result
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile q"""
+        return self.sketch.quantile(q)
+
+
 class MetricsRegistry:
-    """Free metrics registry compatible with Prometheus format"""
+    """Free metrics registry compatible with Prometheus format
+    
+    Series keys are compiled once per distinct (name, labels) and cached, so
+    recording a metric does not sort or join its labels again.
+    """
+    
+    KEY_CACHE_SIZE = 10000
+    SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
     
     def __init__(self):
         self.counters = defaultdict(int)
         self.gauges = defaultdict(float)
-        self.histograms = defaultdict(list)
+        self.histograms: Dict[str, Histogram] = {}
+        self.histogram_buckets: Dict[str, tuple] = {}
         self.timers = defaultdict(list)
         self.labels = defaultdict(dict)
+        # series key -> (metric name, Prometheus label text)
+        self.series: Dict[str, tuple] = {}
+        self._key_cache: Dict[tuple, str] = {}
         self._lock = threading.Lock()
     
     def increment_counter(self, name: str, value: int = 1, labels: Dict[str, str] = None):
@@ -33,83 +175,121 @@ class MetricsRegistry:
         with self._lock:
             key = self._make_key(name, labels)
             self.counters[key] += value
-            if labels:
-                self.labels[key] = labels
     
     def set_gauge(self, name: str, value: float, labels: Dict[str, str] = None):
         """Set a gauge metric value"""
         with self._lock:
             key = self._make_key(name, labels)
             self.gauges[key] = value
-            if labels:
-                self.labels[key] = labels
+    
+    def set_histogram_buckets(self, name: str, buckets: tuple):
+        """Use custom bucket bounds for a histogram (before its first observation)"""
+        with self._lock:
+            self.histogram_buckets[name] = tuple(buckets)
     
     def observe_histogram(self, name: str, value: float, labels: Dict[str, str] = None):
         """Add observation to histogram"""
         with self._lock:
             key = self._make_key(name, labels)
-            self.histograms[key].append(value)
-            # Keep only last 1000 observations to prevent memory bloat
-            if len(self.histograms[key]) > 1000:
-                self.histograms[key] = self.histograms[key][-1000:]
-            if labels:
-                self.labels[key] = labels
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.histogram_buckets.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+    
+    def get_quantile(self, name: str, q: float, labels: Dict[str, str] = None) -> Optional[float]:
+        """Estimated quantile of a histogram series"""
+        with self._lock:
+            histogram = self.histograms.get(self._make_key(name, labels))
+            return histogram.quantile(q) if histogram else None
     
     def time_operation(self, name: str, labels: Dict[str, str] = None):
         """Context manager for timing operations"""
         return TimingContext(self, name, labels)
     
     def _make_key(self, name: str, labels: Dict[str, str] = None) -> str:
-        """Create metric key with labels"""
+        """Create metric key with labels (compiled once per distinct label set)"""
         if not labels:
+            if name not in self.series:
+                self.series[name] = (name, "")
             return name
-        label_str = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
-        return f"{name}{{{label_str}}}"
+        
+        cache_key = (name, tuple(labels.items()))
+        key = self._key_cache.get(cache_key)
+        if key is None:
+            items = sorted(labels.items())
+            key = f"{name}{{{','.join(f'{k}={v}' for k, v in items)}}}"
+            if key not in self.series:
+                label_text = ",".join(f'{k}="{self._escape_label_value(v)}"' for k, v in items)
+                self.series[key] = (name, label_text)
+                self.labels[key] = dict(labels)
+            if len(self._key_cache) >= self.KEY_CACHE_SIZE:
+                self._key_cache.clear()
+            self._key_cache[cache_key] = key
+        return key
+    
+    @staticmethod
+    def _escape_label_value(value: Any) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    
+    def _series_name(self, key: str, suffix: str = "", extra_label: str = "") -> str:
+        """Prometheus series name for a key, with an optional suffix and extra label"""
+        name, label_text = self.series[key]
+        label_text = ",".join(part for part in (label_text, extra_label) if part)
+        return f"{name}{suffix}{{{label_text}}}" if label_text else f"{name}{suffix}"
+    
+    @staticmethod
+    def _format_bound(bound: float) -> str:
+        return "+Inf" if bound == math.inf else repr(float(bound))
     
     def export_prometheus_format(self) -> str:
         """Export metrics in Prometheus format"""
         lines = []
         
-        # Counters
-        for key, value in self.counters.items():
-            lines.append(f"# TYPE {key.split('{')[0]} counter")
-            lines.append(f"{key} {value}")
-        
-        # Gauges
-        for key, value in self.gauges.items():
-            lines.append(f"# TYPE {key.split('{')[0]} gauge")
-            lines.append(f"{key} {value}")
-        
-        # Histograms (simplified)
-        for key, values in self.histograms.items():
-            if values:
-                metric_name = key.split('{')[0]
-                lines.append(f"# TYPE {metric_name} histogram")
-                lines.append(f"{key}_count {len(values)}")
-                lines.append(f"{key}_sum {sum(values)}")
-                lines.append(f"{key}_avg {sum(values)/len(values)}")
-                lines.append(f"{key}_min {min(values)}")
-                lines.append(f"{key}_max {max(values)}")
+        with self._lock:
+            # One TYPE line per metric family, followed by its series
+            for metric_type, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                families = defaultdict(list)
+                for key, value in metrics.items():
+                    families[self.series[key][0]].append((key, value))
+                for name, series in families.items():
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for key, value in series:
+                        lines.append(f"{self._series_name(key)} {value}")
+            
+            # Histograms: cumulative buckets, sum and count
+            families = defaultdict(list)
+            for key, histogram in self.histograms.items():
+                families[self.series[key][0]].append((key, histogram))
+            for name, series in families.items():
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series:
+                    for bound, count in histogram.cumulative_counts():
+                        le = f'le="{self._format_bound(bound)}"'
+                        lines.append(f"{self._series_name(key, '_bucket', le)} {count}")
+                    lines.append(f"{self._series_name(key, '_sum')} {histogram.sum}")
+                    lines.append(f"{self._series_name(key, '_count')} {histogram.count}")
         
         return "\n".join(lines)
     
     def get_metrics_summary(self) -> Dict[str, Any]:
         """Get human-readable metrics summary"""
-        summary = {
-            "counters": dict(self.counters),
-            "gauges": dict(self.gauges),
-            "histograms": {}
-        }
-        
-        for key, values in self.histograms.items():
-            if values:
-                summary["histograms"][key] = {
-                    "count": len(values),
-                    "sum": sum(values),
-                    "avg": sum(values) / len(values),
-                    "min": min(values),
-                    "max": max(values)
-                }
+        with self._lock:
+            summary = {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {}
+            }
+            
+            for key, histogram in self.histograms.items():
+                if histogram.count:
+                    summary["histograms"][key] = {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "avg": histogram.sum / histogram.count,
+                        "min": histogram.min,
+                        "max": histogram.max,
+                        **{f"p{round(q * 100)}": histogram.quantile(q) for q in self.SUMMARY_QUANTILES}
+                    }
         
         return summary
 
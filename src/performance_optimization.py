@@ -3,14 +3,17 @@ Free Performance Optimization with Caching Layers
 Implements Redis-alternative caching, image optimization, and CDN simulation
 """
 
+import io
 import json
 import os
+import sys
 import hashlib
 import pickle
 import time
 import gzip
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Union
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Union, Callable, Set
 from dataclasses import dataclass, asdict
 from pathlib import Path
 import threading
@@ -18,9 +21,28 @@ import logging
 from PIL import Image, ImageOps
 import sqlite3
 from contextlib import contextmanager
-import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import tempfile
 from enum import Enum
 
+# Optional compression codecs for the disk cache
+try:
+    import zstandard as zstd
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+try:
+    import lz4.frame
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
+try:
+    from .blob_store import BlobStore, get_blob_store
+except ImportError:
+    from blob_store import BlobStore, get_blob_store
+
 
 class CacheLevel(Enum):
     MEMORY = "memory"
@@ -56,52 +78,176 @@ class CacheEntry:
         self.last_accessed = datetime.now()
 
 
+class FrequencySketch:
+    """Count-min sketch of recent key frequencies for TinyLFU admission"""
+    
+    MAX_COUNT = 15
+    
+    def __init__(self, width: int, depth: int = 4):
+        self.width = max(64, width)
+        self.depth = depth
+        self.tables = [bytearray(self.width) for _ in range(depth)]
+        # Counters are halved every sample_size additions so old popularity fades
+        self.sample_size = 10 * self.width
+        self.additions = 0
+    
+    def _indexes(self, key: str):
+        return [hash((seed, key)) % self.width for seed in range(self.depth)]
+    
+    def increment(self, key: str):
+        """Record one access to key"""
+        for table, index in zip(self.tables, self._indexes(key)):
+            if table[index] < self.MAX_COUNT:
+                table[index] += 1
+        
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._reset()
+    
+    def estimate(self, key: str) -> int:
+        """Estimated recent access count for key"""
+        return min(table[index] for table, index in zip(self.tables, self._indexes(key)))
+    
+    def _reset(self):
+        """Halve every counter"""
+        for table in self.tables:
+            table[:] = bytes(count >> 1 for count in table)
+        self.additions //= 2
+
+
+def estimate_size(value: Any, _seen: Optional[set] = None) -> int:
+    """Approximate in-memory size of a value without serializing it"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return sys.getsizeof(value)
+    
+    nbytes = getattr(value, "nbytes", None)  # numpy arrays
+    if isinstance(nbytes, int):
+        return nbytes
+    if hasattr(value, "getbands") and hasattr(value, "size"):  # PIL images
+        width, height = value.size
+        return width * height * len(value.getbands())
+    
+    # Containers and plain objects: walk references, counting shared objects once
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _seen) + estimate_size(v, _seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _seen)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), _seen)
+    return size
+
+
 class MemoryCache:
-    """High-performance in-memory cache with LRU eviction"""
+    """High-performance in-memory cache with LRU eviction
+    
+    Entries are kept in an OrderedDict in recency order, so hits and
+    evictions are O(1). With use_tinylfu, a new key that would force an
+    eviction is only admitted if it has been requested more often recently
+    than the entry it would displace. Keys of the form "namespace:rest" are
+    counted per namespace in get_stats().
+    """
     
-    def __init__(self, max_size_mb: int = 100, max_entries: int = 1000):
+    def __init__(
+        self,
+        max_size_mb: int = 100,
+        max_entries: int = 1000,
+        use_tinylfu: bool = False,
+        sizer: Callable[[Any], int] = estimate_size,
+        namespace_separator: str = ":"
+    ):
         self.max_size_bytes = max_size_mb * 1024 * 1024
         self.max_entries = max_entries
-        self.cache: Dict[str, CacheEntry] = {}
+        self.cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.tag_index: Dict[str, Set[str]] = {}
         self.current_size = 0
+        self.sizer = sizer
+        self.sizers: Dict[type, Callable[[Any], int]] = {}
+        self.namespace_separator = namespace_separator
+        self.sketch = FrequencySketch(max_entries) if use_tinylfu else None
         self._lock = threading.RLock()
         self.stats = {
             "hits": 0,
             "misses": 0,
             "evictions": 0,
-            "sets": 0
+            "sets": 0,
+            "rejections": 0
         }
+        self.namespace_stats: Dict[str, Dict[str, int]] = {}
+    
+    def register_sizer(self, value_type: type, sizer: Callable[[Any], int]):
+        """Use sizer to measure values of exactly value_type"""
+        self.sizers[value_type] = sizer
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
         with self._lock:
+            if self.sketch is not None:
+                self.sketch.increment(key)
+            
+            namespace = self._namespace_stats(key)
             entry = self.cache.get(key)
             if entry is None:
                 self.stats["misses"] += 1
+                namespace["misses"] += 1
                 return None
             
             if entry.is_expired():
                 self._remove_entry(key)
                 self.stats["misses"] += 1
+                namespace["misses"] += 1
                 return None
             
+            self.cache.move_to_end(key)
             entry.touch()
             self.stats["hits"] += 1
+            namespace["hits"] += 1
             return entry.value
     
-    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None, tags: List[str] = None) -> bool:
-        """Set value in cache"""
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None, tags: List[str] = None,
+            size_bytes: Optional[int] = None) -> bool:
+        """Set value in cache (size_bytes overrides the sizer)"""
+        if size_bytes is None:
+            size_bytes = self.sizers.get(type(value), self.sizer)(value)
+        if size_bytes > self.max_size_bytes:
+            # The caller replaced this key; never keep serving the old value
+            with self._lock:
+                self._remove_entry(key)
+                self.stats["rejections"] += 1
+                self._namespace_stats(key)["rejections"] += 1
+            return False
+        
         with self._lock:
-            # Calculate size
-            try:
-                serialized = pickle.dumps(value)
-                size_bytes = len(serialized)
-            except (pickle.PicklingError, TypeError, AttributeError):
+            if self.sketch is not None:
+                self.sketch.increment(key)
+            
+            namespace = self._namespace_stats(key)
+            if key in self.cache:
+                # Remove existing entry; updates are always admitted
+                self._remove_entry(key)
+            elif not self._admit(key, size_bytes):
+                self.stats["rejections"] += 1
+                namespace["rejections"] += 1
                 return False
             
-            # Check if we need to evict
-            if len(self.cache) >= self.max_entries or self.current_size + size_bytes > self.max_size_bytes:
-                self._evict_lru()
+            # Evict least recently used entries until the new one fits
+            while self.cache and (
+                len(self.cache) >= self.max_entries or self.current_size + size_bytes > self.max_size_bytes
+            ):
+                evicted_key = next(iter(self.cache))
+                self._namespace_stats(evicted_key)["evictions"] += 1
+                self._remove_entry(evicted_key)
+                self.stats["evictions"] += 1
             
             # Create entry
             expires_at = None
@@ -114,16 +260,17 @@ class MemoryCache:
                 created_at=datetime.now(),
                 expires_at=expires_at,
                 size_bytes=size_bytes,
-                tags=tags or []
+                tags=list(tags or [])
             )
             
-            # Remove existing entry if present
-            if key in self.cache:
-                self._remove_entry(key)
-            
             # Add new entry
             self.cache[key] = entry
             self.current_size += size_bytes
+            for tag in entry.tags:
+                self.tag_index.setdefault(tag, set()).add(key)
+            namespace["entries"] += 1
+            namespace["size_bytes"] += size_bytes
+            namespace["sets"] += 1
             self.stats["sets"] += 1
             
             return True
@@ -139,10 +286,9 @@ class MemoryCache:
     def clear_by_tags(self, tags: List[str]) -> int:
         """Clear entries with specific tags"""
         with self._lock:
-            keys_to_remove = []
-            for key, entry in self.cache.items():
-                if any(tag in entry.tags for tag in tags):
-                    keys_to_remove.append(key)
+            keys_to_remove = set()
+            for tag in tags:
+                keys_to_remove.update(self.tag_index.get(tag, ()))
             
             for key in keys_to_remove:
                 self._remove_entry(key)
@@ -155,61 +301,139 @@ class MemoryCache:
             total_requests = self.stats["hits"] + self.stats["misses"]
             hit_rate = (self.stats["hits"] / total_requests * 100) if total_requests > 0 else 0
             
+            namespaces = {}
+            for name, counters in self.namespace_stats.items():
+                lookups = counters["hits"] + counters["misses"]
+                namespaces[name] = {
+                    **counters,
+                    "hit_rate_percent": (counters["hits"] / lookups * 100) if lookups else 0,
+                    "size_mb": counters["size_bytes"] / (1024 * 1024)
+                }
+            
             return {
                 "hits": self.stats["hits"],
                 "misses": self.stats["misses"],
                 "hit_rate_percent": hit_rate,
                 "evictions": self.stats["evictions"],
                 "sets": self.stats["sets"],
+                "rejections": self.stats["rejections"],
+                "admission_policy": "tinylfu" if self.sketch is not None else "lru",
                 "current_entries": len(self.cache),
                 "max_entries": self.max_entries,
                 "current_size_mb": self.current_size / (1024 * 1024),
                 "max_size_mb": self.max_size_bytes / (1024 * 1024),
-                "utilization_percent": (len(self.cache) / self.max_entries * 100)
+                "utilization_percent": (len(self.cache) / self.max_entries * 100),
+                "namespaces": namespaces
+            }
+    
+    def _namespace_stats(self, key: str) -> Dict[str, int]:
+        """Counters for the namespace of key"""
+        name, separator, _ = key.partition(self.namespace_separator)
+        if not separator:
+            name = "default"
+        counters = self.namespace_stats.get(name)
+        if counters is None:
+            counters = self.namespace_stats[name] = {
+                "hits": 0,
+                "misses": 0,
+                "sets": 0,
+                "evictions": 0,
+                "rejections": 0,
+                "entries": 0,
+                "size_bytes": 0
             }
+        return counters
+    
+    def _admit(self, key: str, size_bytes: int) -> bool:
+        """TinyLFU admission: a new key may only displace a less popular victim"""
+        if self.sketch is None or not self.cache:
+            return True
+        if len(self.cache) < self.max_entries and self.current_size + size_bytes <= self.max_size_bytes:
+            return True
+        victim = next(iter(self.cache))
+        return self.sketch.estimate(key) > self.sketch.estimate(victim)
     
     def _remove_entry(self, key: str):
-        """Remove entry and update size"""
-        if key in self.cache:
-            entry = self.cache[key]
-            self.current_size -= entry.size_bytes
-            del self.cache[key]
-    
-    def _evict_lru(self):
-        """Evict least recently used entries"""
-        if not self.cache:
+        """Remove entry and update size and tag index"""
+        entry = self.cache.pop(key, None)
+        if entry is None:
             return
-        
-        # Sort by last accessed time (oldest first)
-        sorted_entries = sorted(
-            self.cache.items(),
-            key=lambda x: x[1].last_accessed or x[1].created_at
-        )
-        
-        # Evict oldest 10% or until under limits
-        eviction_count = max(1, len(self.cache) // 10)
-        for i in range(eviction_count):
-            if i < len(sorted_entries):
-                key = sorted_entries[i][0]
-                self._remove_entry(key)
-                self.stats["evictions"] += 1
+        self.current_size -= entry.size_bytes
+        for tag in entry.tags:
+            tagged = self.tag_index.get(tag)
+            if tagged is not None:
+                tagged.discard(key)
+                if not tagged:
+                    del self.tag_index[tag]
+        namespace = self._namespace_stats(key)
+        namespace["entries"] -= 1
+        namespace["size_bytes"] -= entry.size_bytes
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstd.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstd.ZstdDecompressor().decompress(data)
+
+
+# Codec name -> (compress, decompress); the codec is stored per entry
+COMPRESSION_CODECS: Dict[str, tuple] = {
+    "gzip": (gzip.compress, gzip.decompress)
+}
+if HAS_LZ4:
+    COMPRESSION_CODECS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+if HAS_ZSTD:
+    COMPRESSION_CODECS["zstd"] = (_zstd_compress, _zstd_decompress)
 
 
 class DiskCache:
-    """Persistent disk-based cache with compression"""
+    """Persistent disk-based cache with compression
     
-    def __init__(self, cache_dir: str = "cache", max_size_mb: int = 1000):
+    Metadata lives in one long-lived WAL-mode SQLite connection. The total
+    size of the cache files is kept as a running counter in the metadata
+    table, reads queue their access-time updates and write them in batches,
+    and eviction deletes a bounded batch of least recently used entries in
+    a single transaction. Writes take the database write lock up front
+    (BEGIN IMMEDIATE) and re-read the shared total inside the transaction,
+    so several processes can share one cache directory.
+    """
+    
+    def __init__(
+        self,
+        cache_dir: str = "cache",
+        max_size_mb: int = 1000,
+        compression: Optional[str] = None,
+        access_flush_size: int = 100,
+        eviction_batch_size: int = 256
+    ):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         self.max_size_bytes = max_size_mb * 1024 * 1024
         self.db_path = self.cache_dir / "cache_metadata.db"
-        self._init_database()
+        self.access_flush_size = access_flush_size
+        self.eviction_batch_size = eviction_batch_size
+        
+        # Fastest available codec unless one is requested
+        if compression is None:
+            compression = "zstd" if HAS_ZSTD else "lz4" if HAS_LZ4 else "gzip"
+        elif compression not in COMPRESSION_CODECS:
+            logging.warning(f"Compression '{compression}' not available, using gzip")
+            compression = "gzip"
+        self.compression = compression
+        
         self._lock = threading.RLock()
+        self._pending_access: Dict[str, List] = {}
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_database()
     
     def _init_database(self):
         """Initialize SQLite database for metadata"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
+        with self._lock, self.conn:
+            self.conn.execute("""
                 CREATE TABLE IF NOT EXISTS cache_entries (
                     key TEXT PRIMARY KEY,
                     file_path TEXT NOT NULL,
@@ -221,159 +445,270 @@ class DiskCache:
                     tags TEXT
                 )
             """)
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(cache_entries)")}
+            if "codec" not in columns:
+                # Entries written before codecs were selectable are gzip
+                self.conn.execute("ALTER TABLE cache_entries ADD COLUMN codec TEXT NOT NULL DEFAULT 'gzip'")
+            self.conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cache_entries_lru
+                ON cache_entries (COALESCE(last_accessed, created_at))
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            row = self.conn.execute("SELECT value FROM metadata WHERE key = 'total_size'").fetchone()
+            if row is None:
+                # One-off scan to seed the running total for caches created before it existed
+                total = self.conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM cache_entries").fetchone()[0]
+                self.conn.execute("INSERT INTO metadata (key, value) VALUES ('total_size', ?)", (total,))
+                row = (total,)
+            self.total_size = row[0]
+    
+    @contextmanager
+    def _write_transaction(self):
+        """Transaction holding the database write lock from its first statement"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+    
+    def _read_total_size(self) -> int:
+        """Current shared total size from the metadata table"""
+        row = self.conn.execute("SELECT value FROM metadata WHERE key = 'total_size'").fetchone()
+        return row[0] if row else 0
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from disk cache"""
-        with self._lock:
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    "SELECT file_path, expires_at, codec FROM cache_entries WHERE key = ?",
+                    (key,)
+                ).fetchone()
+            
+            if not row:
+                return None
+            
+            file_path, expires_at, codec = row
+            
+            # Check expiration
+            if expires_at and datetime.fromisoformat(expires_at) < datetime.now():
+                self.delete(key)
+                return None
+            
+            # Load and decompress
             try:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute(
-                        "SELECT file_path, expires_at FROM cache_entries WHERE key = ?",
-                        (key,)
-                    )
-                    row = cursor.fetchone()
-                    
-                    if not row:
-                        return None
-                    
-                    file_path, expires_at = row
-                    
-                    # Check expiration
-                    if expires_at and datetime.fromisoformat(expires_at) < datetime.now():
-                        self.delete(key)
-                        return None
-                    
-                    # Load from file
-                    full_path = self.cache_dir / file_path
-                    if not full_path.exists():
-                        self.delete(key)
-                        return None
-                    
-                    # Update access stats
-                    conn.execute(
-                        "UPDATE cache_entries SET access_count = access_count + 1, last_accessed = ? WHERE key = ?",
-                        (datetime.now().isoformat(), key)
-                    )
-                    
-                    # Load and decompress
-                    with gzip.open(full_path, 'rb') as f:
-                        return pickle.load(f)
-                        
-            except Exception as e:
-                logging.error(f"Error reading from disk cache: {e}")
+                data = (self.cache_dir / file_path).read_bytes()
+            except FileNotFoundError:
+                self.delete(key)
                 return None
+            value = pickle.loads(COMPRESSION_CODECS[codec][1](data))
+            
+            # Queue the access stats update
+            with self._lock:
+                pending = self._pending_access.setdefault(key, [0, None])
+                pending[0] += 1
+                pending[1] = datetime.now().isoformat()
+                if len(self._pending_access) >= self.access_flush_size:
+                    self._flush_access()
+            
+            return value
+                
+        except Exception as e:
+            logging.error(f"Error reading from disk cache: {e}")
+            return None
     
     def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None, tags: List[str] = None) -> bool:
         """Set value in disk cache"""
-        with self._lock:
-            try:
-                # Create file path
-                safe_key = hashlib.md5(key.encode()).hexdigest()
-                file_path = f"{safe_key}.cache"
-                full_path = self.cache_dir / file_path
-                
-                # Serialize and compress
-                with gzip.open(full_path, 'wb') as f:
-                    pickle.dump(value, f)
-                
-                size_bytes = full_path.stat().st_size
-                
-                # Calculate expiration
-                expires_at = None
-                if ttl_seconds:
-                    expires_at = (datetime.now() + timedelta(seconds=ttl_seconds)).isoformat()
-                
-                # Store metadata
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute("""
+        tmp_name = None
+        try:
+            # Serialize and compress outside the lock
+            compress = COMPRESSION_CODECS[self.compression][0]
+            data = compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            
+            # Create file path
+            safe_key = hashlib.md5(key.encode()).hexdigest()
+            file_path = f"{safe_key}.cache"
+            fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            
+            # Calculate expiration
+            now = datetime.now()
+            expires_at = None
+            if ttl_seconds:
+                expires_at = (now + timedelta(seconds=ttl_seconds)).isoformat()
+            
+            with self._lock:
+                # Store the file, its metadata and the running size in one transaction;
+                # other processes writing the same key wait for the write lock
+                with self._write_transaction():
+                    os.replace(tmp_name, self.cache_dir / file_path)
+                    tmp_name = None
+                    previous = self.conn.execute(
+                        "SELECT size_bytes FROM cache_entries WHERE key = ?", (key,)
+                    ).fetchone()
+                    delta = len(data) - (previous[0] if previous else 0)
+                    self.conn.execute("""
                         INSERT OR REPLACE INTO cache_entries 
-                        (key, file_path, created_at, expires_at, size_bytes, tags)
-                        VALUES (?, ?, ?, ?, ?, ?)
+                        (key, file_path, created_at, expires_at, size_bytes, tags, codec)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
                     """, (
-                        key, file_path, datetime.now().isoformat(), 
-                        expires_at, size_bytes, json.dumps(tags or [])
+                        key, file_path, now.isoformat(), 
+                        expires_at, len(data), json.dumps(tags or []), self.compression
                     ))
+                    self.conn.execute(
+                        "UPDATE metadata SET value = value + ? WHERE key = 'total_size'", (delta,)
+                    )
+                    self.total_size = self._read_total_size()
+                self._pending_access.pop(key, None)
                 
                 # Check size limits and evict if necessary
-                self._evict_if_needed()
-                
-                return True
-                
-            except Exception as e:
-                logging.error(f"Error writing to disk cache: {e}")
-                return False
+                if self.total_size > self.max_size_bytes:
+                    self._evict_if_needed()
+            
+            return True
+            
+        except Exception as e:
+            logging.error(f"Error writing to disk cache: {e}")
+            if tmp_name and os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            return False
     
     def delete(self, key: str) -> bool:
         """Delete entry from disk cache"""
-        with self._lock:
-            try:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute("SELECT file_path FROM cache_entries WHERE key = ?", (key,))
-                    row = cursor.fetchone()
+        try:
+            with self._lock:
+                with self._write_transaction():
+                    row = self.conn.execute(
+                        "SELECT file_path, size_bytes FROM cache_entries WHERE key = ?", (key,)
+                    ).fetchone()
+                    if not row:
+                        return False
                     
-                    if row:
-                        file_path = row[0]
-                        full_path = self.cache_dir / file_path
-                        
-                        # Remove file
-                        if full_path.exists():
-                            full_path.unlink()
-                        
-                        # Remove metadata
-                        conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
-                        return True
-                
-                return False
+                    # Remove metadata and file while holding the write lock
+                    self.conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                    self.conn.execute(
+                        "UPDATE metadata SET value = value - ? WHERE key = 'total_size'", (row[1],)
+                    )
+                    (self.cache_dir / row[0]).unlink(missing_ok=True)
+                    self.total_size = self._read_total_size()
+                self._pending_access.pop(key, None)
+                return True
                 
-            except Exception as e:
-                logging.error(f"Error deleting from disk cache: {e}")
-                return False
+        except Exception as e:
+            logging.error(f"Error deleting from disk cache: {e}")
+            return False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            self.total_size = self._read_total_size()
+            return {
+                "current_entries": entries,
+                "current_size_mb": self.total_size / (1024 * 1024),
+                "max_size_mb": self.max_size_bytes / (1024 * 1024),
+                "compression": self.compression,
+                "pending_access_updates": len(self._pending_access)
+            }
+    
+    def close(self):
+        """Write pending access stats and close the database connection"""
+        with self._lock:
+            self._flush_access()
+            self.conn.close()
+    
+    def _flush_access(self):
+        """Write queued access counts and times in one transaction"""
+        if not self._pending_access:
+            return
+        updates = [(count, accessed, key) for key, (count, accessed) in self._pending_access.items()]
+        self._pending_access.clear()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE cache_entries SET access_count = access_count + ?, last_accessed = ? WHERE key = ?",
+                updates
+            )
     
     def _evict_if_needed(self):
-        """Evict old entries if cache is too large"""
+        """Evict least recently used entries if cache is too large"""
         try:
-            # Get current cache size
-            total_size = sum(
-                (self.cache_dir / f).stat().st_size 
-                for f in os.listdir(self.cache_dir) 
-                if f.endswith('.cache')
-            )
-            
-            if total_size > self.max_size_bytes:
-                # Get oldest entries
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute("""
-                        SELECT key FROM cache_entries 
-                        ORDER BY last_accessed ASC, created_at ASC
-                        LIMIT 100
-                    """)
-                    
-                    old_keys = [row[0] for row in cursor.fetchall()]
-                    
-                    # Delete until under limit
-                    for key in old_keys:
-                        self.delete(key)
+            with self._lock:
+                if self.total_size <= self.max_size_bytes:
+                    return
+                self._flush_access()
+                
+                with self._write_transaction():
+                    # Another process may already have evicted; decide on the shared total
+                    total_size = self._read_total_size()
+                    if total_size > self.max_size_bytes:
+                        # Delete oldest entries until under 80% of the limit (leave some headroom),
+                        # at most eviction_batch_size per call
+                        target = self.max_size_bytes * 0.8
+                        rows = self.conn.execute("""
+                            SELECT key, file_path, size_bytes FROM cache_entries
+                            ORDER BY COALESCE(last_accessed, created_at) ASC
+                            LIMIT ?
+                        """, (self.eviction_batch_size,)).fetchall()
                         
-                        # Recalculate size
-                        total_size = sum(
-                            (self.cache_dir / f).stat().st_size 
-                            for f in os.listdir(self.cache_dir) 
-                            if f.endswith('.cache')
-                        )
+                        evicted = []
+                        freed = 0
+                        for key, file_path, size_bytes in rows:
+                            if total_size - freed <= target:
+                                break
+                            evicted.append((key, file_path))
+                            freed += size_bytes
                         
-                        if total_size <= self.max_size_bytes * 0.8:  # Leave some headroom
-                            break
+                        self.conn.executemany(
+                            "DELETE FROM cache_entries WHERE key = ?", [(key,) for key, _ in evicted]
+                        )
+                        self.conn.execute(
+                            "UPDATE metadata SET value = value - ? WHERE key = 'total_size'", (freed,)
+                        )
+                        for _, file_path in evicted:
+                            (self.cache_dir / file_path).unlink(missing_ok=True)
+                        total_size -= freed
+                    self.total_size = total_size
                             
         except Exception as e:
             logging.error(f"Error during cache eviction: {e}")
 
 
 class ImageOptimizer:
-    """Image optimization for faster loading and reduced storage"""
+    """Image optimization for faster loading and reduced storage
+    
+    Each source is decoded once and downsampled through a cascade (every
+    rendition is resized from the next larger one rather than from the
+    original), then all renditions are encoded in parallel on a shared
+    thread pool (Pillow releases the GIL while encoding) as JPEG and, when
+    requested, WebP or AVIF. Renditions are stored once in a content-addressed
+    BlobStore and linked into output_dir, so re-optimizing the same asset
+    writes no new bytes.
+    """
     
-    def __init__(self, output_dir: str = "optimized_images"):
+    # Encoding -> (Pillow format, file suffix, extra save options)
+    ENCODINGS = {
+        "jpeg": ("JPEG", ".jpg", {"optimize": True, "progressive": True}),
+        "webp": ("WEBP", ".webp", {"method": 4}),
+        "avif": ("AVIF", ".avif", {"speed": 6})
+    }
+    
+    def __init__(self, output_dir: str = "optimized_images", blob_store: Optional[BlobStore] = None,
+                 max_workers: Optional[int] = None):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.blob_store = blob_store or get_blob_store()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._encoder_pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
         
         # Optimization settings
         self.quality_settings = {
@@ -384,59 +719,156 @@ class ImageOptimizer:
             "original": {"quality": 95}
         }
     
-    def optimize_image(self, input_path: str, output_formats: List[str] = None) -> Dict[str, str]:
-        """Optimize image in multiple formats and sizes"""
+    @classmethod
+    def available_encodings(cls) -> List[str]:
+        """Encodings the installed Pillow can write"""
+        Image.init()
+        return [name for name, (pil_format, _, _) in cls.ENCODINGS.items() if pil_format in Image.SAVE]
+    
+    def optimize_image(self, input_path: str, output_formats: List[str] = None,
+                       encodings: List[str] = None) -> Dict[str, str]:
+        """Optimize image in multiple formats and sizes
+        
+        JPEG renditions are keyed by format name ("small"); other encodings
+        by format and encoding ("small_webp").
+        """
+        return self.create_renditions(input_path, output_formats, encodings)["paths"]
+    
+    def create_renditions(self, input_path: str, output_formats: List[str] = None,
+                          encodings: List[str] = None) -> Dict[str, Any]:
+        """Decode once, cascade-resize and encode every rendition in parallel, with timings"""
         if output_formats is None:
             output_formats = ["thumbnail", "small", "medium", "large"]
+        if encodings is None:
+            encodings = ["jpeg"]
         
         input_path = Path(input_path)
         if not input_path.exists():
             raise FileNotFoundError(f"Input image not found: {input_path}")
         
-        optimized_paths = {}
+        available = self.available_encodings()
+        for encoding in encodings:
+            if encoding not in available:
+                raise ValueError(f"Unsupported image encoding '{encoding}' (available: {available})")
+        
+        format_names = [name for name in output_formats if name in self.quality_settings]
+        timings = {"decode_seconds": 0.0, "resize_seconds": 0.0, "encode_seconds": 0.0}
         
         try:
+            start = time.perf_counter()
             with Image.open(input_path) as img:
+                sizes = [self.quality_settings[name].get("size") for name in format_names]
+                if sizes and None not in sizes:
+                    # Let JPEG decode at a reduced DCT scale when only smaller renditions are needed
+                    img.draft("RGB", max(sizes, key=lambda size: size[0] * size[1]))
+                img.load()
+                
                 # Convert to RGB if necessary
                 if img.mode in ('RGBA', 'LA', 'P'):
                     img = img.convert('RGB')
+                timings["decode_seconds"] = time.perf_counter() - start
+                
+                # Cascade: largest bounding box first, each level resized from the previous one
+                start = time.perf_counter()
+                renditions = {}
+                current = img
+                by_area = sorted(
+                    format_names,
+                    key=lambda name: -self._area(self.quality_settings[name].get("size"))
+                )
+                for format_name in by_area:
+                    size = self.quality_settings[format_name].get("size")
+                    if size is None:
+                        renditions[format_name] = img
+                        continue
+                    current = self._downscale(current, size)
+                    renditions[format_name] = current
+                timings["resize_seconds"] = time.perf_counter() - start
                 
-                # Create base filename
+                # Encode on the shared pool, one task per distinct image: Image.save stores
+                # per-call state on the image, so an image is never encoded by two threads at once
                 base_name = input_path.stem
+                keys = []
+                jobs: Dict[int, tuple] = {}
+                for format_name in format_names:
+                    image = renditions[format_name]
+                    quality = self.quality_settings[format_name]["quality"]
+                    _, outputs = jobs.setdefault(id(image), (image, []))
+                    for encoding in encodings:
+                        key = format_name if encoding == "jpeg" else f"{format_name}_{encoding}"
+                        output_path = self.output_dir / f"{base_name}_{format_name}{self.ENCODINGS[encoding][1]}"
+                        outputs.append((key, encoding, quality, output_path))
+                        keys.append(key)
                 
-                for format_name in output_formats:
-                    if format_name not in self.quality_settings:
-                        continue
-                    
-                    settings = self.quality_settings[format_name]
-                    
-                    # Create optimized version
-                    optimized_img = img.copy()
-                    
-                    # Resize if size specified
-                    if "size" in settings:
-                        optimized_img.thumbnail(settings["size"], Image.Resampling.LANCZOS)
-                    
-                    # Generate output path
-                    output_path = self.output_dir / f"{base_name}_{format_name}.jpg"
-                    
-                    # Save with optimization
-                    optimized_img.save(
-                        output_path,
-                        "JPEG",
-                        quality=settings["quality"],
-                        optimize=True,
-                        progressive=True
-                    )
-                    
-                    optimized_paths[format_name] = str(output_path)
+                pool = self._get_encoder_pool()
+                futures = [pool.submit(self._encode_renditions, image, outputs) for image, outputs in jobs.values()]
+                
+                encoded = {}
+                for future in futures:
+                    for key, output_path, size_bytes, encode_seconds in future.result():
+                        encoded[key] = (str(output_path), size_bytes)
+                        timings["encode_seconds"] += encode_seconds
                 
-                return optimized_paths
+                # Keep the requested order
+                optimized_paths = {key: encoded[key][0] for key in keys}
+                encoded_bytes = {key: encoded[key][1] for key in keys}
+                
+                return {
+                    "paths": optimized_paths,
+                    "size_bytes": encoded_bytes,
+                    "timings": timings
+                }
                 
         except Exception as e:
             logging.error(f"Error optimizing image {input_path}: {e}")
             raise
     
+    def close(self):
+        """Shut down the encoder pool"""
+        with self._pool_lock:
+            if self._encoder_pool is not None:
+                self._encoder_pool.shutdown()
+                self._encoder_pool = None
+    
+    def _get_encoder_pool(self) -> ThreadPoolExecutor:
+        """Encoder pool shared by every image (and campaign) this optimizer handles"""
+        with self._pool_lock:
+            if self._encoder_pool is None:
+                self._encoder_pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="rendition-encoder"
+                )
+            return self._encoder_pool
+    
+    def _encode_renditions(self, image: Image.Image, outputs: List[tuple]) -> List[tuple]:
+        """Encode one image to each (key, encoding, quality, path) and publish by content hash"""
+        results = []
+        for key, encoding, quality, output_path in outputs:
+            start = time.perf_counter()
+            pil_format, _, options = self.ENCODINGS[encoding]
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, quality=quality, **options)
+            data = buffer.getvalue()
+            encode_seconds = time.perf_counter() - start
+            
+            digest = self.blob_store.put_bytes(data)
+            self.blob_store.materialize(digest, output_path)
+            results.append((key, output_path, len(data), encode_seconds))
+        return results
+    
+    @staticmethod
+    def _area(size: Optional[tuple]) -> float:
+        return float("inf") if size is None else size[0] * size[1]
+    
+    @staticmethod
+    def _downscale(image: Image.Image, size: tuple) -> Image.Image:
+        """Shrink to fit within size, keeping aspect ratio (never enlarges, like thumbnail)"""
+        width, height = image.size
+        scale = min(size[0] / width, size[1] / height)
+        if scale >= 1:
+            return image
+        new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return image.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    
     def get_optimization_stats(self, original_path: str, optimized_paths: Dict[str, str]) -> Dict[str, Any]:
         """Get optimization statistics"""
         original_size = Path(original_path).stat().st_size
@@ -462,11 +894,16 @@ class ImageOptimizer:
 
 
 class CDNSimulator:
-    """Simulates CDN behavior with geographic distribution"""
+    """Simulates CDN behavior with geographic distribution
+    
+    Edge copies are links to one blob in a content-addressed BlobStore
+    rather than a byte copy per edge location.
+    """
     
-    def __init__(self, base_dir: str = "cdn_cache"):
+    def __init__(self, base_dir: str = "cdn_cache", blob_store: Optional[BlobStore] = None):
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(exist_ok=True)
+        self.blob_store = blob_store or get_blob_store()
         
         # Simulate edge locations
         self.edge_locations = {
@@ -486,17 +923,19 @@ class CDNSimulator:
         if not local_path.exists():
             raise FileNotFoundError(f"Local file not found: {local_path}")
         
+        # Files published through the blob store are not re-hashed
+        digest = self.blob_store.ref_digest(local_path) or self.blob_store.put_file(local_path)
+        return self.publish(digest, cdn_path)
+    
+    def publish(self, digest: str, cdn_path: str) -> Dict[str, str]:
+        """Publish a stored blob to every edge location by hash"""
         cdn_urls = {}
         
         for location, info in self.edge_locations.items():
-            edge_dir = self.base_dir / info["path"]
-            edge_file = edge_dir / cdn_path
+            edge_file = self.base_dir / info["path"] / cdn_path
             
-            # Create subdirectories if needed
-            edge_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Copy file to edge location
-            shutil.copy2(local_path, edge_file)
+            # Link the blob into the edge location
+            self.blob_store.materialize(digest, edge_file)
             
             # Generate CDN URL
             cdn_urls[location] = f"https://cdn-{location}.example.com/{cdn_path}"
@@ -531,8 +970,9 @@ class PerformanceOptimizer:
     def __init__(self):
         self.memory_cache = MemoryCache(max_size_mb=100)
         self.disk_cache = DiskCache(max_size_mb=500)
-        self.image_optimizer = ImageOptimizer()
-        self.cdn_simulator = CDNSimulator()
+        self.blob_store = get_blob_store()
+        self.image_optimizer = ImageOptimizer(blob_store=self.blob_store)
+        self.cdn_simulator = CDNSimulator(blob_store=self.blob_store)
         self.logger = logging.getLogger(__name__)
         
         # Performance metrics
@@ -579,48 +1019,61 @@ class PerformanceOptimizer:
         self.logger.info(f"Cache MISS: {campaign_id}")
         return None
     
-    def optimize_campaign_assets(self, asset_paths: List[str]) -> Dict[str, Any]:
-        """Optimize all assets in a campaign"""
+    def optimize_campaign_assets(self, asset_paths: List[str], encodings: List[str] = None,
+                                 max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """Optimize all assets in a campaign
+        
+        Assets are decoded and resized concurrently; their renditions share the
+        optimizer's encoder pool.
+        """
+        start = time.perf_counter()
         optimization_results = {
             "optimized_assets": {},
             "cdn_urls": {},
             "total_size_reduction_percent": 0,
-            "performance_improvement": {}
+            "performance_improvement": {},
+            "timings": {}
         }
         
         total_original_size = 0
         total_optimized_size = 0
+        encode_seconds = 0.0
         
-        for asset_path in asset_paths:
-            try:
-                # Optimize image
-                optimized_paths = self.image_optimizer.optimize_image(asset_path)
-                optimization_stats = self.image_optimizer.get_optimization_stats(asset_path, optimized_paths)
-                
-                optimization_results["optimized_assets"][asset_path] = {
-                    "paths": optimized_paths,
-                    "stats": optimization_stats
-                }
-                
-                # Upload to CDN simulator
-                cdn_urls = {}
-                for format_name, opt_path in optimized_paths.items():
-                    cdn_path = f"campaigns/{Path(asset_path).stem}/{format_name}.jpg"
-                    urls = self.cdn_simulator.upload_to_cdn(opt_path, cdn_path)
-                    cdn_urls[format_name] = urls
+        workers = min(max_workers or self.image_optimizer.max_workers, max(1, len(asset_paths)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="campaign-asset") as executor:
+            futures = {
+                executor.submit(self._optimize_asset, asset_path, encodings): asset_path
+                for asset_path in asset_paths
+            }
+            for future in as_completed(futures):
+                asset_path = futures[future]
+                try:
+                    asset_result, cdn_urls = future.result()
+                except Exception as e:
+                    self.logger.error(f"Error optimizing asset {asset_path}: {e}")
+                    continue
                 
+                optimization_results["optimized_assets"][asset_path] = asset_result
                 optimization_results["cdn_urls"][asset_path] = cdn_urls
                 
                 # Update size metrics
-                total_original_size += optimization_stats["original_size_bytes"]
-                for version_stats in optimization_stats["optimized_versions"].values():
-                    total_optimized_size += version_stats["size_bytes"]
+                total_original_size += asset_result["original_size_bytes"]
+                total_optimized_size += asset_result["optimized_size_bytes"]
+                encode_seconds += asset_result["timings"]["encode_seconds"]
                 
                 self.metrics["image_optimizations"] += 1
-                self.metrics["cdn_uploads"] += len(optimized_paths)
-                
-            except Exception as e:
-                self.logger.error(f"Error optimizing asset {asset_path}: {e}")
+                self.metrics["cdn_uploads"] += len(asset_result["paths"])
+        
+        # Keep assets in the order they were given
+        for key in ("optimized_assets", "cdn_urls"):
+            results = optimization_results[key]
+            optimization_results[key] = {path: results[path] for path in asset_paths if path in results}
+        
+        optimization_results["timings"] = {
+            "wall_seconds": time.perf_counter() - start,
+            "encode_seconds": encode_seconds,
+            "workers": workers
+        }
         
         # Calculate overall improvement
         if total_original_size > 0:
@@ -636,6 +1089,31 @@ class PerformanceOptimizer:
         
         return optimization_results
     
+    def _optimize_asset(self, asset_path: str, encodings: Optional[List[str]]) -> tuple:
+        """Create one asset's renditions and publish them to the CDN"""
+        renditions = self.image_optimizer.create_renditions(asset_path, encodings=encodings)
+        optimized_paths = renditions["paths"]
+        optimization_stats = self.image_optimizer.get_optimization_stats(asset_path, optimized_paths)
+        
+        # Upload to CDN simulator
+        cdn_urls = {}
+        for format_name, opt_path in optimized_paths.items():
+            cdn_path = f"campaigns/{Path(asset_path).stem}/{format_name}{Path(opt_path).suffix}"
+            cdn_urls[format_name] = self.cdn_simulator.upload_to_cdn(opt_path, cdn_path)
+        
+        original_size = optimization_stats["original_size_bytes"]
+        optimized_size = sum(renditions["size_bytes"].values())
+        asset_result = {
+            "paths": optimized_paths,
+            "stats": optimization_stats,
+            "original_size_bytes": original_size,
+            "optimized_size_bytes": optimized_size,
+            "bytes_saved": original_size - optimized_size,
+            "size_reduction_percent": (1 - optimized_size / original_size) * 100 if original_size else 0,
+            "timings": renditions["timings"]
+        }
+        return asset_result, cdn_urls
+    
     def get_performance_report(self) -> Dict[str, Any]:
         """Generate comprehensive performance report"""
         memory_stats = self.memory_cache.get_stats()
@@ -645,8 +1123,11 @@ class PerformanceOptimizer:
             "cache_performance": {
                 "memory_cache": memory_stats,
                 "memory_hit_rate": memory_stats["hit_rate_percent"],
-                "memory_utilization": memory_stats["utilization_percent"]
+                "memory_utilization": memory_stats["utilization_percent"],
+                "memory_namespaces": memory_stats["namespaces"],
+                "disk_cache": self.disk_cache.get_stats()
             },
+            "blob_store": self.blob_store.get_stats(),
             "optimization_metrics": self.metrics,
             "recommendations": self._generate_performance_recommendations(memory_stats)
         }
@@ -665,6 +1146,14 @@ class PerformanceOptimizer:
         if utilization > 80:
             recommendations.append("Cache is near capacity - consider increasing cache size or implementing better eviction")
         
+        for namespace, namespace_stats in cache_stats.get("namespaces", {}).items():
+            lookups = namespace_stats["hits"] + namespace_stats["misses"]
+            if lookups >= 20 and namespace_stats["hit_rate_percent"] < 25:
+                recommendations.append(
+                    f"Cache namespace '{namespace}' rarely hits ({namespace_stats['hit_rate_percent']:.0f}%) - "
+                    "review its TTLs or stop caching it"
+                )
+        
         if self.metrics["image_optimizations"] > 0:
             recommendations.append("Image optimization is active - consider implementing WebP format for modern browsers")
         
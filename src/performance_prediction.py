@@ -13,14 +13,16 @@ Free technologies used:
 
 import logging
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Iterator
 from datetime import datetime, timedelta
 import pickle
-import cv2
-from PIL import Image, ImageStat
+from PIL import ImageStat
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split, cross_val_score
@@ -28,6 +30,11 @@ from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 
+try:
+    from .image_analysis import ImageAnalysisContext, get_analysis_context
+except ImportError:
+    from image_analysis import ImageAnalysisContext, get_analysis_context
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,18 +44,19 @@ class CreativeFeatureExtractor:
     def __init__(self):
         self.supported_formats = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
     
-    def extract_visual_features(self, image_path: str) -> Dict[str, float]:
+    def extract_visual_features(self, image_path: str, context: Optional[ImageAnalysisContext] = None) -> Dict[str, float]:
         """Extract visual features from an image."""
         try:
-            # Load image
-            img = cv2.imread(image_path)
-            if img is None:
+            # Load image (shared with other analyses of the same file)
+            context = context or get_analysis_context(image_path)
+            try:
+                img = context.bgr
+            except ValueError:
                 logger.warning(f"Could not load image: {image_path}")
                 return self._get_default_features()
             
             # Convert to RGB
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            pil_img = Image.fromarray(img_rgb)
+            pil_img = context.pil
             
             features = {}
             
@@ -70,17 +78,17 @@ class CreativeFeatureExtractor:
             features['color_variance'] = np.var(stat.mean) / (255.0 ** 2)
             
             # Edge detection (indicates visual complexity)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            edges = cv2.Canny(gray, 50, 150)
+            gray = context.gray
+            edges = context.edges(50, 150)
             features['edge_density'] = np.sum(edges > 0) / (width * height)
             
             # Contrast analysis
             features['contrast'] = gray.std() / 255.0
             
             # Color histogram features
-            hist_r = cv2.calcHist([img_rgb], [0], None, [8], [0, 256])
-            hist_g = cv2.calcHist([img_rgb], [1], None, [8], [0, 256])
-            hist_b = cv2.calcHist([img_rgb], [2], None, [8], [0, 256])
+            hist_r = context.bgr_histogram(2, 8)
+            hist_g = context.bgr_histogram(1, 8)
+            hist_b = context.bgr_histogram(0, 8)
             
             # Dominant color features
             features['dominant_red'] = np.argmax(hist_r) / 7.0
@@ -110,6 +118,32 @@ class CreativeFeatureExtractor:
         }
 
 
+# Per-process extractor, created once by the pool initializer
+_worker_extractor: Optional[CreativeFeatureExtractor] = None
+
+# Below this many creatives, starting a process pool costs more than it saves
+MIN_POOL_BATCH_SIZE = 8
+
+
+def _init_worker() -> None:
+    """Create the feature extractor used by every task in this worker process."""
+    global _worker_extractor
+    _worker_extractor = CreativeFeatureExtractor()
+
+
+def _extract_features_task(image_path: Optional[str]) -> Tuple[Optional[str], Dict[str, float]]:
+    """Extract visual features for one creative. Runs inside a worker process."""
+    if _worker_extractor is None:
+        _init_worker()
+
+    if image_path and Path(image_path).exists():
+        # Private context: workers should not keep decoded pixels around between tasks
+        features = _worker_extractor.extract_visual_features(image_path, ImageAnalysisContext(image_path))
+    else:
+        features = _worker_extractor._get_default_features()
+    return image_path, features
+
+
 class PerformancePredictionModel:
     """ML model for predicting creative performance."""
     
@@ -274,7 +308,8 @@ class PerformancePredictionModel:
         self._save_models()
         logger.info("Model training completed")
     
-    def predict_performance(self, image_path: str = None, campaign_brief: Dict = None) -> Dict[str, float]:
+    def predict_performance(self, image_path: str = None, campaign_brief: Dict = None,
+                            context: Optional[ImageAnalysisContext] = None) -> Dict[str, float]:
         """Predict performance metrics for a creative."""
         if not any(self.models.values()):
             logger.warning("No trained models available")
@@ -283,35 +318,44 @@ class PerformancePredictionModel:
         try:
             # Extract visual features
             if image_path and Path(image_path).exists():
-                visual_features = self.feature_extractor.extract_visual_features(image_path)
+                visual_features = self.feature_extractor.extract_visual_features(image_path, context)
             else:
                 visual_features = self.feature_extractor._get_default_features()
             
             # Extract campaign features
             campaign_features = self._extract_campaign_features(campaign_brief or {})
             
-            # Combine features
-            all_features = {**visual_features, **campaign_features}
-            
-            # Prepare feature vector
-            feature_vector = self._prepare_feature_vector(all_features)
-            
-            # Predict each metric
-            predictions = {}
-            for metric in self.models.keys():
-                if self.models[metric] is not None and self.scalers[metric] is not None:
-                    X_scaled = self.scalers[metric].transform([feature_vector])
-                    prediction = self.models[metric].predict(X_scaled)[0]
-                    predictions[metric] = max(0, prediction)  # Ensure non-negative
-                else:
-                    predictions[metric] = self._get_default_predictions()[metric]
-            
-            return predictions
+            return self.predict_feature_batch([{**visual_features, **campaign_features}])[0]
             
         except Exception as e:
             logger.error(f"Error predicting performance: {e}")
             return self._get_default_predictions()
     
+    def predict_feature_batch(self, feature_dicts: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """Predict metrics for many creatives with one model call per metric."""
+        if not feature_dicts:
+            return []
+        if not any(self.models.values()):
+            logger.warning("No trained models available")
+            return [self._get_default_predictions() for _ in feature_dicts]
+        
+        # Stack every creative into a single feature matrix
+        X = np.array([self._prepare_feature_vector(features) for features in feature_dicts], dtype=float)
+        
+        defaults = self._get_default_predictions()
+        columns = {}
+        for metric in self.models.keys():
+            if self.models[metric] is not None and self.scalers[metric] is not None:
+                X_scaled = self.scalers[metric].transform(X)
+                columns[metric] = np.maximum(self.models[metric].predict(X_scaled), 0)  # Ensure non-negative
+            else:
+                columns[metric] = np.full(len(X), defaults[metric])
+        
+        return [
+            {metric: float(values[row]) for metric, values in columns.items()}
+            for row in range(len(X))
+        ]
+    
     def _extract_campaign_features(self, campaign_brief: Dict) -> Dict[str, Any]:
         """Extract features from campaign brief."""
         features = {}
@@ -431,17 +475,23 @@ class PerformancePredictionModel:
 class PerformancePredictionEngine:
     """Main engine for creative performance prediction."""
     
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         self.model = PerformancePredictionModel()
         self.prediction_history = []
+        self.max_workers = max_workers or os.cpu_count() or 1
     
-    def predict_creative_performance(self, image_path: str = None, campaign_brief: Dict = None) -> Dict:
+    def predict_creative_performance(self, image_path: str = None, campaign_brief: Dict = None,
+                                     context: Optional[ImageAnalysisContext] = None) -> Dict:
         """Predict performance for a creative asset."""
         logger.info(f"Predicting performance for creative: {image_path}")
         
         # Get predictions
-        predictions = self.model.predict_performance(image_path, campaign_brief)
+        predictions = self.model.predict_performance(image_path, campaign_brief, context)
         
+        return self._build_result(image_path, predictions)
+    
+    def _build_result(self, image_path: Optional[str], predictions: Dict[str, float]) -> Dict:
+        """Score, grade and record one prediction."""
         # Get optimization suggestions
         suggestions = self.model.get_optimization_suggestions(predictions)
         
@@ -543,15 +593,111 @@ class PerformancePredictionEngine:
             'top_performing_creative': max(recent_predictions, key=lambda x: x['overall_score'])['image_path'] if recent_predictions else None
         }
     
-    def batch_predict(self, image_paths: List[str], campaign_brief: Dict = None) -> List[Dict]:
+    def batch_predict(self, image_paths: List[str], campaign_brief: Dict = None,
+                      max_workers: Optional[int] = None) -> List[Dict]:
         """Predict performance for multiple creatives."""
-        results = []
-        for image_path in image_paths:
-            result = self.predict_creative_performance(image_path, campaign_brief)
-            results.append(result)
+        results = list(self.iter_batch_predict(image_paths, campaign_brief, max_workers=max_workers))
         
         # Sort by overall score
         results.sort(key=lambda x: x['overall_score'], reverse=True)
         
         logger.info(f"Batch prediction completed for {len(image_paths)} creatives")
-        return results
\ No newline at end of file
+        return results
+    
+    def iter_batch_predict(
+        self,
+        image_paths: List[str],
+        campaign_brief: Dict = None,
+        max_workers: Optional[int] = None,
+        chunk_size: int = 64
+    ) -> Iterator[Dict]:
+        """Yield predictions as creatives finish feature extraction.
+        
+        Visual features are extracted on a process pool. Completed feature rows
+        are stacked into matrices of up to chunk_size and scored with one model
+        call per metric, so results stream back without a per-image predict.
+        """
+        if not image_paths:
+            return
+        
+        # Campaign features are identical for every creative in the batch
+        campaign_features = self.model._extract_campaign_features(campaign_brief or {})
+        max_workers = max_workers or self.max_workers
+        
+        pending: List[Tuple[Optional[str], Dict[str, float]]] = []
+        for image_path, visual_features in self._extract_batch_features(image_paths, max_workers):
+            pending.append((image_path, {**visual_features, **campaign_features}))
+            if len(pending) >= chunk_size:
+                yield from self._score_chunk(pending)
+                pending = []
+        
+        if pending:
+            yield from self._score_chunk(pending)
+    
+    def _score_chunk(self, chunk: List[Tuple[Optional[str], Dict[str, Any]]]) -> Iterator[Dict]:
+        """Score a chunk of feature rows in one vectorized call."""
+        try:
+            predictions = self.model.predict_feature_batch([features for _, features in chunk])
+        except Exception as e:
+            logger.error(f"Error predicting performance batch: {e}")
+            predictions = [self.model._get_default_predictions() for _ in chunk]
+        
+        for (image_path, _), prediction in zip(chunk, predictions):
+            yield self._build_result(image_path, prediction)
+    
+    def _extract_batch_features(
+        self,
+        image_paths: List[str],
+        max_workers: int
+    ) -> Iterator[Tuple[Optional[str], Dict[str, float]]]:
+        """Extract visual features on a process pool, in completion order.
+        
+        Small batches are extracted inline. If the consumer stops iterating
+        early, queued extractions are cancelled instead of waited for.
+        """
+        if max_workers <= 1 or len(image_paths) < MIN_POOL_BATCH_SIZE:
+            for image_path in image_paths:
+                yield self._extract_inline(image_path)
+            return
+        
+        done = set()
+        executor = None
+        finished = False
+        try:
+            executor = ProcessPoolExecutor(
+                max_workers=min(max_workers, len(image_paths)),
+                initializer=_init_worker
+            )
+            futures = {executor.submit(_extract_features_task, path): index for index, path in enumerate(image_paths)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Feature extraction failed for {image_paths[index]}: {e}")
+                    result = (image_paths[index], self.model.feature_extractor._get_default_features())
+                done.add(index)
+                yield result
+            finished = True
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"Process pool unavailable ({e}), extracting features inline")
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = None
+            for index, image_path in enumerate(image_paths):
+                if index not in done:
+                    yield self._extract_inline(image_path)
+        finally:
+            if executor is not None:
+                # Closed mid-iteration: don't block on work nobody will read
+                executor.shutdown(wait=finished, cancel_futures=not finished)
+    
+    def _extract_inline(self, image_path: Optional[str]) -> Tuple[Optional[str], Dict[str, float]]:
+        """Extract visual features for one creative in the current process."""
+        try:
+            return _extract_features_task(image_path)
+        except Exception as e:
+            logger.warning(f"Feature extraction failed for {image_path}: {e}")
+            return image_path, self.model.feature_extractor._get_default_features()
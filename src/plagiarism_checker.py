@@ -11,7 +11,6 @@ Provides content originality verification through multiple methods:
 import re
 import os
 import json
-import hashlib
 import logging
 from typing import Dict, List, Optional, Tuple, Any, Set
 from dataclasses import dataclass, field
@@ -19,6 +18,15 @@ from datetime import datetime
 from collections import Counter
 import math
 
+import numpy as np
+
+try:
+    from .minhash_index import MinHasher, MinHashLSHIndex, choose_lsh_bands
+    from .vector_index import VectorIndex, normalize_rows
+except ImportError:
+    from minhash_index import MinHasher, MinHashLSHIndex, choose_lsh_bands
+    from vector_index import VectorIndex, normalize_rows
+
 # Optional imports with fallbacks
 try:
     import requests
@@ -28,14 +36,14 @@ except ImportError:
 
 try:
     from sentence_transformers import SentenceTransformer
-    import numpy as np
     HAS_SENTENCE_TRANSFORMERS = True
 except ImportError:
     HAS_SENTENCE_TRANSFORMERS = False
 
 try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.preprocessing import normalize
+    import scipy.sparse as sp
     HAS_SKLEARN = True
 except ImportError:
     HAS_SKLEARN = False
@@ -118,15 +126,28 @@ class PlagiarismReport:
         }
 
 
+@dataclass
+class TextFeatures:
+    """Fingerprint and embedding features of a text, computed once and reused across checks."""
+    signature: np.ndarray
+    shingles: Set[str]
+    sentences: List[str]
+    sentence_embeddings: Optional[Any] = None
+
+
 class ContentFingerprinter:
     """
     Generate and compare content fingerprints for plagiarism detection.
-    Uses shingling and MinHash for efficient similarity detection.
+    Uses shingling and MinHash for efficient similarity detection, with an
+    LSH banding index so lookups only score candidate documents.
     """
 
-    def __init__(self, shingle_size: int = 5, num_hashes: int = 100):
+    def __init__(self, shingle_size: int = 5, num_hashes: int = 100, lsh_threshold: float = 0.2):
         self.shingle_size = shingle_size
         self.num_hashes = num_hashes
+        self.lsh_threshold = lsh_threshold
+        self.minhasher = MinHasher(num_hashes, shingle_size)
+        self.index = MinHashLSHIndex(num_hashes, choose_lsh_bands(num_hashes, lsh_threshold))
         self.fingerprint_db: Dict[str, Dict[str, Any]] = {}
 
     def _tokenize(self, text: str) -> List[str]:
@@ -146,36 +167,28 @@ class ContentFingerprinter:
 
         return shingles
 
-    def _hash_shingle(self, shingle: str, seed: int) -> int:
-        """Hash a shingle with a seed for MinHash."""
-        return int(hashlib.md5(f"{seed}{shingle}".encode()).hexdigest(), 16)
-
-    def create_minhash_signature(self, text: str) -> List[int]:
-        """Create MinHash signature for text."""
-        shingles = self._create_shingles(text)
-
-        if not shingles:
-            return [0] * self.num_hashes
+    def create_minhash_signature(self, text: str) -> np.ndarray:
+        """Create MinHash signature for text (all zeros if it has no shingles)."""
+        return self.minhasher.signature(self._tokenize(text))
 
-        signature = []
-        for seed in range(self.num_hashes):
-            min_hash = min(self._hash_shingle(s, seed) for s in shingles)
-            signature.append(min_hash)
+    def create_minhash_signatures(self, texts: List[str]) -> np.ndarray:
+        """Create MinHash signatures for many texts (one row per text)."""
+        return self.minhasher.signatures([self._tokenize(text) for text in texts])
 
-        return signature
-
-    def estimate_similarity(self, sig1: List[int], sig2: List[int]) -> float:
+    def estimate_similarity(self, sig1: np.ndarray, sig2: np.ndarray) -> float:
         """Estimate Jaccard similarity from MinHash signatures."""
-        if not sig1 or not sig2:
+        if len(sig1) == 0 or len(sig2) == 0:
             return 0.0
 
-        matches = sum(1 for a, b in zip(sig1, sig2) if a == b)
-        return matches / len(sig1)
+        return float(np.mean(np.asarray(sig1) == np.asarray(sig2)))
 
-    def add_to_database(self, doc_id: str, text: str, metadata: Optional[Dict] = None):
-        """Add document fingerprint to database."""
-        signature = self.create_minhash_signature(text)
-        shingles = self._create_shingles(text)
+    def add_to_database(self, doc_id: str, text: str, metadata: Optional[Dict] = None,
+                        signature: Optional[np.ndarray] = None, shingles: Optional[Set[str]] = None):
+        """Add document fingerprint to database (optionally with a precomputed signature and shingles)."""
+        if signature is None:
+            signature = self.create_minhash_signature(text)
+        if shingles is None:
+            shingles = self._create_shingles(text)
 
         self.fingerprint_db[doc_id] = {
             "signature": signature,
@@ -183,25 +196,40 @@ class ContentFingerprinter:
             "metadata": metadata or {},
             "added_at": datetime.now().isoformat()
         }
+        self.index.add(doc_id, signature)
+
+    def remove_from_database(self, doc_id: str):
+        """Remove a document fingerprint."""
+        self.fingerprint_db.pop(doc_id, None)
+        self.index.remove(doc_id)
 
     def find_similar(self, text: str, threshold: float = 0.3) -> List[Tuple[str, float]]:
         """Find similar documents in database."""
-        query_sig = self.create_minhash_signature(text)
-        results = []
+        return self.find_similar_signature(self.create_minhash_signature(text), threshold)
 
-        for doc_id, doc_data in self.fingerprint_db.items():
-            similarity = self.estimate_similarity(query_sig, doc_data["signature"])
-            if similarity >= threshold:
-                results.append((doc_id, similarity))
+    def find_similar_signature(self, signature: np.ndarray, threshold: float = 0.3,
+                               exclude_ids: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Find documents similar to a signature.
 
-        return sorted(results, key=lambda x: x[1], reverse=True)
+        Thresholds at or above lsh_threshold score only LSH candidates; lower
+        thresholds fall back to one vectorized pass over every signature.
+        """
+        results = self.index.query(signature, threshold, exhaustive=threshold < self.lsh_threshold)
+        if exclude_ids:
+            results = [(doc_id, sim) for doc_id, sim in results if doc_id not in exclude_ids]
+        return results
 
-    def get_exact_matches(self, text: str) -> Dict[str, List[str]]:
-        """Find exact shingle matches with stored documents."""
-        query_shingles = self._create_shingles(text)
+    def get_exact_matches(self, text: str, doc_ids: Optional[List[str]] = None,
+                          shingles: Optional[Set[str]] = None) -> Dict[str, List[str]]:
+        """Find exact shingle matches with stored documents (optionally only the given ones)."""
+        query_shingles = shingles if shingles is not None else self._create_shingles(text)
         matches = {}
 
-        for doc_id, doc_data in self.fingerprint_db.items():
+        candidates = self.fingerprint_db.keys() if doc_ids is None else doc_ids
+        for doc_id in candidates:
+            doc_data = self.fingerprint_db.get(doc_id)
+            if doc_data is None:
+                continue
             common = query_shingles.intersection(doc_data["shingles"])
             if common:
                 matches[doc_id] = list(common)
@@ -327,9 +355,14 @@ class SemanticSimilarityChecker:
     """
     Use sentence embeddings for semantic similarity detection.
     Catches paraphrased content that word-matching might miss.
+
+    Every stored sentence is one L2-normalized row of a single VectorIndex,
+    keyed by (doc_id, sentence_index). A check multiplies all query sentences
+    against the whole corpus block by block and keeps the best match per query
+    sentence; above approximate_threshold sentences the index switches to IVF.
     """
 
-    def __init__(self):
+    def __init__(self, approximate_threshold: Optional[int] = 1000000):
         self.model = None
         self.enabled = HAS_SENTENCE_TRANSFORMERS
 
@@ -341,7 +374,8 @@ class SemanticSimilarityChecker:
                 logger.warning(f"Could not load sentence transformer: {e}")
                 self.enabled = False
 
-        self.document_embeddings: Dict[str, np.ndarray] = {}
+        self.index = VectorIndex(ivf_threshold=approximate_threshold)
+        self.document_sentences: Dict[str, List[str]] = {}
 
     def _split_sentences(self, text: str) -> List[str]:
         """Split text into sentences."""
@@ -359,51 +393,64 @@ class SemanticSimilarityChecker:
             logger.error(f"Failed to generate embeddings: {e}")
             return None
 
-    def add_document(self, doc_id: str, text: str):
-        """Add document embeddings for comparison."""
+    def add_document(self, doc_id: str, text: str, sentences: Optional[List[str]] = None,
+                     embeddings: Optional[Any] = None):
+        """Add document embeddings for comparison (optionally precomputed)."""
         if not self.enabled:
             return
 
-        sentences = self._split_sentences(text)
-        embeddings = self.get_embeddings(sentences)
+        if sentences is None or embeddings is None:
+            sentences = self._split_sentences(text)
+            embeddings = self.get_embeddings(sentences)
 
-        if embeddings is not None:
-            self.document_embeddings[doc_id] = {
-                "sentences": sentences,
-                "embeddings": embeddings
-            }
+        if embeddings is None:
+            return
 
-    def find_similar_sentences(self, text: str, threshold: float = 0.85) -> List[Dict[str, Any]]:
+        self.remove_document(doc_id)
+        if len(sentences):
+            self.document_sentences[doc_id] = sentences
+            self.index.add_batch([(doc_id, i) for i in range(len(sentences))], embeddings)
+
+    def remove_document(self, doc_id: str):
+        """Remove a document's sentences."""
+        sentences = self.document_sentences.pop(doc_id, None)
+        for i in range(len(sentences or ())):
+            self.index.remove((doc_id, i))
+
+    def find_similar_sentences(self, text: str, threshold: float = 0.85,
+                               sentences: Optional[List[str]] = None,
+                               query_embeddings: Optional[Any] = None,
+                               exclude_ids: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
         """Find semantically similar sentences in stored documents."""
-        if not self.enabled or not self.document_embeddings:
+        if not self.enabled or not len(self.index):
             return []
 
-        sentences = self._split_sentences(text)
-        query_embeddings = self.get_embeddings(sentences)
+        if sentences is None or query_embeddings is None:
+            sentences = self._split_sentences(text)
+            query_embeddings = self.get_embeddings(sentences)
 
-        if query_embeddings is None:
+        if query_embeddings is None or len(sentences) == 0:
             return []
 
-        matches = []
-
-        for doc_id, doc_data in self.document_embeddings.items():
-            doc_embeddings = doc_data["embeddings"]
-            doc_sentences = doc_data["sentences"]
-
-            # Calculate similarity matrix
-            similarity_matrix = np.dot(query_embeddings, doc_embeddings.T)
-
-            for i, query_sent in enumerate(sentences):
-                max_sim_idx = np.argmax(similarity_matrix[i])
-                max_sim = similarity_matrix[i][max_sim_idx]
+        excluded = [
+            (doc_id, i)
+            for doc_id in (exclude_ids or ())
+            for i in range(len(self.document_sentences.get(doc_id, ())))
+        ]
+        best_matches = self.index.search_batch(query_embeddings, top_k=1, exclude_ids=excluded)
 
-                if max_sim >= threshold:
-                    matches.append({
-                        "query_sentence": query_sent,
-                        "matched_sentence": doc_sentences[max_sim_idx],
-                        "similarity": float(max_sim),
-                        "doc_id": doc_id
-                    })
+        matches = []
+        for query_sent, best in zip(sentences, best_matches):
+            if not best:
+                continue
+            (doc_id, sentence_index), similarity = best[0]
+            if similarity >= threshold:
+                matches.append({
+                    "query_sentence": query_sent,
+                    "matched_sentence": self.document_sentences[doc_id][sentence_index],
+                    "similarity": similarity,
+                    "doc_id": doc_id
+                })
 
         return sorted(matches, key=lambda x: x["similarity"], reverse=True)
 
@@ -412,59 +459,176 @@ class TfidfChecker:
     """
     TF-IDF based similarity checking.
     Good for catching close paraphrases and rewording.
+
+    Documents are tokenized once into hashed term counts and kept as rows of a
+    sparse CSR matrix alongside running document frequencies, so adding a
+    document never refits the corpus. The IDF-weighted, L2-normalized matrix is
+    rebuilt lazily (a vectorized rescale, no re-tokenization) the first time it
+    is needed after a change, and a query is one sparse matrix-vector product.
+    Query terms that occur in no stored document are dropped, as they are
+    outside a fitted TfidfVectorizer's vocabulary, so scores match
+    TfidfVectorizer up to hashing collisions. Removed documents are
+    tombstoned and their rows are compacted away once they outnumber the
+    live ones.
     """
 
+    N_FEATURES = 2 ** 20
+
     def __init__(self):
         self.enabled = HAS_SKLEARN
         self.vectorizer = None
-        self.document_vectors = {}
         self.documents: Dict[str, str] = {}
 
+        # Raw term counts: one CSR row per document; doc_ids[row] is None once removed
+        self.doc_ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._tombstones = 0
+        self._counts = None
+        self._pending: List[Any] = []
+        self._document_frequency = None
+        self._idf_weights = None
+        self._weighted = None
+        self._alive = None
+
         if self.enabled:
-            self.vectorizer = TfidfVectorizer(
+            self.vectorizer = HashingVectorizer(
                 ngram_range=(1, 3),
                 stop_words='english',
-                max_features=10000
+                n_features=self.N_FEATURES,
+                alternate_sign=False,
+                norm=None
             )
+            self._counts = sp.csr_matrix((0, self.N_FEATURES), dtype=np.float64)
+            self._document_frequency = np.zeros(self.N_FEATURES, dtype=np.int64)
 
     def add_document(self, doc_id: str, text: str):
         """Add document for comparison."""
-        if not self.enabled:
-            return
+        self.add_documents([(doc_id, text)])
 
-        self.documents[doc_id] = text
-        self._rebuild_index()
-
-    def _rebuild_index(self):
-        """Rebuild TF-IDF index with all documents."""
-        if not self.documents:
+    def add_documents(self, documents: List[Tuple[str, str]]):
+        """Add many (doc_id, text) documents with one vectorizer call."""
+        if not self.enabled or not documents:
             return
 
-        all_texts = list(self.documents.values())
-        all_ids = list(self.documents.keys())
+        documents = list(dict(documents).items())
+        for doc_id, _ in documents:
+            if doc_id in self.documents:
+                self.remove_document(doc_id)
 
         try:
-            vectors = self.vectorizer.fit_transform(all_texts)
-
-            for i, doc_id in enumerate(all_ids):
-                self.document_vectors[doc_id] = vectors[i]
+            counts = self.vectorizer.transform([text for _, text in documents]).tocsr()
         except Exception as e:
-            logger.error(f"Failed to build TF-IDF index: {e}")
+            logger.error(f"Failed to vectorize documents for TF-IDF: {e}")
+            return
+
+        for doc_id, text in documents:
+            self.documents[doc_id] = text
+            self._rows[doc_id] = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+        self._pending.append(counts)
+        np.add.at(self._document_frequency, counts.indices, 1)
+        self._invalidate()
+
+    def remove_document(self, doc_id: str):
+        """Remove a document from the index."""
+        if not self.enabled or doc_id not in self.documents:
+            return
 
-    def check_similarity(self, text: str) -> List[Tuple[str, float]]:
+        row = self._rows.pop(doc_id)
+        np.subtract.at(self._document_frequency, self._row_counts(row).indices, 1)
+        self.doc_ids[row] = None
+        self._tombstones += 1
+        del self.documents[doc_id]
+        self._invalidate()
+
+        if self._tombstones > max(len(self._rows), 64):
+            self._compact()
+
+    def _row_counts(self, row: int):
+        """Term counts of one row, whether flushed or still pending."""
+        if row < self._counts.shape[0]:
+            return self._counts[row]
+        offset = self._counts.shape[0]
+        for block in self._pending:
+            if row < offset + block.shape[0]:
+                return block[row - offset]
+            offset += block.shape[0]
+        raise IndexError(row)
+
+    def _compact(self):
+        """Drop tombstoned rows from the count matrix."""
+        self._flush_pending()
+        keep = np.array([doc_id is not None for doc_id in self.doc_ids], dtype=bool)
+        self._counts = self._counts[keep]
+        self.doc_ids = [doc_id for doc_id in self.doc_ids if doc_id is not None]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        self._tombstones = 0
+        self._invalidate()
+
+    def _invalidate(self):
+        """Forget derived matrices after the corpus changed."""
+        self._idf_weights = None
+        self._weighted = None
+        self._alive = None
+
+    def _flush_pending(self):
+        """Append pending rows to the count matrix."""
+        if self._pending:
+            self._counts = sp.vstack([self._counts] + self._pending, format='csr')
+            self._pending = []
+
+    def _idf(self):
+        """Smoothed inverse document frequency (as in TfidfTransformer), as a sparse diagonal.
+
+        Terms with zero document frequency get weight 0, so unseen query terms
+        do not count toward the query norm.
+        """
+        if self._idf_weights is None:
+            n_documents = len(self._rows)
+            idf = np.log((1 + n_documents) / (1 + self._document_frequency)) + 1.0
+            idf[self._document_frequency == 0] = 0.0
+            self._idf_weights = sp.diags(idf, format='csr')
+        return self._idf_weights
+
+    def _weighted_matrix(self):
+        """IDF-weighted, L2-normalized document matrix, rebuilt after changes."""
+        if self._weighted is None:
+            self._flush_pending()
+            self._weighted = normalize(self._counts @ self._idf(), copy=False)
+        return self._weighted
+
+    def document_vectors(self, doc_ids: List[str]):
+        """IDF-weighted, L2-normalized rows for stored documents, in the given order."""
+        return self._weighted_matrix()[[self._rows[doc_id] for doc_id in doc_ids]]
+
+    def vectorize(self, texts: List[str]):
+        """IDF-weighted, L2-normalized vectors for texts against the current corpus."""
+        counts = self.vectorizer.transform(texts)
+        return normalize(counts @ self._idf(), copy=False)
+
+    def check_similarity(self, text: str, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
         """Check text similarity against stored documents."""
-        if not self.enabled or not self.document_vectors:
+        if not self.enabled or not self._rows:
             return []
 
         try:
-            query_vector = self.vectorizer.transform([text])
-            results = []
-
-            for doc_id, doc_vector in self.document_vectors.items():
-                similarity = cosine_similarity(query_vector, doc_vector)[0][0]
-                results.append((doc_id, float(similarity)))
-
-            return sorted(results, key=lambda x: x[1], reverse=True)
+            matrix = self._weighted_matrix()
+            query_vector = self.vectorize([text])
+            scores = (matrix @ query_vector.T).toarray().ravel()
+            if self._tombstones:
+                # Scores are non-negative; tombstoned rows sort last
+                if self._alive is None:
+                    self._alive = np.array([doc_id is not None for doc_id in self.doc_ids], dtype=bool)
+                scores[~self._alive] = -1.0
+
+            live = len(self._rows)
+            if top_k is not None and 0 < top_k < len(scores):
+                top_k = min(top_k, live)
+                order = np.argpartition(-scores, top_k - 1)[:top_k]
+                order = order[np.argsort(-scores[order], kind='stable')]
+            else:
+                order = np.argsort(-scores, kind='stable')[:live]
+            return [(self.doc_ids[i], float(scores[i])) for i in order]
         except Exception as e:
             logger.error(f"TF-IDF similarity check failed: {e}")
             return []
@@ -504,7 +668,9 @@ class PlagiarismChecker:
               use_copyscape: bool = True,
               check_internal: bool = True,
               check_semantic: bool = True,
-              deep_check: bool = False) -> PlagiarismReport:
+              deep_check: bool = False,
+              features: Optional[TextFeatures] = None,
+              exclude_ids: Optional[Set[str]] = None) -> PlagiarismReport:
         """
         Check text for plagiarism.
 
@@ -514,6 +680,8 @@ class PlagiarismChecker:
             check_internal: Check against internal content database
             check_semantic: Use semantic similarity detection
             deep_check: Perform more thorough checking (slower)
+            features: Precomputed features of text (see extract_features)
+            exclude_ids: Database documents to ignore (e.g. the text's own entry)
 
         Returns:
             PlagiarismReport with detailed results
@@ -539,9 +707,13 @@ class PlagiarismChecker:
         word_count = len(words)
         sentence_count = len([s for s in sentences if s.strip()])
 
+        # One fingerprint lookup serves the internal and fingerprint checks
+        signature = features.signature if features else self.fingerprinter.create_minhash_signature(text)
+        similar_docs = self.fingerprinter.find_similar_signature(signature, threshold=0.2, exclude_ids=exclude_ids)
+
         # Check internal content database first
         if check_internal and self.content_db:
-            internal_matches = self._check_internal(text)
+            internal_matches = self._check_internal(text, similar_docs, features)
             for match in internal_matches:
                 all_matches.append(match)
                 matched_ranges.append((match.start_position, match.end_position))
@@ -557,14 +729,14 @@ class PlagiarismChecker:
 
         # Semantic similarity check
         if check_semantic and self.semantic_checker.enabled:
-            semantic_matches = self._check_semantic(text)
+            semantic_matches = self._check_semantic(text, features, exclude_ids)
             for match in semantic_matches:
                 if not self._overlaps(matched_ranges, match.start_position, match.end_position):
                     all_matches.append(match)
                     matched_ranges.append((match.start_position, match.end_position))
 
         # Fingerprint similarity check
-        fingerprint_matches = self._check_fingerprints(text)
+        fingerprint_matches = self._check_fingerprints(text, [(d, sim) for d, sim in similar_docs if sim >= 0.3])
         for match in fingerprint_matches:
             if not self._overlaps(matched_ranges, match.start_position, match.end_position):
                 all_matches.append(match)
@@ -595,20 +767,22 @@ class PlagiarismChecker:
             check_method="hybrid"
         )
 
-    def _check_internal(self, text: str) -> List[PlagiarismMatch]:
-        """Check against internal content database."""
+    def _check_internal(self, text: str, similar_docs: List[Tuple[str, float]],
+                        features: Optional[TextFeatures] = None) -> List[PlagiarismMatch]:
+        """Check against internal content database, given the fingerprint-similar documents."""
         matches = []
 
-        # Use fingerprinting for quick check
-        similar_docs = self.fingerprinter.find_similar(text, threshold=0.2)
+        # Find specific matching segments, only in the fingerprint-similar documents
+        exact_matches = self.fingerprinter.get_exact_matches(
+            text,
+            doc_ids=[doc_id for doc_id, _ in similar_docs],
+            shingles=features.shingles if features else None
+        )
 
         for doc_id, similarity in similar_docs:
             if doc_id in self.content_db:
                 doc_data = self.content_db[doc_id]
 
-                # Find specific matching segments
-                exact_matches = self.fingerprinter.get_exact_matches(text)
-
                 if doc_id in exact_matches:
                     for shingle in exact_matches[doc_id][:5]:  # Limit matches
                         # Find position in text
@@ -658,11 +832,18 @@ class PlagiarismChecker:
 
         return matches
 
-    def _check_semantic(self, text: str) -> List[PlagiarismMatch]:
+    def _check_semantic(self, text: str, features: Optional[TextFeatures] = None,
+                        exclude_ids: Optional[Set[str]] = None) -> List[PlagiarismMatch]:
         """Check for semantic similarity."""
         matches = []
 
-        similar_sentences = self.semantic_checker.find_similar_sentences(text, threshold=0.85)
+        similar_sentences = self.semantic_checker.find_similar_sentences(
+            text,
+            threshold=0.85,
+            sentences=features.sentences if features else None,
+            query_embeddings=features.sentence_embeddings if features else None,
+            exclude_ids=exclude_ids
+        )
 
         for i, result in enumerate(similar_sentences[:10]):  # Limit results
             query_sent = result["query_sentence"]
@@ -686,12 +867,10 @@ class PlagiarismChecker:
 
         return matches
 
-    def _check_fingerprints(self, text: str) -> List[PlagiarismMatch]:
-        """Check using content fingerprints."""
+    def _check_fingerprints(self, text: str, similar: List[Tuple[str, float]]) -> List[PlagiarismMatch]:
+        """Check using content fingerprints, given documents at or above 0.3 similarity."""
         matches = []
 
-        similar = self.fingerprinter.find_similar(text, threshold=0.3)
-
         for doc_id, similarity in similar[:5]:
             if similarity > 0.5:  # Only report significant matches
                 matches.append(PlagiarismMatch(
@@ -747,12 +926,57 @@ class PlagiarismChecker:
 
         logger.info(f"Added document '{doc_id}' to plagiarism database")
 
+    def extract_features(self, texts: List[str]) -> List[TextFeatures]:
+        """Fingerprint and embed many texts at once (one MinHash pass, one encode call)."""
+        signatures = self.fingerprinter.create_minhash_signatures(texts)
+        sentence_lists = [self.semantic_checker._split_sentences(text) for text in texts]
+
+        embeddings = None
+        if self.semantic_checker.enabled:
+            all_sentences = [sentence for sentences in sentence_lists for sentence in sentences]
+            if all_sentences:
+                embeddings = self.semantic_checker.get_embeddings(all_sentences)
+
+        features = []
+        offset = 0
+        for text, signature, sentences in zip(texts, signatures, sentence_lists):
+            features.append(TextFeatures(
+                signature=signature,
+                shingles=self.fingerprinter._create_shingles(text),
+                sentences=sentences,
+                sentence_embeddings=embeddings[offset:offset + len(sentences)] if embeddings is not None else None
+            ))
+            offset += len(sentences)
+        return features
+
+    def add_documents_to_database(self, documents: List[Dict[str, str]], features: List[TextFeatures]):
+        """Add many {"id", "text", "title"} documents using precomputed features."""
+        for doc, doc_features in zip(documents, features):
+            self.content_db[doc["id"]] = {
+                "text": doc["text"],
+                "title": doc.get("title") or doc["id"],
+                "metadata": {},
+                "added_at": datetime.now().isoformat()
+            }
+            self.fingerprinter.add_to_database(
+                doc["id"], doc["text"], signature=doc_features.signature, shingles=doc_features.shingles
+            )
+            if self.semantic_checker.enabled and doc_features.sentence_embeddings is not None:
+                self.semantic_checker.add_document(
+                    doc["id"], doc["text"], doc_features.sentences, doc_features.sentence_embeddings
+                )
+
+        if self.tfidf_checker.enabled:
+            self.tfidf_checker.add_documents([(doc["id"], doc["text"]) for doc in documents])
+
+        logger.info(f"Added {len(documents)} documents to plagiarism database")
+
     def remove_from_database(self, doc_id: str):
         """Remove document from internal database."""
         self.content_db.pop(doc_id, None)
-        self.fingerprinter.fingerprint_db.pop(doc_id, None)
-        self.semantic_checker.document_embeddings.pop(doc_id, None)
-        self.tfidf_checker.documents.pop(doc_id, None)
+        self.fingerprinter.remove_from_database(doc_id)
+        self.semantic_checker.remove_document(doc_id)
+        self.tfidf_checker.remove_document(doc_id)
 
     def compare_texts(self, text1: str, text2: str) -> Dict[str, Any]:
         """
@@ -772,7 +996,7 @@ class PlagiarismChecker:
             emb1 = self.semantic_checker.get_embeddings([text1])
             emb2 = self.semantic_checker.get_embeddings([text2])
             if emb1 is not None and emb2 is not None:
-                semantic_sim = float(np.dot(emb1[0], emb2[0]))
+                semantic_sim = float(np.dot(normalize_rows(emb1)[0], normalize_rows(emb2)[0]))
 
         # Word overlap
         words1 = set(text1.lower().split())
@@ -834,14 +1058,23 @@ class PlagiarismChecker:
 class BatchPlagiarismChecker:
     """Check multiple documents for plagiarism efficiently."""
 
-    def __init__(self, checker: Optional[PlagiarismChecker] = None):
+    def __init__(self, checker: Optional[PlagiarismChecker] = None, block_size: int = 256):
         self.checker = checker or PlagiarismChecker()
+        self.block_size = block_size
+
+        # Similar document pairs found by the most recent cross-checked batch
+        self.similar_pairs: List[Dict[str, Any]] = []
 
     def check_batch(self, documents: List[Dict[str, str]],
                     cross_check: bool = True) -> Dict[str, PlagiarismReport]:
         """
         Check multiple documents.
 
+        Every document is fingerprinted and embedded exactly once. With
+        cross_check, documents are added to the internal database up front and
+        each one is checked with its own entry excluded by id, so the database
+        is never mutated mid-batch.
+
         Args:
             documents: List of {"id": "...", "text": "..."} dicts
             cross_check: Also check documents against each other
@@ -850,35 +1083,84 @@ class BatchPlagiarismChecker:
             Dictionary of doc_id -> PlagiarismReport
         """
         results = {}
+        features = self.checker.extract_features([doc["text"] for doc in documents])
 
-        # First, add all documents to internal database if cross-checking
         if cross_check:
-            for doc in documents:
-                self.checker.add_to_database(
-                    doc_id=doc["id"],
-                    text=doc["text"],
-                    title=doc.get("title")
-                )
+            self.checker.add_documents_to_database(documents, features)
 
-        # Check each document
-        for doc in documents:
-            # Temporarily remove from database to avoid self-match
-            if cross_check:
-                self.checker.remove_from_database(doc["id"])
-
-            report = self.checker.check(doc["text"])
-            results[doc["id"]] = report
-
-            # Re-add for next document's cross-check
-            if cross_check:
-                self.checker.add_to_database(
-                    doc_id=doc["id"],
-                    text=doc["text"],
-                    title=doc.get("title")
-                )
+        for doc, doc_features in zip(documents, features):
+            results[doc["id"]] = self.checker.check(
+                doc["text"],
+                features=doc_features,
+                exclude_ids={doc["id"]} if cross_check else None
+            )
+
+        if cross_check:
+            self.similar_pairs = self.find_similar_pairs([doc["id"] for doc in documents], features)
 
         return results
 
+    def find_similar_pairs(self, doc_ids: List[str], features: List[TextFeatures],
+                           min_similarity: float = 0.5) -> List[Dict[str, Any]]:
+        """
+        All-pairs document similarity within a batch.
+
+        MinHash pairs come from LSH candidates, TF-IDF (sparse) and mean
+        sentence-embedding (dense) similarities are computed block by block
+        against the whole batch. The diagonal is skipped by index.
+
+        Returns:
+            Pairs where any score reaches min_similarity, most similar first
+        """
+        n = len(doc_ids)
+        if n < 2:
+            return []
+        position = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        pairs: Dict[Tuple[int, int], Dict[str, float]] = {}
+
+        def record(i: int, j: int, method: str, score: float):
+            key = (min(i, j), max(i, j))
+            pairs.setdefault(key, {})[method] = round(float(score), 4)
+
+        # MinHash: LSH candidates only
+        fingerprinter = self.checker.fingerprinter
+        for i, doc_features in enumerate(features):
+            for doc_id, score in fingerprinter.find_similar_signature(doc_features.signature, min_similarity):
+                j = position.get(doc_id)
+                if j is not None and j != i:
+                    record(i, j, "minhash", score)
+
+        # TF-IDF: sparse row blocks against the batch
+        tfidf = self.checker.tfidf_checker
+        if tfidf.enabled and all(doc_id in tfidf.documents for doc_id in doc_ids):
+            vectors = tfidf.document_vectors(doc_ids)
+            self._collect_block_pairs(lambda rows: (vectors[rows] @ vectors.T).toarray(), n,
+                                      min_similarity, lambda i, j, score: record(i, j, "tfidf", score))
+
+        # Semantic: mean of normalized sentence embeddings, dense blocks
+        if all(f.sentence_embeddings is not None and len(f.sentences) for f in features):
+            doc_embeddings = normalize_rows(np.stack([
+                normalize_rows(f.sentence_embeddings).mean(axis=0) for f in features
+            ]))
+            self._collect_block_pairs(lambda rows: doc_embeddings[rows] @ doc_embeddings.T, n,
+                                      min_similarity, lambda i, j, score: record(i, j, "semantic", score))
+
+        results = [
+            {"doc_a": doc_ids[i], "doc_b": doc_ids[j], **scores, "max_similarity": max(scores.values())}
+            for (i, j), scores in pairs.items()
+        ]
+        return sorted(results, key=lambda x: x["max_similarity"], reverse=True)
+
+    def _collect_block_pairs(self, similarity_block, n: int, min_similarity: float, record):
+        """Scan an n x n similarity matrix in row blocks, keeping upper-triangle entries above threshold."""
+        for start in range(0, n, self.block_size):
+            rows = np.arange(start, min(start + self.block_size, n))
+            block = similarity_block(rows)
+            # Only j > i: excludes the diagonal (self-matches) and mirrored pairs
+            block[np.arange(n)[None, :] <= rows[:, None]] = -np.inf
+            for r, j in zip(*np.nonzero(block >= min_similarity)):
+                record(int(rows[r]), int(j), block[r, j])
+
     def generate_summary_report(self, results: Dict[str, PlagiarismReport]) -> Dict[str, Any]:
         """Generate summary report for batch check."""
         total_docs = len(results)
@@ -899,7 +1181,8 @@ class BatchPlagiarismChecker:
             "flagged_documents": len(flagged_docs),
             "average_originality": avg_originality,
             "risk_distribution": dict(risk_counts),
-            "flagged": sorted(flagged_docs, key=lambda x: x["originality"])
+            "flagged": sorted(flagged_docs, key=lambda x: x["originality"]),
+            "similar_pairs": [p for p in self.similar_pairs if p["doc_a"] in results and p["doc_b"] in results][:20]
         }
 
 
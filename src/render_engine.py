@@ -0,0 +1,317 @@
+"""
+Render Engine - Parallel product x aspect-ratio creative rendering.
+
+Each product's base image is resolved and decoded exactly once in the parent
+process; the per-ratio compositions and JPEG encodes are fanned out over a
+process pool so a multi-product, multi-ratio brief uses every core. With a
+BlobStore, finished creatives are adopted into it so identical outputs across
+regions and reruns share one file on disk.
+"""
+
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+try:
+    from .creative_composer import CreativeComposer
+    from .blob_store import BlobStore
+except ImportError:
+    from creative_composer import CreativeComposer
+    from blob_store import BlobStore
+
+logger = logging.getLogger(__name__)
+
+# Per-process composer, created once by the pool initializer
+_worker_composer: Optional[CreativeComposer] = None
+
+
+def _init_worker() -> None:
+    """Create the composer used by every task in this worker process."""
+    global _worker_composer
+    _worker_composer = CreativeComposer()
+
+
+def _render_task(
+    base_image: Optional[Tuple[str, Tuple[int, int], str]],
+    campaign_brief: Dict[str, Any],
+    product: Dict[str, Any],
+    aspect_ratio: str,
+    output_file: str,
+    jpeg_quality: int
+) -> Dict[str, Any]:
+    """Compose and encode one creative. Runs inside a worker process."""
+    if _worker_composer is None:
+        _init_worker()
+
+    start = time.perf_counter()
+    image = None
+    if base_image is not None:
+        mode, size, pixels_path = base_image
+        with open(pixels_path, 'rb') as f:
+            image = Image.frombytes(mode, size, f.read())
+    creative = _worker_composer.compose_creative_from_image(image, campaign_brief, product, aspect_ratio)
+    composed = time.perf_counter()
+
+    # Write beside the target and rename: an existing output may be a link to a shared blob
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    creative.save(tmp_file, format='JPEG', quality=jpeg_quality)
+    os.replace(tmp_file, output_file)
+    encoded = time.perf_counter()
+
+    return {
+        'output_file': output_file,
+        'product': product['name'],
+        'aspect_ratio': aspect_ratio,
+        'bytes': os.path.getsize(output_file),
+        'compose_seconds': composed - start,
+        'encode_seconds': encoded - composed
+    }
+
+
+class RenderEngine:
+    """Renders every product x aspect-ratio creative for a campaign in parallel."""
+
+    def __init__(
+        self,
+        asset_manager,
+        image_generator,
+        max_workers: Optional[int] = None,
+        jpeg_quality: int = 95,
+        blob_store: Optional[BlobStore] = None
+    ):
+        self.asset_manager = asset_manager
+        self.image_generator = image_generator
+        self.composer = CreativeComposer()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.jpeg_quality = jpeg_quality
+        self.blob_store = blob_store
+
+    def render_campaign(
+        self,
+        campaign_brief: Dict[str, Any],
+        output_path: Path,
+        force_generate: bool = False
+    ) -> Dict[str, Any]:
+        """Render all creatives for a campaign brief into output_path."""
+
+        total_start = time.perf_counter()
+        timings = {
+            'resolve_seconds': 0.0,
+            'decode_seconds': 0.0,
+            'compose_seconds': 0.0,
+            'encode_seconds': 0.0,
+            'render_wall_seconds': 0.0,
+            'publish_seconds': 0.0,
+            'total_seconds': 0.0
+        }
+
+        products = campaign_brief['products']
+        aspect_ratios = campaign_brief['output_requirements']['aspect_ratios']
+
+        rendered: List[Dict[str, Any]] = []
+        skipped: List[str] = []
+        failed: List[Dict[str, Any]] = []
+        sources: Dict[str, Dict[str, Any]] = {}
+        plan: List[Tuple[Dict[str, Any], List[Tuple[str, Path]]]] = []
+
+        for product in products:
+            product_output = output_path / product['name'].replace(' ', '_').lower()
+            product_output.mkdir(parents=True, exist_ok=True)
+
+            pending = []
+            for aspect_ratio in aspect_ratios:
+                output_file = product_output / f"{aspect_ratio.replace(':', 'x')}.jpg"
+                if output_file.exists() and not force_generate:
+                    skipped.append(str(output_file))
+                else:
+                    pending.append((aspect_ratio, output_file))
+
+            if pending:
+                plan.append((product, pending))
+
+        job_count = sum(len(pending) for _, pending in plan)
+        render_start = time.perf_counter()
+        if job_count:
+            # Decoded pixels are spilled once per product and shared by its ratio jobs
+            with tempfile.TemporaryDirectory(prefix='.render-', dir=output_path) as scratch_dir:
+                jobs = self._iter_jobs(plan, campaign_brief, Path(scratch_dir), timings, sources, failed)
+                for job, result in self._run_jobs(jobs, job_count):
+                    if 'error' in result:
+                        failed.append(result)
+                        continue
+                    rendered.append(result)
+                    timings['compose_seconds'] += result['compose_seconds']
+                    timings['encode_seconds'] += result['encode_seconds']
+        timings['render_wall_seconds'] = time.perf_counter() - render_start
+
+        if self.blob_store is not None and rendered:
+            # Deduplicate finished creatives by content hash
+            stage_start = time.perf_counter()
+            for result in rendered:
+                try:
+                    result['digest'] = self.blob_store.adopt(result['output_file'])
+                except OSError as e:
+                    logger.warning(f"Could not publish {result['output_file']} to the blob store: {e}")
+            timings['publish_seconds'] = time.perf_counter() - stage_start
+        timings['total_seconds'] = time.perf_counter() - total_start
+
+        logger.info(
+            f"Rendered {len(rendered)} creatives ({len(skipped)} skipped, {len(failed)} failed) "
+            f"in {timings['total_seconds']:.2f}s"
+        )
+
+        return {
+            'rendered': rendered,
+            'skipped': skipped,
+            'failed': failed,
+            'sources': sources,
+            'workers': min(self.max_workers, job_count) if job_count else 0,
+            'timings': timings
+        }
+
+    def _iter_jobs(
+        self,
+        plan: List[Tuple[Dict[str, Any], List[Tuple[str, Path]]]],
+        campaign_brief: Dict[str, Any],
+        scratch_dir: Path,
+        timings: Dict[str, float],
+        sources: Dict[str, Dict[str, Any]],
+        failed: List[Dict[str, Any]]
+    ) -> Iterator[Tuple]:
+        """Resolve and decode each product's base image in turn and yield its render jobs.
+
+        A product whose base image cannot be resolved or spilled is recorded in
+        failed and the remaining products still render.
+        """
+
+        for index, (product, pending) in enumerate(plan):
+            product_name = product['name']
+            try:
+                payload = self._prepare_product(index, product, campaign_brief, scratch_dir, timings, sources)
+            except Exception as e:
+                logger.error(f"Failed to prepare base image for {product_name}: {e}")
+                for aspect_ratio, output_file in pending:
+                    job = (None, campaign_brief, product, aspect_ratio, str(output_file), self.jpeg_quality)
+                    failed.append(self._error_result(job, e))
+                continue
+
+            for aspect_ratio, output_file in pending:
+                yield (payload, campaign_brief, product, aspect_ratio, str(output_file), self.jpeg_quality)
+
+    def _prepare_product(
+        self,
+        index: int,
+        product: Dict[str, Any],
+        campaign_brief: Dict[str, Any],
+        scratch_dir: Path,
+        timings: Dict[str, float],
+        sources: Dict[str, Dict[str, Any]]
+    ) -> Optional[Tuple[str, Tuple[int, int], str]]:
+        """Resolve, decode and spill one product's base image, returning the shared job payload."""
+        product_name = product['name']
+
+        # Resolve the base image once per product
+        stage_start = time.perf_counter()
+        existing_asset = self.asset_manager.find_product_asset(product_name)
+        if existing_asset:
+            base_image_path = existing_asset
+            source = 'existing'
+        else:
+            base_image_path = self.image_generator.generate_product_image(product, campaign_brief)
+            source = 'generated'
+        timings['resolve_seconds'] += time.perf_counter() - stage_start
+        sources[product_name] = {'path': str(base_image_path), 'source': source}
+
+        # Decode once; workers read the raw pixels instead of re-decoding the file,
+        # and the bitmap is written once rather than pickled into every ratio job
+        stage_start = time.perf_counter()
+        try:
+            image = self.composer.load_base_image(base_image_path)
+            if image is None:
+                return None
+            pixels_path = scratch_dir / f"{index}.rgb"
+            pixels_path.write_bytes(image.tobytes())
+            return (image.mode, image.size, str(pixels_path))
+        finally:
+            timings['decode_seconds'] += time.perf_counter() - stage_start
+
+    def _run_jobs(self, jobs: Iterable[Tuple], job_count: int) -> List[Tuple[Tuple, Dict[str, Any]]]:
+        """Run render jobs on a process pool, falling back to inline rendering.
+
+        Jobs are submitted as they are produced, so later products are decoded
+        while earlier ones render.
+        """
+
+        if self.max_workers <= 1 or job_count == 1:
+            return [(job, self._run_inline(job)) for job in jobs]
+
+        results = []
+        inline = []
+        pool_error: Optional[BaseException] = None
+
+        try:
+            executor = ProcessPoolExecutor(
+                max_workers=min(self.max_workers, job_count),
+                initializer=_init_worker
+            )
+        except OSError as e:
+            executor = None
+            pool_error = e
+
+        if executor is None:
+            inline.extend(jobs)
+        else:
+            with executor:
+                futures = {}
+                # Only pool startup and submission failures fall back to inline rendering;
+                # the job generator records its own per-product failures
+                for job in jobs:
+                    if pool_error is None:
+                        try:
+                            futures[executor.submit(_render_task, *job)] = job
+                            continue
+                        except (BrokenProcessPool, OSError) as e:
+                            pool_error = e
+                    inline.append(job)
+
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        results.append((job, future.result()))
+                    except BrokenProcessPool as e:
+                        pool_error = pool_error or e
+                        inline.append(job)
+                    except Exception as e:
+                        logger.error(f"Failed to render {job[2]['name']} {job[3]}: {e}")
+                        results.append((job, self._error_result(job, e)))
+
+        if inline:
+            logger.warning(f"Process pool unavailable ({pool_error}), rendering {len(inline)} jobs inline")
+            results.extend((job, self._run_inline(job)) for job in inline)
+
+        return results
+
+    def _run_inline(self, job: Tuple) -> Dict[str, Any]:
+        """Render a single job in the current process."""
+        try:
+            return _render_task(*job)
+        except Exception as e:
+            logger.error(f"Failed to render {job[2]['name']} {job[3]}: {e}")
+            return self._error_result(job, e)
+
+    @staticmethod
+    def _error_result(job: Tuple, error: Exception) -> Dict[str, Any]:
+        """Build the result record for a failed render job."""
+        return {
+            'output_file': job[4],
+            'product': job[2]['name'],
+            'aspect_ratio': job[3],
+            'error': str(error)
+        }
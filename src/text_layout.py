@@ -0,0 +1,218 @@
+"""
+Text Layout Engine - Cached font resolution, glyph metrics and text layouts for overlays.
+
+CreativeComposer used to re-measure every candidate line with draw.textbbox and
+probe the filesystem for fonts on every cache miss. This engine resolves each
+font weight once, caches glyph advance widths per (font, size), breaks lines
+from those advances and memoizes complete layouts keyed by (text, weight, ratio,
+box), so variants sharing a campaign message reuse the same layout.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from PIL import ImageFont
+
+logger = logging.getLogger(__name__)
+
+FONT_PATHS = [
+    "/System/Library/Fonts/Arial.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"
+]
+
+BOLD_FONT_PATHS = [
+    "/System/Library/Fonts/Arial Bold.ttf",
+    "/System/Library/Fonts/Helvetica-Bold.ttc"
+]
+
+LINE_SPACING = 1.2
+
+
+@dataclass(frozen=True)
+class TextLayout:
+    """A laid-out block of text, positioned relative to its box origin."""
+    font_size: int
+    weight: str
+    lines: Tuple[Tuple[str, int, float], ...]  # (text, x offset, y offset)
+    outline_width: int
+
+
+class TextLayoutEngine:
+    """Resolves fonts, caches glyph advances and memoizes text layouts."""
+
+    def __init__(self, max_layouts: int = 2048):
+        self.max_layouts = max_layouts
+        self._font_paths: Dict[str, Optional[str]] = {}
+        self._fonts: Dict[Tuple[str, int], Any] = {}
+        self._advances: Dict[Tuple[str, int], Dict[str, float]] = {}
+        self._layouts: "OrderedDict[Tuple, TextLayout]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {
+            'layout_hits': 0,
+            'layout_misses': 0,
+            'glyphs_measured': 0
+        }
+
+    def _resolve_font_path(self, weight: str) -> Optional[str]:
+        """Probe the candidate font files once per weight."""
+        if weight in self._font_paths:
+            return self._font_paths[weight]
+
+        candidates = (BOLD_FONT_PATHS if weight == 'bold' else []) + FONT_PATHS
+        resolved = None
+        for font_path in candidates:
+            try:
+                ImageFont.truetype(font_path, 10)
+                resolved = font_path
+                break
+            except (OSError, IOError):
+                continue
+
+        if resolved is None:
+            logger.debug(f"No TrueType font found for weight '{weight}', using default font")
+        self._font_paths[weight] = resolved
+        return resolved
+
+    def get_font(self, size: int, weight: str = 'normal'):
+        """Get a font object for a size and weight."""
+        size = max(1, size)
+        with self._lock:
+            font_path = self._resolve_font_path(weight)
+            cache_key = (font_path or 'default', size)
+
+            font = self._fonts.get(cache_key)
+            if font is None:
+                if font_path is not None:
+                    font = ImageFont.truetype(font_path, size)
+                else:
+                    font = ImageFont.load_default()
+                self._fonts[cache_key] = font
+            return font
+
+    def measure(self, text: str, size: int, weight: str = 'normal') -> float:
+        """Width of a single-line string from cached glyph advance widths."""
+        size = max(1, size)
+        with self._lock:
+            font = self.get_font(size, weight)
+            cache_key = (self._font_paths[weight] or 'default', size)
+            advances = self._advances.setdefault(cache_key, {})
+
+            width = 0.0
+            for char in text:
+                advance = advances.get(char)
+                if advance is None:
+                    advance = font.getlength(char)
+                    advances[char] = advance
+                    self.stats['glyphs_measured'] += 1
+                width += advance
+            return width
+
+    def wrap(self, text: str, size: int, max_width: int, weight: str = 'normal') -> List[str]:
+        """Greedy word wrap using cached advances."""
+        space_width = self.measure(' ', size, weight)
+        lines = []
+        current_line: List[str] = []
+        current_width = 0.0
+
+        for word in text.split():
+            word_width = self.measure(word, size, weight)
+            test_width = current_width + space_width + word_width if current_line else word_width
+
+            if test_width <= max_width:
+                current_line.append(word)
+                current_width = test_width
+            else:
+                # Start new line
+                if current_line:
+                    lines.append(' '.join(current_line))
+                current_line = [word]
+                current_width = word_width
+
+        # Add final line
+        if current_line:
+            lines.append(' '.join(current_line))
+
+        return lines
+
+    def layout(
+        self,
+        text: str,
+        box_width: int,
+        box_height: int,
+        font_size_ratio: float = 0.05,
+        weight: str = 'normal'
+    ) -> TextLayout:
+        """Lay out text in a box, shrinking the font analytically if it overflows."""
+        cache_key = (text, weight, font_size_ratio, box_width, box_height)
+
+        with self._lock:
+            cached = self._layouts.get(cache_key)
+            if cached is not None:
+                self._layouts.move_to_end(cache_key)
+                self.stats['layout_hits'] += 1
+                return cached
+            self.stats['layout_misses'] += 1
+
+            # Calculate initial font size
+            font_size = int(min(box_width, box_height) * font_size_ratio)
+            lines = self.wrap(text, font_size, box_width, weight)
+            line_height = font_size * LINE_SPACING
+            total_height = len(lines) * line_height
+
+            # Height scales linearly with font size, so one correction is enough
+            if total_height > box_height:
+                scale_factor = box_height / total_height * 0.9
+                font_size = int(font_size * scale_factor)
+                line_height = font_size * LINE_SPACING
+                lines = self.wrap(text, font_size, box_width, weight)
+
+            # Center the block vertically and each line horizontally
+            font = self.get_font(font_size, weight)
+            start_y = (box_height - len(lines) * line_height) // 2
+            positioned = []
+            for i, line in enumerate(lines):
+                bbox = font.getbbox(line)
+                x_offset = (box_width - (bbox[2] - bbox[0])) // 2
+                positioned.append((line, x_offset, start_y + i * line_height))
+
+            result = TextLayout(
+                font_size=font_size,
+                weight=weight,
+                lines=tuple(positioned),
+                outline_width=max(1, font_size // 20)
+            )
+
+            self._layouts[cache_key] = result
+            if len(self._layouts) > self.max_layouts:
+                self._layouts.popitem(last=False)
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get layout cache and glyph metric statistics."""
+        with self._lock:
+            lookups = self.stats['layout_hits'] + self.stats['layout_misses']
+            return {
+                **self.stats,
+                'layout_hit_rate_percent': (self.stats['layout_hits'] / lookups * 100) if lookups else 0.0,
+                'cached_layouts': len(self._layouts),
+                'cached_fonts': len(self._fonts),
+                'cached_metric_tables': len(self._advances)
+            }
+
+
+_layout_engine: Optional[TextLayoutEngine] = None
+_layout_engine_lock = threading.Lock()
+
+
+def get_layout_engine() -> TextLayoutEngine:
+    """Process-wide layout engine shared by every CreativeComposer."""
+    global _layout_engine
+    with _layout_engine_lock:
+        if _layout_engine is None:
+            _layout_engine = TextLayoutEngine()
+        return _layout_engine
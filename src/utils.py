@@ -148,31 +148,20 @@ def sanitize_filename(filename: str) -> str:
 
 
 def load_cost_tracking() -> Dict[str, float]:
-    """Load API cost tracking data."""
-    cost_file = Path('costs.json')
-    
-    if cost_file.exists():
-        import json
-        with open(cost_file, 'r') as f:
-            return json.load(f)
+    """Load aggregated API cost tracking data from the cost ledger."""
+    try:
+        from .cost_ledger import get_cost_ledger
+    except ImportError:
+        from cost_ledger import get_cost_ledger
     
-    return {'total_cost': 0.0, 'api_calls': 0}
+    return get_cost_ledger().get_totals()
 
 
 def update_cost_tracking(service: str, cost: float, tokens: int = 0) -> None:
-    """Update API cost tracking data."""
-    import json
-    
-    costs = load_cost_tracking()
-    costs['total_cost'] += cost
-    costs['api_calls'] += 1
-    
-    if service not in costs:
-        costs[service] = {'cost': 0.0, 'calls': 0, 'tokens': 0}
-    
-    costs[service]['cost'] += cost
-    costs[service]['calls'] += 1
-    costs[service]['tokens'] += tokens
+    """Record an API call in the cost ledger (buffered and flushed in batches)."""
+    try:
+        from .cost_ledger import get_cost_ledger
+    except ImportError:
+        from cost_ledger import get_cost_ledger
     
-    with open('costs.json', 'w') as f:
-        json.dump(costs, f, indent=2)
\ No newline at end of file
+    get_cost_ledger().record(service, cost, tokens)
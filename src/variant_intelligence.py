@@ -15,10 +15,14 @@ import numpy as np
 from PIL import Image
 import cv2
 import logging
-import hashlib
 from collections import defaultdict
 import openai
 
+try:
+    from .image_analysis import ImageAnalysisContext, get_analysis_context
+except ImportError:
+    from image_analysis import ImageAnalysisContext, get_analysis_context
+
 @dataclass
 class VariantMetrics:
     """Comprehensive variant metrics with AI analysis"""
@@ -187,15 +191,19 @@ class VariantIntelligenceEngine:
         self.logger.info(f"🔍 Discovered {len(variant_files)} variant files for {campaign_id}")
         return variant_files
     
-    async def _analyze_single_variant(self, variant_file: Path, campaign_id: str) -> Optional[VariantAnalysis]:
+    async def _analyze_single_variant(self, variant_file: Path, campaign_id: str,
+                                      context: Optional[ImageAnalysisContext] = None) -> Optional[VariantAnalysis]:
         """Comprehensive analysis of a single variant"""
         
         try:
             start_time = time.time()
             
+            # One read and one decode shared by every analysis below
+            context = context or get_analysis_context(variant_file)
+            
             # Basic file analysis
             file_stats = variant_file.stat()
-            file_hash = self._calculate_file_hash(variant_file)
+            file_hash = self._calculate_file_hash(variant_file, context)
             
             # Check cache first
             if file_hash in self.analysis_cache:
@@ -214,21 +222,21 @@ class VariantIntelligenceEngine:
             
             # Load and analyze image
             try:
-                image = Image.open(variant_file)
+                image = context.pil
                 analysis.resolution = image.size
                 analysis.aspect_ratio = self._calculate_aspect_ratio(image.size)
                 
                 # Quality analysis
-                analysis.technical_quality = await self.quality_analyzer.analyze_technical_quality(image)
+                analysis.technical_quality = await self.quality_analyzer.analyze_technical_quality(image, context)
                 analysis.aesthetic_quality = await self.quality_analyzer.analyze_aesthetic_quality(image)
                 
                 # Visual analysis
-                analysis.dominant_colors = await self._extract_dominant_colors(image)
+                analysis.dominant_colors = await self._extract_dominant_colors(image, context)
                 analysis.composition_type = await self._analyze_composition(image)
                 analysis.object_detection = await self._detect_objects(image)
                 
                 # Brand compliance analysis
-                brand_results = await self.brand_analyzer.analyze_compliance(image, campaign_id)
+                brand_results = await self.brand_analyzer.analyze_compliance(image, campaign_id, context)
                 analysis.brand_alignment = brand_results["alignment_score"]
                 analysis.brand_colors_present = brand_results["colors_compliant"]
                 analysis.logo_detected = brand_results["logo_detected"]
@@ -245,8 +253,6 @@ class VariantIntelligenceEngine:
                 # Issue detection
                 analysis.detected_issues = await self._detect_issues(analysis)
                 
-                image.close()
-                
             except Exception as e:
                 self.logger.error(f"❌ Error analyzing image {variant_file}: {e}")
                 analysis.detected_issues.append(f"Image analysis failed: {str(e)}")
@@ -330,14 +336,11 @@ class VariantIntelligenceEngine:
         
         return metrics
     
-    def _calculate_file_hash(self, file_path: Path) -> str:
+    def _calculate_file_hash(self, file_path: Path, context: Optional[ImageAnalysisContext] = None) -> str:
         """Calculate hash for duplicate detection"""
-        hasher = hashlib.md5()
+        context = context or get_analysis_context(file_path)
         try:
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
+            return context.file_hash('md5')
         except (OSError, IOError):
             return f"error_{file_path.name}_{time.time()}"
     
@@ -359,15 +362,19 @@ class VariantIntelligenceEngine:
         else:
             return f"{width}:{height}"
     
-    async def _extract_dominant_colors(self, image: Image) -> List[str]:
+    async def _extract_dominant_colors(self, image: Image, context: Optional[ImageAnalysisContext] = None) -> List[str]:
         """Extract dominant colors from image"""
         try:
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Resize for faster processing
-            image_small = image.resize((150, 150))
+            if context is not None:
+                # Shared downsample of the already-decoded RGB image
+                image_small = context.thumbnail((150, 150))
+            else:
+                # Convert to RGB if needed
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                
+                # Resize for faster processing
+                image_small = image.resize((150, 150))
             
             # Convert to numpy array
             img_array = np.array(image_small)
@@ -558,14 +565,17 @@ Return only valid JSON, no other text."""},
 class QualityAnalyzer:
     """Advanced quality analysis for variants"""
     
-    async def analyze_technical_quality(self, image: Image) -> float:
+    async def analyze_technical_quality(self, image: Image, context: Optional[ImageAnalysisContext] = None) -> float:
         """Analyze technical quality of image"""
         try:
-            # Convert to OpenCV format for analysis
-            img_array = np.array(image)
+            if context is not None:
+                gray = context.gray
+            else:
+                # Convert to OpenCV format for analysis
+                img_array = np.array(image)
+                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY) if len(img_array.shape) == 3 else img_array
             
             # Calculate sharpness using Laplacian variance
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY) if len(img_array.shape) == 3 else img_array
             sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
             
             # Normalize sharpness score
@@ -682,7 +692,8 @@ class DiversityAnalyzer:
 class BrandComplianceAnalyzer:
     """Brand compliance analysis and guideline validation"""
     
-    async def analyze_compliance(self, image: Image, campaign_id: str) -> Dict[str, Any]:
+    async def analyze_compliance(self, image: Image, campaign_id: str,
+                                 context: Optional[ImageAnalysisContext] = None) -> Dict[str, Any]:
         """Analyze brand compliance for an image"""
         
         # This would integrate with brand guideline databases
@@ -701,7 +712,7 @@ class BrandComplianceAnalyzer:
         brand_guidelines = await self._load_brand_guidelines(campaign_id)
         
         # Analyze brand colors
-        results["colors_compliant"] = await self._check_brand_colors(image, brand_guidelines)
+        results["colors_compliant"] = await self._check_brand_colors(image, brand_guidelines, context)
         
         # Check for logo presence
         results["logo_detected"] = await self._detect_logo(image, brand_guidelines)
@@ -744,7 +755,8 @@ class BrandComplianceAnalyzer:
             "color_tolerance": 30  # RGB tolerance for color matching
         }
 
-    async def _check_brand_colors(self, image: Image, guidelines: Dict[str, Any]) -> bool:
+    async def _check_brand_colors(self, image: Image, guidelines: Dict[str, Any],
+                                  context: Optional[ImageAnalysisContext] = None) -> bool:
         """Check if brand colors are present in the image"""
         try:
             # Get brand colors from guidelines
@@ -766,7 +778,10 @@ class BrandComplianceAnalyzer:
                 return True
 
             # Sample image colors
-            img_rgb = image.convert('RGB').resize((50, 50))
+            if context is not None:
+                img_rgb = context.thumbnail((50, 50))
+            else:
+                img_rgb = image.convert('RGB').resize((50, 50))
             pixels = list(img_rgb.getdata())
 
             # Check if any brand colors are present (with tolerance)
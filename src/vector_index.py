@@ -0,0 +1,430 @@
+"""
+Vector Index - Matrix-backed cosine-similarity index with filtering and IVF search.
+
+Embeddings live in one contiguous float32 matrix of L2-normalized rows, so a
+query is a single mat-vec followed by an argpartition top-k. Deletes tombstone a
+row and the matrix is compacted once enough rows are dead. Each row carries an
+optional label (the knowledge base uses the document type) and per-label row
+masks let filtered queries rank only the rows they can return.
+
+For very large indexes an inverted-file (IVF) mode clusters rows around
+spherical k-means centroids and scans only the closest lists per query.
+"""
+
+import logging
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows as float32; all-zero rows stay zero."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """Append-only float32 embedding matrix with tombstones, label masks and optional IVF."""
+
+    def __init__(
+        self,
+        initial_capacity: int = 1024,
+        compact_ratio: float = 0.25,
+        ivf_threshold: Optional[int] = None,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8
+    ):
+        self.initial_capacity = initial_capacity
+        self.compact_ratio = compact_ratio
+        self.ivf_threshold = ivf_threshold
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        """Drop every row and any trained IVF structure."""
+        self.dim: Optional[int] = None
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._deleted = 0
+        self.ids: List[Optional[str]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self._label_masks: Dict[str, np.ndarray] = {}
+        self._row_labels: List[Optional[str]] = []
+
+        self._centroids: Optional[np.ndarray] = None
+        self._ivf_lists: List[List[int]] = []
+        self._ivf_trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self.id_to_row)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.id_to_row
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """View of the used rows (tombstoned rows included)."""
+        return self._matrix[:self._size]
+
+    def _ensure_capacity(self, extra: int) -> None:
+        """Grow the matrix and masks geometrically to fit extra rows."""
+        needed = self._size + extra
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+
+        new_capacity = max(self.initial_capacity, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+        self._alive = self._grow_mask(self._alive, new_capacity)
+        for label, mask in self._label_masks.items():
+            self._label_masks[label] = self._grow_mask(mask, new_capacity)
+
+    def _grow_mask(self, mask: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.zeros(capacity, dtype=bool)
+        grown[:self._size] = mask[:self._size]
+        return grown
+
+    def add(self, item_id: str, embedding: np.ndarray, label: Optional[str] = None) -> None:
+        """Add (or replace) a single vector."""
+        self.add_batch([item_id], np.asarray(embedding)[None, :], [label])
+
+    def add_batch(
+        self,
+        item_ids: Sequence[str],
+        embeddings: np.ndarray,
+        labels: Optional[Sequence[Optional[str]]] = None
+    ) -> None:
+        """Append many vectors at once; existing ids are tombstoned and re-added."""
+        if len(item_ids) == 0:
+            return
+        rows = normalize_rows(embeddings)
+        if len(rows) != len(item_ids):
+            raise ValueError("item_ids and embeddings must have the same length")
+        labels = list(labels) if labels is not None else [None] * len(item_ids)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = rows.shape[1]
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            elif rows.shape[1] != self.dim:
+                raise ValueError(f"Expected embeddings of dimension {self.dim}, got {rows.shape[1]}")
+
+            self._ensure_capacity(len(rows))
+            start = self._size
+            end = start + len(rows)
+            self._matrix[start:end] = rows
+            self._alive[start:end] = True
+
+            for offset, (item_id, label) in enumerate(zip(item_ids, labels)):
+                row = start + offset
+                if item_id in self.id_to_row:
+                    self._tombstone(item_id)
+                self.ids.append(item_id)
+                self._row_labels.append(label)
+                self.id_to_row[item_id] = row
+                if label is not None:
+                    mask = self._label_masks.get(label)
+                    if mask is None:
+                        mask = self._label_masks[label] = np.zeros(len(self._alive), dtype=bool)
+                    mask[row] = True
+            self._size = end
+
+            if self._centroids is not None:
+                self._assign_to_lists(np.arange(start, end))
+
+    def load_rows(
+        self,
+        item_ids: Sequence[str],
+        matrix: np.ndarray,
+        labels: Optional[Sequence[Optional[str]]] = None
+    ) -> None:
+        """Replace the index with already-normalized rows without copying them.
+
+        Accepts a read-only memory map; the first later append copies it into
+        a writable, growable matrix.
+        """
+        if len(item_ids) != len(matrix):
+            raise ValueError("item_ids and matrix must have the same length")
+        with self._lock:
+            self._reset()
+            if len(item_ids) == 0:
+                return
+            self.dim = matrix.shape[1]
+            self._matrix = matrix
+            self._size = len(item_ids)
+            self._alive = np.ones(self._size, dtype=bool)
+            self.ids = list(item_ids)
+            self.id_to_row = {item_id: row for row, item_id in enumerate(self.ids)}
+            self._row_labels = list(labels) if labels is not None else [None] * self._size
+
+            label_array = np.asarray(self._row_labels, dtype=object)
+            for label in set(self._row_labels):
+                if label is not None:
+                    self._label_masks[label] = label_array == label
+
+            if len(self.id_to_row) != self._size:
+                # Later duplicates win, as with add_batch
+                for row, item_id in enumerate(self.ids):
+                    if self.id_to_row[item_id] != row:
+                        self._alive[row] = False
+                        self.ids[row] = None
+                        if self._row_labels[row] is not None:
+                            self._label_masks[self._row_labels[row]][row] = False
+                        self._deleted += 1
+
+    def remove(self, item_id: str) -> bool:
+        """Tombstone a vector; compacts once enough rows are dead."""
+        with self._lock:
+            if not self._tombstone(item_id):
+                return False
+            if self._size and self._deleted / self._size > self.compact_ratio:
+                self.compact()
+            return True
+
+    def _tombstone(self, item_id: str) -> bool:
+        row = self.id_to_row.pop(item_id, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        self.ids[row] = None
+        label = self._row_labels[row]
+        if label is not None:
+            self._label_masks[label][row] = False
+        self._deleted += 1
+        return True
+
+    def compact(self) -> None:
+        """Rewrite the matrix without tombstoned rows."""
+        with self._lock:
+            if not self._deleted:
+                return
+            keep = np.flatnonzero(self._alive[:self._size])
+            matrix = self._matrix[keep]
+            ids = [self.ids[row] for row in keep]
+            labels = [self._row_labels[row] for row in keep]
+            centroids = self._centroids
+
+            self._reset()
+            if len(keep):
+                self.add_batch(ids, matrix, labels)
+            if centroids is not None and len(keep):
+                # Keep the trained centroids; only list membership changes
+                self._centroids = centroids
+                self._ivf_trained_size = len(keep)
+                self._ivf_lists = [[] for _ in range(len(centroids))]
+                self._assign_to_lists(np.arange(self._size))
+            logger.debug(f"Compacted vector index to {self._size} rows")
+
+    def clear(self) -> None:
+        """Remove every vector."""
+        with self._lock:
+            self._reset()
+
+    def _candidate_mask(self, labels: Optional[Iterable[str]]) -> np.ndarray:
+        """Live rows, optionally restricted to the given labels."""
+        alive = self._alive[:self._size]
+        if labels is None:
+            return alive
+        mask = np.zeros(self._size, dtype=bool)
+        for label in labels:
+            label_mask = self._label_masks.get(label)
+            if label_mask is not None:
+                mask |= label_mask[:self._size]
+        return mask & alive
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 5,
+        labels: Optional[Iterable[str]] = None,
+        approximate: Optional[bool] = None
+    ) -> List[Tuple[str, float]]:
+        """Top-k (id, cosine similarity) pairs, best first."""
+        with self._lock:
+            if not self.id_to_row or top_k <= 0:
+                return []
+
+            q = normalize_rows(query)[0]
+            mask = self._candidate_mask(labels)
+
+            if approximate is None:
+                approximate = bool(self.ivf_threshold) and len(self.id_to_row) >= self.ivf_threshold
+            if approximate:
+                self._maybe_train_ivf()
+
+            if approximate and self._centroids is not None:
+                rows = self._probe_rows(q)
+                rows = rows[mask[rows]]
+            elif labels is not None:
+                rows = np.flatnonzero(mask)
+            else:
+                rows = None
+
+            if rows is None:
+                scores = self._matrix[:self._size] @ q
+                scores[~mask] = -np.inf
+                candidates = int(mask.sum())
+            else:
+                scores = self._matrix[rows] @ q
+                candidates = len(rows)
+
+            k = min(top_k, candidates)
+            if k == 0:
+                return []
+
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            row_ids = top if rows is None else rows[top]
+            return [(self.ids[row], float(scores[i])) for row, i in zip(row_ids, top)]
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        top_k: int = 1,
+        exclude_ids: Optional[Iterable[str]] = None,
+        approximate: Optional[bool] = None,
+        block_size: int = 65536
+    ) -> List[List[Tuple[str, float]]]:
+        """Top-k (id, cosine similarity) pairs for every query row, best first.
+
+        Exact search multiplies all queries against the matrix one row block at
+        a time, keeping a running top-k per query, so memory stays bounded at
+        len(queries) x block_size scores.
+        """
+        with self._lock:
+            q = normalize_rows(queries) if len(queries) else np.zeros((0, self.dim or 0), dtype=np.float32)
+            results: List[List[Tuple[str, float]]] = [[] for _ in range(len(q))]
+            if not self.id_to_row or top_k <= 0 or len(q) == 0:
+                return results
+
+            mask = self._alive[:self._size].copy()
+            if exclude_ids is not None:
+                excluded = [self.id_to_row[item_id] for item_id in exclude_ids if item_id in self.id_to_row]
+                mask[excluded] = False
+
+            if approximate is None:
+                approximate = bool(self.ivf_threshold) and len(self.id_to_row) >= self.ivf_threshold
+            if approximate:
+                self._maybe_train_ivf()
+            if approximate and self._centroids is not None:
+                for i, query in enumerate(q):
+                    rows = self._probe_rows(query)
+                    rows = rows[mask[rows]]
+                    if len(rows) == 0:
+                        continue
+                    scores = self._matrix[rows] @ query
+                    k = min(top_k, len(rows))
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    top = top[np.argsort(-scores[top], kind='stable')]
+                    results[i] = [(self.ids[rows[t]], float(scores[t])) for t in top]
+                return results
+
+            k = min(top_k, int(mask.sum()))
+            if k == 0:
+                return results
+            best_scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+            best_rows = np.full((len(q), k), -1, dtype=np.int64)
+
+            for start in range(0, self._size, block_size):
+                end = min(start + block_size, self._size)
+                scores = q @ self._matrix[start:end].T
+                scores[:, ~mask[start:end]] = -np.inf
+
+                block_k = min(k, end - start)
+                top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+                merged_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+                merged_rows = np.concatenate([best_rows, top + start], axis=1)
+                keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+                best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+
+            order = np.argsort(-best_scores, axis=1, kind='stable')
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            best_rows = np.take_along_axis(best_rows, order, axis=1)
+            for i in range(len(q)):
+                results[i] = [
+                    (self.ids[row], float(score))
+                    for row, score in zip(best_rows[i], best_scores[i])
+                    if row >= 0 and score > -np.inf
+                ]
+            return results
+
+    def _probe_rows(self, q: np.ndarray) -> np.ndarray:
+        """Rows in the n_probe IVF lists whose centroids are closest to the query."""
+        centroid_scores = self._centroids @ q
+        n_probe = min(self.n_probe, len(self._centroids))
+        probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        lists = [self._ivf_lists[i] for i in probe if self._ivf_lists[i]]
+        if not lists:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.asarray(rows, dtype=np.int64) for rows in lists])
+
+    def _maybe_train_ivf(self) -> None:
+        """Train on first use and retrain once the index has grown 4x since training."""
+        if self._centroids is None or len(self.id_to_row) >= 4 * self._ivf_trained_size:
+            self.train_ivf()
+
+    def train_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, sample_size: int = 65536) -> None:
+        """Fit spherical k-means centroids on live rows and rebuild the inverted lists."""
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self._size])
+            if len(live) == 0:
+                return
+            n_lists = n_lists or self.n_lists or max(1, int(np.sqrt(len(live))))
+            n_lists = min(n_lists, len(live))
+
+            rng = np.random.default_rng(42)
+            sample = live if len(live) <= sample_size else rng.choice(live, sample_size, replace=False)
+            data = self._matrix[sample]
+            centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+
+            for _ in range(iterations):
+                assignment = np.argmax(data @ centroids.T, axis=1)
+                for i in range(n_lists):
+                    members = data[assignment == i]
+                    if len(members):
+                        centroids[i] = members.sum(axis=0)
+                centroids = normalize_rows(centroids)
+
+            self._centroids = centroids
+            self._ivf_trained_size = len(live)
+            self._ivf_lists = [[] for _ in range(n_lists)]
+            self._assign_to_lists(live)
+            logger.info(f"Trained IVF vector index: {n_lists} lists over {len(live)} rows")
+
+    def _assign_to_lists(self, rows: np.ndarray, batch_size: int = 8192) -> None:
+        """Append rows to the inverted list of their nearest centroid."""
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            nearest = np.argmax(self._matrix[batch] @ self._centroids.T, axis=1)
+            for row, list_id in zip(batch.tolist(), nearest.tolist()):
+                self._ivf_lists[list_id].append(row)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size and layout statistics."""
+        with self._lock:
+            return {
+                'vectors': len(self.id_to_row),
+                'rows': self._size,
+                'tombstones': self._deleted,
+                'capacity': len(self._alive),
+                'dimension': self.dim,
+                'labels': {label: int(mask[:self._size].sum()) for label, mask in self._label_masks.items()},
+                'ivf_lists': len(self._centroids) if self._centroids is not None else 0
+            }
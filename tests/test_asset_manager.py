@@ -0,0 +1,88 @@
+"""
+Test suite for AssetManager's persisted cache and keyword index
+"""
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+import sys
+sys.path.append('src')
+from asset_manager import AssetManager
+from asset_store import AssetStore
+
+
+class TestAssetManager:
+    """Test suite for AssetManager"""
+
+    @pytest.fixture
+    def root(self, monkeypatch):
+        """Temporary working directory holding asset trees and the cache"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # A legacy cache.json is looked up in the working directory
+            monkeypatch.chdir(temp_dir)
+            yield Path(temp_dir)
+
+    def make_manager(self, root: Path, name: str) -> AssetManager:
+        return AssetManager(str(root / name), cache_dir=str(root / "cache"))
+
+    def test_managers_for_different_directories_keep_separate_caches(self, root):
+        """Test that opening another assets directory does not clear this one's cache"""
+        (root / "assets").mkdir()
+        (root / "assets" / "water_bottle.jpg").write_bytes(b"jpeg")
+
+        manager = self.make_manager(root, "assets")
+        manager.scan_assets(force_rescan=True)
+        manager.close()
+
+        self.make_manager(root, "other").close()
+
+        reopened = self.make_manager(root, "assets")
+        assert list(reopened.asset_cache['assets']) == ["water_bottle.jpg"]
+        reopened.close()
+
+    def test_keyword_index_is_loaded_from_the_store(self, root):
+        """Test that a current snapshot is reused and a stale one is rebuilt"""
+        (root / "assets").mkdir()
+        (root / "assets" / "water_bottle.jpg").write_bytes(b"jpeg")
+
+        manager = self.make_manager(root, "assets")
+        manager.scan_assets(force_rescan=True)
+        manager.close()
+
+        reopened = self.make_manager(root, "assets")
+        assert reopened._index_dirty is False
+        assert reopened.find_product_asset("Water Bottle").name == "water_bottle.jpg"
+
+        # Another process writes a row this manager's snapshot has not seen
+        shoe = root / "assets" / "running_shoe.png"
+        shoe.write_bytes(b"png")
+        other = AssetStore(reopened.store.db_path)
+        other.apply_changes(upserts={"running_shoe.png": reopened._build_asset_info(shoe, shoe.stat())})
+        other.close()
+        reopened._index_dirty = True
+        reopened.close()
+
+        rebuilt = self.make_manager(root, "assets")
+        assert rebuilt._index_dirty is True
+        assert rebuilt.find_product_asset("Running Shoe").name == "running_shoe.png"
+        rebuilt.close()
+
+    def test_legacy_cache_is_migrated_only_into_its_own_tree(self, root):
+        """Test that cache.json entries from another assets directory are not served"""
+        (root / "assets_a").mkdir()
+        (root / "assets_a" / "water_bottle.png").write_bytes(b"png")
+        (root / "cache.json").write_text(json.dumps({
+            "assets": {"water_bottle.png": {
+                "path": "assets_a/water_bottle.png", "name": "water_bottle", "format": ".png",
+                "size": 3, "keywords": ["water", "bottle"]
+            }},
+            "last_scan": "2024-01-01T00:00:00"
+        }))
+
+        manager = self.make_manager(root, "assets_b")
+        assert manager.find_product_asset("water bottle") is None
+        assert not (root / "cache.json").exists()
+        assert (root / "cache.json.migrated").exists()
+        manager.close()
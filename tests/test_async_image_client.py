@@ -0,0 +1,143 @@
+"""
+Test suite for the async image client against a local stub server
+"""
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import sys
+sys.path.append('src')
+from async_image_client import AsyncImageClient, ImageGenerationError, TokenBucket
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\nstub-image"
+
+
+class StubImageAPI:
+    """Minimal stand-in for the OpenAI images endpoint"""
+
+    def __init__(self, failures_before_success: int = 0, failure_status: int = 429, delay: float = 0.0):
+        self.failures_before_success = failures_before_success
+        self.failure_status = failure_status
+        self.delay = delay
+        self.generation_calls = 0
+        self.download_calls = 0
+        self.generation_auth = []
+        self.download_auth = []
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/v1/images/generations', self.generate)
+        app.router.add_get('/files/image.png', self.download)
+        return app
+
+    async def generate(self, request: web.Request) -> web.Response:
+        self.generation_calls += 1
+        self.generation_auth.append(request.headers.get('Authorization'))
+        await asyncio.sleep(self.delay)
+        if self.generation_calls <= self.failures_before_success:
+            return web.json_response({'error': 'try again'}, status=self.failure_status)
+        image_url = str(request.url.with_path('/files/image.png'))
+        return web.json_response({'data': [{'url': image_url}]})
+
+    async def download(self, request: web.Request) -> web.Response:
+        self.download_calls += 1
+        self.download_auth.append(request.headers.get('Authorization'))
+        return web.Response(body=PNG_BYTES, content_type='image/png')
+
+
+async def start_stub(stub: StubImageAPI) -> TestServer:
+    server = TestServer(stub.build_app())
+    await server.start_server()
+    return server
+
+
+class TestAsyncImageClient:
+    """Test suite for AsyncImageClient"""
+
+    @pytest_asyncio.fixture
+    async def stub(self):
+        stub = StubImageAPI(delay=0.05)
+        server = await start_stub(stub)
+        yield stub, str(server.make_url('/v1'))
+        await server.close()
+
+    @pytest.mark.asyncio
+    async def test_generate_downloads_image(self, stub):
+        """Test a single generation round trip"""
+        api, base_url = stub
+        async with AsyncImageClient(api_key='test', base_url=base_url, max_calls_per_minute=600) as client:
+            result = await client.generate("A water bottle")
+
+        assert result.data == PNG_BYTES
+        assert result.shared is False
+        assert api.generation_calls == 1
+        assert api.download_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_api_key_is_not_sent_to_image_host(self, stub):
+        """Test that only the generation call carries the Authorization header"""
+        api, base_url = stub
+        async with AsyncImageClient(api_key='secret', base_url=base_url, max_calls_per_minute=600) as client:
+            await client.generate("A water bottle")
+
+        assert api.generation_auth == ['Bearer secret']
+        assert api.download_auth == [None]
+
+    @pytest.mark.asyncio
+    async def test_identical_inflight_requests_are_coalesced(self, stub):
+        """Test that concurrent identical prompts share one API call"""
+        api, base_url = stub
+        async with AsyncImageClient(api_key='test', base_url=base_url, max_calls_per_minute=600) as client:
+            first, second, other = await asyncio.gather(
+                client.generate("A water bottle"),
+                client.generate("A  water bottle"),
+                client.generate("A running shoe")
+            )
+
+        assert first.data == second.data == PNG_BYTES
+        assert [first.shared, second.shared].count(True) == 1
+        assert other.shared is False
+        assert api.generation_calls == 2
+        assert client.get_stats()['coalesced'] == 1
+
+    @pytest.mark.asyncio
+    async def test_retries_rate_limited_requests(self):
+        """Test that 429 and 5xx responses are retried"""
+        api = StubImageAPI(failures_before_success=2, failure_status=503)
+        server = await start_stub(api)
+        try:
+            async with AsyncImageClient(api_key='test', base_url=str(server.make_url('/v1')),
+                                        max_calls_per_minute=600, base_delay=0.01) as client:
+                result = await client.generate("A water bottle")
+        finally:
+            await server.close()
+
+        assert result.attempts == 3
+        assert client.get_stats()['retries'] == 2
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self):
+        """Test that a 400 fails immediately"""
+        api = StubImageAPI(failures_before_success=5, failure_status=400)
+        server = await start_stub(api)
+        try:
+            async with AsyncImageClient(api_key='test', base_url=str(server.make_url('/v1')),
+                                        max_calls_per_minute=600, base_delay=0.01) as client:
+                with pytest.raises(ImageGenerationError) as excinfo:
+                    await client.generate("A water bottle")
+        finally:
+            await server.close()
+
+        assert excinfo.value.status == 400
+        assert api.generation_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_token_bucket_spaces_calls(self):
+        """Test that the limiter waits once the burst is spent"""
+        bucket = TokenBucket(rate_per_minute=600, capacity=1)
+        assert await bucket.acquire() == 0.0
+        waited = await bucket.acquire()
+        assert 0.05 <= waited <= 0.2
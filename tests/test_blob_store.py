@@ -0,0 +1,72 @@
+"""
+Test suite for the content-addressed blob store
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+import sys
+sys.path.append('src')
+from blob_store import BlobStore, digest_bytes
+
+
+class TestBlobStore:
+    """Test suite for BlobStore"""
+
+    @pytest.fixture
+    def root(self):
+        """Temporary directory holding the store and its outputs"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    def test_identical_content_is_stored_once(self, root):
+        """Test that materializing one blob into several paths writes its bytes once"""
+        store = BlobStore(root / "store")
+        digest = store.put_bytes(b"creative")
+        assert digest == digest_bytes(b"creative")
+        assert store.put_bytes(b"creative") == digest
+
+        for region in ("us", "de", "jp"):
+            path = store.materialize(digest, root / "output" / region / "1x1.jpg")
+            assert path.read_bytes() == b"creative"
+            assert store.ref_digest(path) == digest
+
+        stats = store.get_stats()
+        assert stats["blobs"] == 1
+        assert stats["refs"] == 3
+        assert stats["bytes_written"] == len(b"creative")
+        assert stats["dedup_ratio"] == 3.0
+
+    def test_adopt_replaces_duplicates_with_links(self, root):
+        """Test adopting freshly written files with new and already stored content"""
+        store = BlobStore(root / "store", link_mode="hardlink")
+        first = root / "output" / "a.jpg"
+        second = root / "output" / "b.jpg"
+        first.parent.mkdir(parents=True)
+        first.write_bytes(b"same")
+        second.write_bytes(b"same")
+
+        digest = store.adopt(first)
+        assert store.adopt(second) == digest
+        assert os.stat(first).st_ino == os.stat(second).st_ino == os.stat(store.object_path(digest)).st_ino
+        assert store.get_stats()["bytes_deduplicated"] == len(b"same")
+
+    def test_gc_prunes_stale_refs_and_unreferenced_blobs(self, root):
+        """Test that deleted and replaced outputs release their blobs"""
+        store = BlobStore(root / "store")
+        kept = store.materialize(store.put_bytes(b"kept"), root / "kept.jpg")
+        deleted = store.materialize(store.put_bytes(b"deleted"), root / "deleted.jpg")
+        replaced = store.materialize(store.put_bytes(b"replaced"), root / "replaced.jpg")
+
+        deleted.unlink()
+        replaced.unlink()
+        replaced.write_bytes(b"something else")
+
+        result = store.gc(min_age_seconds=0)
+        assert result["refs_pruned"] == 2
+        assert result["blobs_removed"] == 2
+        assert store.ref_digest(kept) == digest_bytes(b"kept")
+        assert not store.object_path(digest_bytes(b"deleted")).exists()
+        assert store.get_stats()["blobs"] == 1
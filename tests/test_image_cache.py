@@ -0,0 +1,92 @@
+"""
+Test suite for the content-addressed generated image cache
+"""
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+import sys
+sys.path.append('src')
+from image_cache import GeneratedImageCache, make_cache_key
+
+
+class TestGeneratedImageCache:
+    """Test suite for GeneratedImageCache"""
+
+    @pytest.fixture
+    def cache_dir(self):
+        """Temporary cache directory"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    def test_key_depends_on_prompt_model_size_and_quality(self):
+        """Test that every request parameter changes the key"""
+        base = make_cache_key("A bottle. Summer sale.", "dall-e-3", "1024x1024", "standard")
+        assert base == make_cache_key("  A bottle.   Summer sale. ", "dall-e-3", "1024x1024", "standard")
+        assert base != make_cache_key("A bottle. Winter sale.", "dall-e-3", "1024x1024", "standard")
+        assert base != make_cache_key("A bottle. Summer sale.", "dall-e-2", "1024x1024", "standard")
+        assert base != make_cache_key("A bottle. Summer sale.", "dall-e-3", "1792x1024", "standard")
+        assert base != make_cache_key("A bottle. Summer sale.", "dall-e-3", "1024x1024", "hd")
+
+    def test_hit_miss_and_byte_counters(self, cache_dir):
+        """Test stats after a miss, a put and a hit"""
+        cache = GeneratedImageCache(cache_dir)
+        key = make_cache_key("prompt", "dall-e-3", "1024x1024")
+
+        assert cache.get(key) is None
+        path = cache.put(key, b"x" * 100)
+        assert path.read_bytes() == b"x" * 100
+        assert cache.get(key) == path
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["bytes_written"] == 100
+        assert stats["bytes_read"] == 100
+        assert not list(path.parent.glob("*.tmp"))
+
+    def test_lru_eviction_respects_size_budget(self, cache_dir):
+        """Test that the least recently used entry is evicted first"""
+        cache = GeneratedImageCache(cache_dir, max_size_mb=1)
+        chunk = b"x" * (400 * 1024)
+
+        cache.put("a" * 64, chunk)
+        cache.put("b" * 64, chunk)
+        cache.get("a" * 64)
+        cache.put("c" * 64, chunk)
+
+        assert cache.get("b" * 64) is None
+        assert cache.get("a" * 64) is not None
+        assert cache.get("c" * 64) is not None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_index_persists_and_adopts_foreign_writes(self, cache_dir):
+        """Test reloading the index and picking up objects written by another worker"""
+        first = GeneratedImageCache(cache_dir)
+        first.put("a" * 64, b"one")
+
+        second = GeneratedImageCache(cache_dir)
+        assert second.get("a" * 64) is not None
+
+        first.put("b" * 64, b"two")
+        assert second.get("b" * 64) is not None
+
+        index = json.loads((cache_dir / "index.json").read_text())
+        assert set(index["entries"]) == {"a" * 64, "b" * 64}
+
+    def test_hits_defer_index_writes_until_flush(self, cache_dir):
+        """Test that a hit does not rewrite the index and flush persists it"""
+        cache = GeneratedImageCache(cache_dir)
+        cache.put("a" * 64, b"one")
+        cache.put("b" * 64, b"two")
+        written = (cache_dir / "index.json").read_text()
+
+        cache.get("a" * 64)
+        assert (cache_dir / "index.json").read_text() == written
+
+        cache.flush()
+        reloaded = GeneratedImageCache(cache_dir)
+        assert list(reloaded.entries) == ["b" * 64, "a" * 64]
+        assert reloaded.entries["a" * 64]["hits"] == 1
@@ -0,0 +1,87 @@
+"""
+Test suite for the MinHash LSH index
+"""
+import numpy as np
+import pytest
+
+import sys
+sys.path.append('src')
+from minhash_index import MinHashLSHIndex
+
+NUM_HASHES = 20
+BANDS = 5
+
+
+def random_signatures(count: int, seed: int = 0) -> np.ndarray:
+    """Distinct random signatures (no band collisions in practice)"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 2 ** 32, (count, NUM_HASHES), dtype=np.uint64).astype(np.uint32)
+
+
+class TestMinHashLSHIndex:
+    """Test suite for MinHashLSHIndex"""
+
+    @pytest.fixture
+    def index(self):
+        return MinHashLSHIndex(num_hashes=NUM_HASHES, bands=BANDS, initial_capacity=4, compact_ratio=0.5)
+
+    def test_add_and_query(self, index):
+        """Test that added signatures are found and scored"""
+        signatures = random_signatures(10)
+        index.add_batch([f"doc{i}" for i in range(10)], signatures)
+
+        assert len(index) == 10
+        assert index.get_stats()["capacity"] >= 10
+        assert index.query(signatures[3], threshold=0.9) == [("doc3", 1.0)]
+
+        # Sharing one full band makes a document a candidate
+        near = random_signatures(1, seed=99)[0]
+        near[:NUM_HASHES // BANDS] = signatures[7][:NUM_HASHES // BANDS]
+        assert 7 in index.candidates(near)
+        assert index.query(near, threshold=0.2)[0][0] == "doc7"
+
+    def test_replacing_an_id_tombstones_the_old_row(self, index):
+        """Test that re-adding an id drops its previous signature"""
+        old, new = random_signatures(2, seed=1)
+        index.add("doc", old)
+        index.add("doc", new)
+
+        assert len(index) == 1
+        assert index.get_stats()["tombstones"] == 1
+        assert index.query(old, threshold=0.5) == []
+        assert index.query(new, threshold=0.5) == [("doc", 1.0)]
+        assert np.array_equal(index.get_signature("doc"), new)
+
+    def test_remove_and_compact(self, index):
+        """Test that removal hides rows and compaction rewrites the live ones"""
+        signatures = random_signatures(6, seed=2)
+        index.add_batch([f"doc{i}" for i in range(6)], signatures)
+
+        assert index.remove("doc1") is True
+        assert index.remove("doc1") is False
+        assert index.query(signatures[1], threshold=0.5) == []
+        assert index.get_stats()["tombstones"] == 1
+
+        # Crossing compact_ratio rewrites the index without the dead rows
+        for doc_id in ("doc2", "doc3", "doc4"):
+            index.remove(doc_id)
+        stats = index.get_stats()
+        assert stats["tombstones"] == 0
+        assert stats["rows"] == stats["signatures"] == 2
+        assert index.query(signatures[5], threshold=0.5) == [("doc5", 1.0)]
+        assert index.query(signatures[0], threshold=0.5) == [("doc0", 1.0)]
+
+    def test_tail_is_merged_into_sorted_bands(self):
+        """Test lookups before and after the unsorted tail is merged"""
+        index = MinHashLSHIndex(num_hashes=NUM_HASHES, bands=BANDS, merge_ratio=0.0)
+        signatures = random_signatures(1100, seed=3)
+
+        index.add_batch([f"doc{i}" for i in range(1000)], signatures[:1000])
+        assert index.get_stats()["unsorted_tail"] == 1000
+        assert index.query(signatures[10], threshold=0.9) == [("doc10", 1.0)]
+
+        index.add_batch([f"doc{i}" for i in range(1000, 1100)], signatures[1000:])
+        assert index.get_stats()["unsorted_tail"] == 0
+        for row in (10, 999, 1050):
+            assert index.query(signatures[row], threshold=0.9) == [(f"doc{row}", 1.0)]
+        assert index.query(signatures[10], threshold=0.9, exhaustive=True) == [("doc10", 1.0)]
@@ -0,0 +1,55 @@
+"""
+Test suite for the incremental TF-IDF checker
+"""
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import sys
+sys.path.append('src')
+from plagiarism_checker import TfidfChecker
+
+DOCUMENTS = [
+    ("bottle", "Refreshing water bottle keeps drinks cold all day long"),
+    ("headphones", "Premium wireless headphones with active noise cancellation"),
+    ("steel", "Eco friendly water bottle made from recycled steel"),
+]
+
+
+class TestTfidfChecker:
+    """Test suite for TfidfChecker"""
+
+    @pytest.fixture
+    def checker(self):
+        checker = TfidfChecker()
+        checker.add_documents(DOCUMENTS)
+        return checker
+
+    def test_scores_match_tfidf_vectorizer(self, checker):
+        """Test that query terms outside the corpus do not dilute the score"""
+        query = DOCUMENTS[0][1] + " zebra quantum orbit marmalade"
+        vectorizer = TfidfVectorizer(ngram_range=(1, 3), stop_words='english')
+        matrix = vectorizer.fit_transform([text for _, text in DOCUMENTS])
+        expected = (matrix @ vectorizer.transform([query]).T).toarray().ravel()
+
+        scores = dict(checker.check_similarity(query))
+        assert np.allclose([scores[doc_id] for doc_id, _ in DOCUMENTS], expected)
+        assert scores["bottle"] == pytest.approx(1.0)
+
+    def test_removed_documents_are_tombstoned_and_compacted(self, checker):
+        """Test removal, re-adding an id and compaction of tombstoned rows"""
+        checker.remove_document("headphones")
+        checker.add_document("bottle", "Insulated steel bottle for hiking")
+
+        results = checker.check_similarity("steel bottle", top_k=5)
+        assert {doc_id for doc_id, _ in results} == {"bottle", "steel"}
+        assert checker.doc_ids.count(None) == 2
+
+        for i in range(100):
+            checker.add_document(f"extra-{i}", f"filler document number {i}")
+        for i in range(100):
+            checker.remove_document(f"extra-{i}")
+
+        assert checker._tombstones <= max(len(checker.documents), 64)
+        assert len(checker.doc_ids) - checker._tombstones == len(checker.documents) == 2
+        assert {doc_id for doc_id, _ in checker.check_similarity("steel bottle")} == {"bottle", "steel"}
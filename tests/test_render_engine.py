@@ -0,0 +1,56 @@
+"""
+Test suite for the parallel render engine
+"""
+import tempfile
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import sys
+sys.path.append('src')
+from render_engine import RenderEngine
+
+
+class StubAssetManager:
+    """Returns the same base image for every product, except failing ones"""
+
+    def __init__(self, image_path: Path, failing: str):
+        self.image_path = image_path
+        self.failing = failing
+
+    def find_product_asset(self, product_name: str):
+        if product_name == self.failing:
+            raise ConnectionError("asset backend unavailable")
+        return self.image_path
+
+
+class TestRenderEngine:
+    """Test suite for RenderEngine"""
+
+    @pytest.fixture
+    def root(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            Image.new('RGB', (320, 240), (200, 40, 40)).save(root / "base.png")
+            yield root
+
+    @pytest.mark.parametrize("max_workers", [1, 2])
+    def test_product_failure_does_not_drop_other_products(self, root, max_workers):
+        """Test that a product whose base image fails is reported and the rest still render"""
+        brief = {
+            'campaign_id': 'test',
+            'campaign_message': 'Hello',
+            'target_region': 'US',
+            'target_audience': 'everyone',
+            'products': [{'name': f"P{i}", 'description': 'product'} for i in range(4)],
+            'output_requirements': {'aspect_ratios': ['1:1', '16:9']}
+        }
+        engine = RenderEngine(StubAssetManager(root / "base.png", failing="P1"), None, max_workers=max_workers)
+
+        result = engine.render_campaign(brief, root / "output", force_generate=True)
+
+        assert len(result['rendered']) == 6
+        assert sorted((f['product'], f['aspect_ratio']) for f in result['failed']) == [('P1', '16:9'), ('P1', '1:1')]
+        assert sorted(result['sources']) == ['P0', 'P2', 'P3']
+        assert not list((root / "output").glob(".render-*"))